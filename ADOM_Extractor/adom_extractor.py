@@ -9,18 +9,26 @@ Usage:
     python3 fmg_adom_extractor.py --adom root        # single ADOM
     python3 fmg_adom_extractor.py --category firewall # single category
     python3 fmg_adom_extractor.py --out results.json  # custom output file
+    python3 fmg_adom_extractor.py --max-memory 512M   # spill big tables to disk
+    python3 fmg_adom_extractor.py --workers 4         # 4 tables in flight, slowest first
+    python3 fmg_adom_extractor.py --format json,sqlite # also write <stem>.sqlite
+    python3 fmg_adom_extractor.py --format ndjson --compress gzip --shard-size 1G
 """
 
 import argparse
+import itertools
 import json
 import os
 import sys
+import threading
 import time
-import urllib.request
-import urllib.error
-import ssl
 from datetime import datetime, timezone
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import cassette, profiling
+from fetch_history import HISTORY_DIR, FetchHistory
+from table_store import TableStore, fmt_size, parse_size
+
 # ── colours (disabled on Windows or non-TTY) ──────────────────────────────────
 USE_COLOUR = sys.stdout.isatty() and os.name != "nt"
 
@@ -587,9 +595,13 @@ class FMGClient:
     """Minimal FortiManager JSON-RPC over HTTPS client."""
 
     def __init__(self, host: str, port: int = 443, verify_ssl: bool = False):
+        import ssl   # imported here so --help / --list-categories start fast
+        self.host = host
+        self.port = port
         self.base_url = f"https://{host}:{port}/jsonrpc"
         self.session = None
-        self._req_id = 1
+        self._req_ids = itertools.count(1)   # next() is atomic: safe across fetch threads
+        self._send = self._post
         self._ssl_ctx = ssl.create_default_context()
         if not verify_ssl:
             self._ssl_ctx.check_hostname = False
@@ -598,6 +610,8 @@ class FMGClient:
     # ── low-level ──────────────────────────────────────────────────────────────
 
     def _post(self, payload: dict) -> dict:
+        import urllib.request
+        import urllib.error
         data = json.dumps(payload).encode()
         req = urllib.request.Request(
             self.base_url,
@@ -611,16 +625,20 @@ class FMGClient:
         except urllib.error.URLError as exc:
             raise ConnectionError(f"Cannot reach FortiManager: {exc.reason}") from exc
 
+    def use_cassette(self, record: str | None = None, replay: str | None = None,
+                     latency: str = "recorded") -> None:
+        """Record traffic to, or replay it from, a cassette (see fmg_common/cassette.py)."""
+        self._send = cassette.wrap(self._post, record=record, replay=replay, latency=latency)
+
     def _call(self, method: str, params: list) -> dict:
         payload = {
             "method": method,
             "params": params,
             "session": self.session,
-            "id": self._req_id,
+            "id": next(self._req_ids),
             "verbose": 1,
         }
-        self._req_id += 1
-        resp = self._post(payload)
+        resp = self._send(payload)
         return resp
 
     # ── auth ───────────────────────────────────────────────────────────────────
@@ -696,11 +714,20 @@ class FMGClient:
         """
         Fetch all entries from a table URL (paginates automatically).
         Returns (entries, status_code).
+        """
+        all_entries = []
+        code = self.fetch_table(url, all_entries.extend)
+        return (all_entries, 0) if code == 0 else ([], code)
+
+    def fetch_table(self, url: str, sink) -> int:
+        """
+        Fetch a table page by page, handing each page to sink(entries).
+        Returns the status code; on an error the pages already handed over
+        are incomplete and should be discarded by the caller.
 
         loadsub is intentionally omitted (defaults to 1) so that
         sub-objects such as dynamic_mapping are included in the response.
         """
-        all_entries = []
         offset = 0
         page_size = 500
 
@@ -714,22 +741,22 @@ class FMGClient:
             code = status.get("code", -1)
 
             if code != 0:
-                return [], code
+                return code
 
             data = result[0].get("data", [])
             if not data:
                 break
             if not isinstance(data, list):
                 # Single object returned (shouldn't happen for tables)
-                all_entries.append(data)
+                sink([data])
                 break
 
-            all_entries.extend(data)
+            sink(data)
             if len(data) < page_size:
                 break
             offset += page_size
 
-        return all_entries, 0
+        return 0
 
     def get_sys_status(self) -> tuple[str, bool]:
         """
@@ -755,8 +782,13 @@ class Progress:
         self.skipped = 0
         self.errors = 0
         self._start = time.time()
+        self._lock = threading.Lock()
 
     def tick(self, name: str, count: int, code: int) -> None:
+        with self._lock:
+            self._tick(name, count, code)
+
+    def _tick(self, name: str, count: int, code: int) -> None:
         self.done += 1
         if code == 0:
             self.ok += 1
@@ -802,28 +834,50 @@ def build_url(tbl: dict, adom: str) -> str:
     return tbl["url"].format(adom=adom)
 
 
-def extract_adom(client: FMGClient, adom: str, tables: list[dict],
-                 progress: Progress) -> dict:
-    """Fetch all tables for one ADOM. Returns {table_name: [entries]}."""
-    result = {}
-    for tbl in tables:
-        url = build_url(tbl, adom)
-        entries, code = client.get_table(url)
-        progress.tick(f"[{display_name(adom)}] {tbl['name']}", len(entries), code)
-        if code == 0:
-            result[tbl["name"]] = entries
-    return result
+def extract_table(client: FMGClient, adom: str, tbl: dict,
+                  progress: Progress, store: TableStore) -> tuple[int, int]:
+    """Fetch one table of one ADOM into the store. Returns (entry count, status code)."""
+    name = tbl["name"]
+    code = client.fetch_table(build_url(tbl, adom),
+                              lambda page: store.append(adom, name, page))
+    if code == 0:
+        count = store.count(adom, name)
+    else:
+        store.discard(adom, name)
+        count = 0
+    progress.tick(f"[{display_name(adom)}] {name}", count, code)
+    return count, code
 
 
-def run_extraction(client: FMGClient, adoms: list[str],
-                   tables: list[dict]) -> dict:
-    """Extract all tables for all ADOMs."""
+def run_extraction(client: FMGClient, adoms: list[str], tables: list[dict],
+                   store: TableStore, workers: int = 1,
+                   history: FetchHistory | None = None) -> dict:
+    """
+    Extract all tables for all ADOMs. Entries go to the store; the returned
+    dict carries the metadata and the store under "data".
+
+    With workers > 1 that many tables are fetched at once over the same
+    session. With a history, (ADOM, table) pairs are started longest
+    expected fetch first, so the largest tables are never the stragglers.
+    """
+    started = time.time()
     total_ops = len(adoms) * len(tables)
     prog = Progress(total_ops)
 
+    work = [(adom, tbl) for adom in adoms for tbl in tables]
+    for adom in adoms:
+        store.ensure(adom, [tbl["name"] for tbl in tables])   # output order = table order
+    known = 0
+    if history is not None:
+        work, known = history.order(work, key=lambda item: (item[0], item[1]["name"]))
+
     print(f"\n  Extracting {bold(str(len(tables)))} object types "
           f"across {bold(str(len(adoms)))} ADOM(s) "
-          f"({bold(str(total_ops))} requests)\n")
+          f"({bold(str(total_ops))} requests"
+          f"{f', {workers} at a time' if workers > 1 else ''})")
+    if known:
+        print(f"  {dim(f'Longest first: {known} of {total_ops} fetch time(s) known from earlier runs')}")
+    print()
 
     output = {
         "metadata": {
@@ -831,13 +885,41 @@ def run_extraction(client: FMGClient, adoms: list[str],
             "adoms": adoms,
             "tables_queried": len(tables),
         },
-        "data": {}
+        "data": store,
     }
 
-    for adom in adoms:
-        output["data"][adom] = extract_adom(client, adom, tables, prog)
+    timings = []
+
+    def fetch(item):
+        adom, tbl = item
+        started = time.perf_counter()
+        count, code = extract_table(client, adom, tbl, prog, store)
+        elapsed = time.perf_counter() - started
+        timings.append((elapsed, adom, tbl["name"], count))
+        if history is not None:
+            history.record(adom, tbl["name"], elapsed, count)
+
+    if workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as pool:
+            for _ in pool.map(fetch, work):     # re-raises the first worker exception
+                pass
+    else:
+        for item in work:
+            fetch(item)
 
     prog.summary()
+    output["stats"] = {"fetched": prog.ok, "not_available": prog.skipped, "errors": prog.errors,
+                       "seconds": round(time.time() - started, 2)}
+    if history is not None:
+        history.save()
+    slowest = sorted(timings, reverse=True)[:3]
+    if slowest and slowest[0][0] >= 1:
+        print("  Slowest: " + ", ".join(f"[{display_name(a)}] {t} {s:.1f}s ({c})"
+                                        for s, a, t, c in slowest))
+    if store.max_bytes is not None:
+        print(f"  Memory budget {fmt_size(store.max_bytes)}: peak estimate {fmt_size(store.peak_bytes)}, "
+              f"{store.spilled_tables()} table(s) spilled to disk ({fmt_size(store.spilled_bytes)})")
     return output
 
 
@@ -848,10 +930,50 @@ def _sanitize_filename(name: str) -> str:
     return "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
 
 
+_TABLE_MARKER = "\x00fmg-table-{}\x00"
+
+
+def _indent(text: str, pad: str) -> str:
+    return pad + text.replace("\n", "\n" + pad)
+
+
+def _write_entries(f, entries, level: int) -> None:
+    """Write a list of entries as json.dump(indent=2) would at nesting `level`, one entry at a time."""
+    pad = " " * (2 * level)
+    first = True
+    for entry in entries:
+        f.write("[\n" if first else ",\n")
+        f.write(_indent(json.dumps(entry, indent=2, default=str), pad + "  "))
+        first = False
+    f.write("[]" if first else f"\n{pad}]")
+
+
+def _write_adom_json(f, payload: dict, adom: str, store: TableStore) -> None:
+    """
+    Stream the per-ADOM document. The skeleton is dumped with a marker in
+    place of every table, and each marker is replaced by the table's entries
+    streamed from the store — same bytes as json.dump(indent=2) of the full
+    payload without ever holding a complete table as text.
+    """
+    names = store.tables(adom)
+    payload["data"] = {adom: {name: _TABLE_MARKER.format(i) for i, name in enumerate(names)}}
+    skeleton = json.dumps(payload, indent=2, default=str)
+    pos = 0
+    for i, name in enumerate(names):
+        marker = json.dumps(_TABLE_MARKER.format(i))
+        at = skeleton.index(marker, pos)
+        f.write(skeleton[pos:at])
+        _write_entries(f, store.iter_entries(adom, name), level=3)
+        pos = at + len(marker)
+    f.write(skeleton[pos:])
+
+
 def write_json_per_adom(data: dict, out_stem: str, no_csv: bool) -> None:
     """Write one JSON (and optionally one CSV) file per ADOM."""
     import csv
-    for adom, tables in data["data"].items():
+
+    store = data["data"]
+    for adom in store.adoms():
         safe = _sanitize_filename(display_name(adom))
 
         # ── per-ADOM payload ──────────────────────────────────────────────────
@@ -860,46 +982,84 @@ def write_json_per_adom(data: dict, out_stem: str, no_csv: bool) -> None:
                 **{k: v for k, v in data["metadata"].items() if k != "adoms"},
                 "adom": adom,
             },
-            "data": {adom: tables},
         }
 
         # JSON
         json_path = f"{out_stem}_{safe}.json"
         with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(adom_payload, f, indent=2, default=str)
+            _write_adom_json(f, adom_payload, adom, store)
         size_kb = os.path.getsize(json_path) / 1024
         print(f"  {green('✓')} JSON  → {bold(json_path)}  ({size_kb:.0f} KB)")
 
         # CSV
         if not no_csv:
-            rows = []
-            for table_name, entries in tables.items():
-                for entry in entries:
-                    rows.append({
-                        "adom": adom,
-                        "table": table_name,
-                        "name": entry.get("name", entry.get("id", "")),
-                        "data": json.dumps(entry, default=str),
-                    })
             csv_path = f"{out_stem}_{safe}.csv"
+            row_count = 0
             with open(csv_path, "w", newline="", encoding="utf-8") as f:
                 writer = csv.DictWriter(f, fieldnames=["adom", "table", "name", "data"])
                 writer.writeheader()
-                writer.writerows(rows)
+                for table_name in store.tables(adom):
+                    for entry in store.iter_entries(adom, table_name):
+                        writer.writerow({
+                            "adom": adom,
+                            "table": table_name,
+                            "name": entry.get("name", entry.get("id", "")),
+                            "data": json.dumps(entry, default=str),
+                        })
+                        row_count += 1
             size_kb = os.path.getsize(csv_path) / 1024
             print(f"  {green('✓')} CSV   → {bold(csv_path)}  ({size_kb:.0f} KB)  "
-                  f"({len(rows)} rows)")
+                  f"({row_count} rows)")
+
+
+def write_sqlite_output(data: dict, out_stem: str) -> None:
+    """Write every ADOM into one <stem>.sqlite (see sqlite_sink.py)."""
+    from sqlite_sink import write_sqlite
+
+    path = f"{out_stem}.sqlite"
+    stats = write_sqlite(data, path)
+    size_kb = os.path.getsize(path) / 1024
+    fts = "" if stats["fts"] else dim("  (no FTS5 in this SQLite build)")
+    print(f"  {green('✓')} SQLite → {bold(path)}  ({stats['rows']} rows, "
+          f"{stats['tables']} table view(s), {size_kb:.0f} KB){fts}")
+
+
+def write_ndjson_output(data: dict, out_stem: str, compression: str,
+                        shard_bytes: int | None) -> None:
+    """Write every ADOM as NDJSON shards plus <stem>.manifest.json (see ndjson_sink.py)."""
+    from ndjson_sink import write_ndjson
+
+    manifest = write_ndjson(data, out_stem, compression, shard_bytes)
+    for shard in manifest["shards"]:
+        print(f"  {green('✓')} NDJSON → {bold(shard['file'])}  ({shard['records']} records, "
+              f"{fmt_size(shard['bytes'])})")
+    ratio = (f", {manifest['uncompressed_bytes'] / manifest['bytes']:.1f}x smaller"
+             if compression != "none" and manifest["bytes"] else "")
+    print(f"  {green('✓')} Manifest → {bold(out_stem + '.manifest.json')}  "
+          f"({len(manifest['shards'])} shard(s), {fmt_size(manifest['bytes'])}{ratio})")
+
+
+def write_outputs(data: dict, out_stem: str, args: argparse.Namespace) -> None:
+    """Write the run in every format selected by --format."""
+    if "json" in args.format:
+        write_json_per_adom(data, out_stem, no_csv=args.no_csv)
+    if "sqlite" in args.format:
+        write_sqlite_output(data, out_stem)
+    if "ndjson" in args.format:
+        write_ndjson_output(data, out_stem, args.compress, args.shard_size)
 
 
 def write_summary(data: dict) -> None:
     """Print a quick count summary to stdout."""
+    store = data["data"]
     print(f"\n  {'ADOM':<20} {'Table':<45} {'Count':>6}")
     print("  " + "─" * 75)
-    for adom, tables in data["data"].items():
+    for adom in store.adoms():
         label = display_name(adom)
-        for tbl, entries in sorted(tables.items()):
-            if entries:
-                print(f"  {label:<20} {tbl:<45} {green(str(len(entries))):>6}")
+        for tbl in sorted(store.tables(adom)):
+            count = store.count(adom, tbl)
+            if count:
+                print(f"  {label:<20} {tbl:<45} {green(str(count)):>6}")
     print()
 
 
@@ -954,6 +1114,17 @@ def display_name(adom: str) -> str:
     return "Global" if adom == "rootp" else adom
 
 
+def list_adoms(client: FMGClient, adom_enabled: bool) -> list[str]:
+    """FortiOS-family ADOMs (see get_adoms), or just root when ADOMs are disabled."""
+    if not adom_enabled:
+        return ["root"]
+    all_adoms = client.get_adoms()
+    # Ensure root is always in the list (sometimes not returned by API)
+    if "root" not in all_adoms:
+        all_adoms = ["root"] + all_adoms
+    return all_adoms
+
+
 def select_adoms(client: FMGClient, adom_filter: str | None,
                  adom_enabled: bool) -> list[str]:
     """
@@ -963,17 +1134,7 @@ def select_adoms(client: FMGClient, adom_filter: str | None,
     - Only FortiOS-family ADOMs are listed (filtered in get_adoms).
     """
     print(f"  {dim('Fetching ADOM list...')}", end=" ", flush=True)
-
-    if adom_enabled:
-        all_adoms = client.get_adoms()
-    else:
-        # ADOMs disabled — only root exists
-        all_adoms = ["root"]
-
-    # Ensure root is always in the list (sometimes not returned by API)
-    if "root" not in all_adoms and adom_enabled:
-        all_adoms = ["root"] + all_adoms
-
+    all_adoms = list_adoms(client, adom_enabled)
     print(green(f"{len(all_adoms)} found"))
 
     if not adom_enabled:
@@ -1053,6 +1214,19 @@ def select_adoms(client: FMGClient, adom_filter: str | None,
 
 # ── main ───────────────────────────────────────────────────────────────────────
 
+OUTPUT_FORMATS = ("json", "sqlite", "ndjson")
+
+
+def parse_formats(text: str) -> list[str]:
+    """'json,sqlite' -> ['json', 'sqlite']."""
+    formats = [f.strip().lower() for f in text.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in OUTPUT_FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(
+            f"unknown format '{','.join(unknown) or text}' (choose from {', '.join(OUTPUT_FORMATS)})")
+    return formats
+
+
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(
         description="Extract all ADOM-level objects from FortiManager via JSON-RPC API.",
@@ -1067,6 +1241,12 @@ Examples:
   python3 fmg_adom_extractor.py --adom root --category firewall
   python3 fmg_adom_extractor.py --out /tmp/backup.json --no-csv
   python3 fmg_adom_extractor.py --list-categories
+  python3 fmg_adom_extractor.py --adom Global --max-memory 512M
+  python3 fmg_adom_extractor.py --workers 4
+  python3 fmg_adom_extractor.py --format sqlite
+  python3 fmg_adom_extractor.py --format ndjson --compress zstd --shard-size 512M
+  python3 fmg_adom_extractor.py --record run.cassette.gz
+  python3 fmg_adom_extractor.py --replay run.cassette.gz --replay-latency zero
         """
     )
     p.add_argument("--host",     help="FortiManager IP or hostname")
@@ -1076,11 +1256,31 @@ Examples:
     p.add_argument("--adom",     help="Extract only this ADOM (default: all)")
     p.add_argument("--category", help="Extract only this category (e.g. firewall)")
     p.add_argument("--out",      default="", help="Output JSON filename (default: auto-generated)")
-    p.add_argument("--no-csv",   action="store_true", help="Skip CSV export")
+    p.add_argument("--format",   type=parse_formats, default=["json"], metavar="FMT[,FMT]",
+                   help=f"Output format(s): {', '.join(OUTPUT_FORMATS)} (default: json)")
+    p.add_argument("--no-csv",   action="store_true", help="Skip CSV export (written with json)")
+    p.add_argument("--compress", choices=("none", "gzip", "zstd"), default="none",
+                   help="Compression for --format ndjson (default: none)")
+    p.add_argument("--shard-size", type=parse_size, metavar="SIZE",
+                   help="Split ndjson output into shards of about SIZE uncompressed (e.g. 1G)")
     p.add_argument("--no-summary", action="store_true", help="Skip count summary")
     p.add_argument("--verify-ssl", action="store_true", help="Verify TLS certificate")
     p.add_argument("--list-categories", action="store_true",
                    help="Print all available categories and exit")
+    p.add_argument("--max-memory", type=parse_size, metavar="SIZE",
+                   help="Memory budget for fetched tables (e.g. 512M, 2G); "
+                        "beyond it tables spill to temporary files")
+    p.add_argument("--spill-dir", metavar="DIR",
+                   help="Where spill segments go (default: system temp directory)")
+    p.add_argument("--workers", type=int, default=1, metavar="N",
+                   help="Tables fetched concurrently over the session (default: 1)")
+    p.add_argument("--history-dir", default=HISTORY_DIR, metavar="DIR",
+                   help=f"Per-FortiManager fetch timings used to start the slowest "
+                        f"tables first (default: {HISTORY_DIR})")
+    p.add_argument("--no-history", action="store_true",
+                   help="Neither use nor update fetch timings")
+    cassette.add_arguments(p)
+    profiling.add_arguments(p)
     return p.parse_args()
 
 
@@ -1091,18 +1291,21 @@ def run_once(client: FMGClient, tables: list[dict], args: argparse.Namespace,
     # ── ADOM selection ────────────────────────────────────────────────────────
     adoms = select_adoms(client, args.adom, adom_enabled)
 
-    # ── extract ───────────────────────────────────────────────────────────────
-    result = run_extraction(client, adoms, tables)
+    with TableStore(args.max_memory, args.spill_dir) as store:
+        # ── extract ───────────────────────────────────────────────────────────
+        history = None if args.no_history else \
+            FetchHistory.for_host(client.host, client.port, args.history_dir)
+        result = run_extraction(client, adoms, tables, store, max(args.workers, 1), history)
 
-    # ── write output — one file per ADOM ─────────────────────────────────────
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    out_stem = args.out.rstrip(".json") if args.out else f"fmg_adom_objects_{timestamp}"
+        # ── write output — one file per ADOM ─────────────────────────────────
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_stem = args.out.rstrip(".json") if args.out else f"fmg_adom_objects_{timestamp}"
 
-    print(f"\n  {bold('Saving output...')}")
-    write_json_per_adom(result, out_stem, no_csv=args.no_csv)
+        print(f"\n  {bold('Saving output...')}")
+        write_outputs(result, out_stem, args)
 
-    if not args.no_summary:
-        write_summary(result)
+        if not args.no_summary:
+            write_summary(result)
 
     print(green("  Done.\n"))
 
@@ -1120,13 +1323,28 @@ def main() -> None:
 
     print_banner()
 
+    if "ndjson" in args.format:
+        from ndjson_sink import check_compression
+        try:
+            check_compression(args.compress)
+        except RuntimeError as exc:
+            print(red(f"  {exc}"))
+            sys.exit(1)
+
     # ── gather connection details ──────────────────────────────────────────────
     print(bold("  Connection details"))
     print("  " + "─" * 48)
-    host     = args.host     or prompt("FortiManager IP / hostname")
-    port     = args.port
-    username = args.user     or prompt("Username", "admin")
-    password = args.password or prompt_password()
+    if args.replay:
+        # offline: nothing is sent anywhere, so don't ask for credentials
+        host     = args.host     or "replay"
+        port     = args.port
+        username = args.user     or "admin"
+        password = args.password or "replay"
+    else:
+        host     = args.host     or prompt("FortiManager IP / hostname")
+        port     = args.port
+        username = args.user     or prompt("Username", "admin")
+        password = args.password or prompt_password()
 
     if not host or not password:
         print(red("  Host and password are required."))
@@ -1141,6 +1359,7 @@ def main() -> None:
     # ── connect ────────────────────────────────────────────────────────────────
     print(f"\n  Connecting to {cyan(f'https://{host}:{port}')} ...", end="", flush=True)
     client = FMGClient(host, port, verify_ssl=args.verify_ssl)
+    client.use_cassette(record=args.record, replay=args.replay, latency=args.replay_latency)
 
     try:
         client.login(username, password)
@@ -1175,4 +1394,4 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    profiling.run_main(main)
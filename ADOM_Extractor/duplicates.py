@@ -0,0 +1,154 @@
+"""
+Duplicate object finder across ADOMs.
+
+Two objects of the same table are duplicates when they are identical once
+their identity and cosmetic fields (IGNORED_FIELDS: name, uuid, _scope,
+comments, colour, ...) are removed. Each entry is canonicalised — ignored
+fields dropped, keys sorted, set-like lists (SET_FIELDS: group members,
+policy addresses and services, ...) sorted — and hashed, and entries are bucketed by (table, hash) in one pass
+over the snapshot. No pairwise comparison is done, so 400k objects cost one
+hash each.
+
+Usage:
+    python duplicates.py fmg_adom_objects_20260101_120000
+    python duplicates.py fmg_adom_objects_20260101_120000 --table firewall/address --csv dups.csv
+    python duplicates.py fmg_adom_objects_20260101_120000 --within-adom
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import profiling
+from entries import entry_key
+from reference_graph import load_adom_files, snapshot_files
+
+# identity / bookkeeping fields: differ between otherwise identical objects
+IGNORED_FIELDS = {
+    "name", "uuid", "_scope", "oid", "obj-id", "q_origin_key",
+    "comment", "comments", "color", "_image-base64", "fabric-object",
+}
+# dropped at every nesting level, not only at the top
+NESTED_IGNORED = {"uuid", "q_origin_key", "oid"}
+# lists whose order carries no meaning; every other list is positional
+# (subnet [ip, mask], start/end pairs, ordered entries) and keeps its order
+SET_FIELDS = {
+    "member", "exclude-member", "tags", "allowaccess", "interface",
+    "srcintf", "dstintf", "srcaddr", "dstaddr", "srcaddr6", "dstaddr6",
+    "service", "users", "groups", "fsso-groups", "poolname", "poolname6",
+    "application", "app-category", "internet-service-name", "internet-service-src-name",
+}
+
+
+def canonical(obj, top: bool = True, field: str | None = None):
+    """Entry -> comparable form: ignored fields removed, plain-value SET_FIELDS lists sorted."""
+    if isinstance(obj, dict):
+        drop = IGNORED_FIELDS if top else NESTED_IGNORED
+        return {k: canonical(v, False, k) for k, v in obj.items() if k not in drop}
+    if isinstance(obj, list):
+        items = [canonical(v, False, field) for v in obj]
+        if field in SET_FIELDS and all(isinstance(v, (str, int, float)) for v in items):
+            return sorted(items, key=lambda v: (type(v).__name__, v))
+        return items
+    return obj
+
+
+def canonical_hash(entry: dict) -> str:
+    text = json.dumps(canonical(entry), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def find_duplicates(files: list, tables: set | None = None, within_adom: bool = False) -> tuple:
+    """
+    One pass over the snapshot. Returns (sets, scanned) where sets is a list of
+    {"table", "hash", "objects": [(adom, name), ...]} with two or more objects.
+    """
+    buckets = defaultdict(list)           # (table, [adom,] hash) -> [(adom, name)]
+    scanned = 0
+    for adom, adom_tables in load_adom_files(files):
+        for table, entries in adom_tables.items():
+            if tables and table not in tables:
+                continue
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                scanned += 1
+                h = canonical_hash(entry)
+                key = (table, adom, h) if within_adom else (table, h)
+                buckets[key].append((adom, entry_key(entry)))
+    sets = [{"table": key[0], "hash": key[-1], "objects": objects}
+            for key, objects in buckets.items() if len(objects) > 1]
+    sets.sort(key=lambda s: (s["table"], -len(s["objects"])))
+    return sets, scanned
+
+
+def write_csv(sets: list, path: str) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["set", "table", "hash", "adom", "name"])
+        for num, dup in enumerate(sets, 1):
+            for adom, name in dup["objects"]:
+                writer.writerow([num, dup["table"], dup["hash"], adom, name])
+
+
+def print_report(sets: list, scanned: int, top: int) -> None:
+    per_table = defaultdict(lambda: [0, 0])          # table -> [sets, redundant objects]
+    per_adom = Counter()                             # adom  -> objects that have a twin
+    for dup in sets:
+        per_table[dup["table"]][0] += 1
+        per_table[dup["table"]][1] += len(dup["objects"]) - 1
+        for adom, _ in dup["objects"]:
+            per_adom[adom] += 1
+
+    redundant = sum(r for _, r in per_table.values())
+    print(f"\n  {'Table':<45} {'Sets':>7} {'Redundant':>10}")
+    print("  " + "─" * 64)
+    for table, (count, extra) in sorted(per_table.items(), key=lambda kv: -kv[1][1]):
+        print(f"  {table:<45} {count:>7} {extra:>10}")
+    print(f"\n  {'ADOM':<25} {'Objects with a duplicate':>25}")
+    print("  " + "─" * 51)
+    for adom, count in per_adom.most_common():
+        print(f"  {adom:<25} {count:>25}")
+    if top:
+        print(f"\n  Largest {min(top, len(sets))} set(s):")
+        for dup in sorted(sets, key=lambda s: -len(s["objects"]))[:top]:
+            names = ", ".join(f"{a}/{n}" for a, n in dup["objects"][:6])
+            more = f", … +{len(dup['objects']) - 6}" if len(dup["objects"]) > 6 else ""
+            print(f"    {dup['table']:<30} x{len(dup['objects']):<4} {names}{more}")
+    print(f"\n  {len(sets)} duplicate set(s), {redundant} redundant object(s) out of {scanned} scanned\n")
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Find identical objects across ADOMs in an adom_extractor.py snapshot.")
+    p.add_argument("source", nargs="+", help="Snapshot stem (fmg_adom_objects_<ts>) or JSON files")
+    p.add_argument("--table", action="append", help="Only this table (repeatable), e.g. firewall/address")
+    p.add_argument("--within-adom", action="store_true", help="Only report duplicates inside the same ADOM")
+    p.add_argument("--csv", help="Write every duplicate set to this CSV file")
+    p.add_argument("--top", type=int, default=10, help="Largest sets to list (default: 10, 0 = none)")
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    files = snapshot_files(args.source)
+    if not files:
+        print(f"No snapshot files found for {' '.join(args.source)}")
+        sys.exit(1)
+    started = time.time()
+    sets, scanned = find_duplicates(files, set(args.table or []), args.within_adom)
+    print_report(sets, scanned, args.top)
+    if args.csv:
+        write_csv(sets, args.csv)
+        print(f"  Duplicate sets written to {args.csv}")
+    print(f"  Done in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    profiling.run_main(main)
@@ -0,0 +1,14 @@
+"""
+Entry helpers shared by the snapshot tools (reference graph, duplicates,
+snapshot diff and the sqlite/ndjson sinks).
+"""
+
+KEY_FIELDS = ("name", "id", "policyid", "seq-num", "q_origin_key")
+
+
+def entry_key(entry: dict) -> str:
+    """Identifying key of a table entry: its first non-empty KEY_FIELDS value, or ''."""
+    for key in KEY_FIELDS:
+        if entry.get(key) not in (None, ""):
+            return str(entry[key])
+    return ""
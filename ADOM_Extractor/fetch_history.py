@@ -0,0 +1,88 @@
+"""
+Per-FortiManager fetch timings for adom_extractor.py.
+
+Every run records, for each (ADOM, table), how long the fetch took and how
+many entries came back. The next run against the same FortiManager uses
+them to start the slowest tables first (longest-processing-time-first), so
+with --workers the run no longer ends with one worker still paging through
+a giant Global firewall/address that happened to be scheduled last.
+
+History is one small JSON file per FortiManager (<dir>/<host>_<port>.json),
+so extractions of several FortiManagers running side by side never write
+the same file. Durations are smoothed over runs (EMA_WEIGHT) so one slow
+run does not reorder everything.
+"""
+
+import json
+import os
+import statistics
+import threading
+
+HISTORY_DIR = ".fetch_history"
+EMA_WEIGHT = 0.5          # weight of the newest run
+
+
+class FetchHistory:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}                      # "adom\ttable" -> {"seconds", "count", "runs"}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.entries = json.load(f).get("entries", {})
+            except (OSError, ValueError):
+                self.entries = {}              # unreadable history: start over
+
+    @classmethod
+    def for_host(cls, host: str, port: int, directory: str = HISTORY_DIR) -> "FetchHistory":
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in f"{host}_{port}")
+        return cls(os.path.join(directory, f"{safe}.json"))
+
+    @staticmethod
+    def _key(adom: str, table: str) -> str:
+        return f"{adom}\t{table}"
+
+    def record(self, adom: str, table: str, seconds: float, count: int) -> None:
+        key = self._key(adom, table)
+        with self._lock:
+            old = self.entries.get(key)
+            if old:
+                seconds = EMA_WEIGHT * seconds + (1 - EMA_WEIGHT) * old["seconds"]
+            self.entries[key] = {"seconds": round(seconds, 4), "count": count,
+                                 "runs": (old or {}).get("runs", 0) + 1}
+
+    def estimate(self, adom: str, table: str, table_means: dict | None = None) -> float | None:
+        """Expected seconds; a table never fetched in this ADOM falls back to its mean elsewhere."""
+        known = self.entries.get(self._key(adom, table))
+        if known:
+            return known["seconds"]
+        return (table_means or {}).get(table)
+
+    def _table_means(self) -> dict:
+        per_table = {}
+        for key, value in self.entries.items():
+            per_table.setdefault(key.split("\t", 1)[1], []).append(value["seconds"])
+        return {table: statistics.fmean(values) for table, values in per_table.items()}
+
+    def order(self, work: list, key=lambda item: item) -> tuple[list, int]:
+        """
+        Sort work items longest-expected-first. key(item) -> (adom, table).
+        Items without any history keep their original order, after the known
+        ones. Returns (ordered work, number of items with an estimate).
+        """
+        means = self._table_means()
+        estimates = [self.estimate(*key(item), means) for item in work]
+        known = sum(1 for e in estimates if e is not None)
+        ranked = sorted(range(len(work)),
+                        key=lambda i: (estimates[i] is None, -(estimates[i] or 0.0), i))
+        return [work[i] for i in ranked], known
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with self._lock, open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"entries": self.entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
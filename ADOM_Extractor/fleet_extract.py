@@ -0,0 +1,291 @@
+"""
+Fleet extraction: run adom_extractor.py against several FortiManagers at once.
+
+Each FortiManager in the inventory is extracted by its own worker process,
+which has its own JSON-RPC session, its own --workers concurrency limit,
+its own memory budget and its own fetch history. Output lands in one tree:
+
+  fleet_<timestamp>/
+    fleet_report.json                     timings, counts and sizes per FortiManager
+    <name>/extract.log                    the extractor's console output
+    <name>/fmg_adom_objects_<ts>_<ADOM>.json|csv|...
+
+Inventory (JSON). Passwords are references, never literals:
+
+  {
+    "defaults": {"user": "api_ro", "workers": 4, "adoms": "all", "format": "json"},
+    "fortimanagers": [
+      {"name": "fmg-dc1", "host": "10.0.0.1", "password": "env:FMG_DC1_PASSWORD"},
+      {"name": "fmg-dc2", "host": "10.0.0.2", "password": "file:/run/secrets/fmg-dc2"},
+      {"name": "fmg-lab", "host": "lab-fmg", "port": 8443, "password": "prompt",
+       "adoms": ["root", "Global"], "category": "firewall", "max_memory": "1G"}
+    ]
+  }
+
+  env:VAR        environment variable
+  file:PATH      first line of a file
+  keyring:SERVICE[/USER]   OS keyring (needs the 'keyring' package)
+  prompt         asked once, before any worker starts
+
+Per-FortiManager keys (and "defaults"): host, port, user, password, adoms
+("all" or a list, Global = rootp), category, workers, max_memory, format,
+compress, shard_size, no_csv, verify_ssl.
+
+Usage:
+    python fleet_extract.py fleet.json
+    python fleet_extract.py fleet.json --parallel 3 --only fmg-dc1 --only fmg-dc2
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import profiling
+import adom_extractor as ax
+from fetch_history import HISTORY_DIR, FetchHistory
+from table_store import TableStore, fmt_size, parse_size
+
+DEFAULTS = {
+    "port": 443,
+    "user": "admin",
+    "adoms": "all",
+    "category": None,
+    "workers": 4,
+    "max_memory": None,
+    "format": "json",
+    "compress": "none",
+    "shard_size": None,
+    "no_csv": False,
+    "verify_ssl": False,
+}
+SECRET_SCHEMES = ("env:", "file:", "keyring:", "prompt")
+REPORT_NAME = "fleet_report.json"
+
+
+# ── inventory ──────────────────────────────────────────────────────────────────
+
+def resolve_secret(ref: str, label: str) -> str:
+    """Turn a credential reference into the secret. Raises ValueError when it cannot."""
+    if ref == "prompt":
+        return ax.prompt_password(f"Password for {label}")
+    if ref.startswith("env:"):
+        value = os.environ.get(ref[4:])
+        if not value:
+            raise ValueError(f"{label}: environment variable {ref[4:]} is not set")
+        return value
+    if ref.startswith("file:"):
+        try:
+            with open(os.path.expanduser(ref[5:]), encoding="utf-8") as f:
+                return f.readline().rstrip("\r\n")
+        except OSError as exc:
+            raise ValueError(f"{label}: cannot read {ref[5:]}: {exc.strerror}") from None
+    if ref.startswith("keyring:"):
+        try:
+            import keyring
+        except ImportError:
+            raise ValueError(f"{label}: keyring: references need the 'keyring' package") from None
+        service, _, user = ref[8:].partition("/")
+        value = keyring.get_password(service, user or label)
+        if value is None:
+            raise ValueError(f"{label}: nothing stored in the keyring for {ref[8:]}")
+        return value
+    raise ValueError(f"{label}: password must be a reference ({', '.join(SECRET_SCHEMES)}), not a literal")
+
+
+def load_inventory(path: str) -> list[dict]:
+    """Inventory file -> list of FortiManager dicts with defaults applied and values checked."""
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    defaults = {**DEFAULTS, **doc.get("defaults", {})}
+    fmgs, seen = [], set()
+    for raw in doc.get("fortimanagers", []):
+        fmg = {**defaults, **raw}
+        name = fmg.get("name") or fmg.get("host")
+        if not fmg.get("host"):
+            raise ValueError(f"Inventory entry {raw} has no host")
+        # names become file and folder names, so two names that sanitise the
+        # same way would write into each other's output
+        safe_name = ax._sanitize_filename(name)
+        if safe_name in seen:
+            raise ValueError(f"Duplicate inventory name '{name}' (as '{safe_name}')")
+        if not isinstance(fmg.get("password"), str) or not fmg["password"].startswith(SECRET_SCHEMES):
+            raise ValueError(f"{name}: password must be a reference ({', '.join(SECRET_SCHEMES)})")
+        if fmg["category"] and fmg["category"] not in ax.CATEGORIES:
+            raise ValueError(f"{name}: unknown category '{fmg['category']}'")
+        adoms = fmg["adoms"]
+        if adoms != "all" and not (isinstance(adoms, list) and adoms
+                                   and all(isinstance(a, str) and a for a in adoms)):
+            raise ValueError(f'{name}: adoms must be "all" or a list of ADOM names, not {json.dumps(adoms)}')
+        workers = fmg["workers"]
+        if isinstance(workers, bool) or not isinstance(workers, int) or workers < 1:
+            raise ValueError(f"{name}: workers must be a whole number of at least 1, not {json.dumps(workers)}")
+        formats = fmg["format"]
+        if isinstance(formats, list) and all(isinstance(f, str) for f in formats):
+            formats = ",".join(formats)
+        if not isinstance(formats, str):
+            raise ValueError(f"{name}: format must be a name or a list of names, not {json.dumps(formats)}")
+        try:
+            fmg["format"] = ax.parse_formats(formats)
+        except argparse.ArgumentTypeError as exc:
+            raise ValueError(f"{name}: {exc}") from None
+        fmg["max_memory"] = parse_size(fmg["max_memory"]) if fmg["max_memory"] else None
+        fmg["shard_size"] = parse_size(fmg["shard_size"]) if fmg["shard_size"] else None
+        fmg["name"] = safe_name
+        seen.add(safe_name)
+        fmgs.append(fmg)
+    if not fmgs:
+        raise ValueError(f"No fortimanagers listed in {path}")
+    return fmgs
+
+
+# ── worker process ─────────────────────────────────────────────────────────────
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f))
+               for root, _, files in os.walk(path) for f in files)
+
+
+def extract_fmg(job: dict) -> dict:
+    """Extract one FortiManager (runs in a worker process). Never raises: failures go in the result."""
+    out_dir = job["out_dir"]
+    os.makedirs(out_dir, exist_ok=True)
+    result = {"name": job["name"], "host": job["host"], "port": job["port"], "status": "failed",
+              "error": None, "version": None, "adoms": [], "tables": 0, "entries": 0,
+              "fetched": 0, "not_available": 0, "errors": 0, "fetch_seconds": 0.0}
+    started = time.time()
+    ax.USE_COLOUR = False
+    with open(os.path.join(out_dir, "extract.log"), "w", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        client = ax.FMGClient(job["host"], job["port"], verify_ssl=job["verify_ssl"])
+        try:
+            client.login(job["user"], job["password"])
+            version, adom_enabled = client.get_sys_status()
+            result["version"] = version
+            available = ax.list_adoms(client, adom_enabled)
+            if job["adoms"] == "all":
+                adoms = available
+            else:
+                wanted = ["rootp" if a == "Global" else a for a in job["adoms"]]
+                missing = [a for a in wanted if a not in available]
+                if missing:
+                    raise ValueError(f"ADOM(s) not found: {', '.join(missing)}")
+                adoms = wanted
+            tables = ax.select_tables(job["category"])
+            result["adoms"] = [ax.display_name(a) for a in adoms]
+            result["tables"] = len(tables)
+
+            history = FetchHistory.for_host(job["host"], job["port"], job["history_dir"])
+            with TableStore(job["max_memory"]) as store:
+                run = ax.run_extraction(client, adoms, tables, store, job["workers"], history)
+                out_stem = os.path.join(out_dir, f"fmg_adom_objects_{job['timestamp']}")
+                options = argparse.Namespace(format=job["format"], no_csv=job["no_csv"],
+                                             compress=job["compress"], shard_size=job["shard_size"])
+                ax.write_outputs(run, out_stem, options)
+                result["entries"] = sum(store.count(a, t) for a in store.adoms() for t in store.tables(a))
+            result.update(run["stats"])
+            result["fetch_seconds"] = result.pop("seconds")
+            result["status"] = "ok" if not result["errors"] else "partial"
+        except (Exception, SystemExit) as exc:        # select_tables / writers may sys.exit()
+            result["error"] = str(exc) or type(exc).__name__
+            print(f"  Failed: {result['error']}")
+        finally:
+            try:
+                client.logout()
+            except Exception:
+                pass
+    result["seconds"] = round(time.time() - started, 2)
+    result["bytes"] = _dir_size(out_dir)
+    return result
+
+
+# ── report ─────────────────────────────────────────────────────────────────────
+
+def print_report(results: list, wall: float, out_root: str) -> None:
+    print(f"\n  {'FortiManager':<18} {'Version':<22} {'ADOMs':>5} {'Entries':>9} "
+          f"{'Errors':>6} {'Time':>8} {'Size':>10}  Status")
+    print("  " + "─" * 96)
+    for r in sorted(results, key=lambda r: r["name"]):
+        status = {"ok": ax.green("ok"), "partial": ax.yellow("partial")}.get(
+            r["status"], ax.red(f"failed: {r['error']}"))
+        print(f"  {r['name']:<18} {str(r['version'] or '-')[:22]:<22} {len(r['adoms']):>5} "
+              f"{r['entries']:>9} {r['errors']:>6} {r['seconds']:>7.1f}s {fmt_size(r['bytes']):>10}  {status}")
+    busy = sum(r["seconds"] for r in results)
+    print("  " + "─" * 96)
+    print(f"  {len(results)} FortiManager(s), {sum(r['entries'] for r in results)} entries, "
+          f"{fmt_size(sum(r['bytes'] for r in results))} in {wall:.1f}s wall "
+          f"({busy:.1f}s summed, {busy / wall if wall else 0:.1f}x parallel)")
+    print(f"  Output: {ax.bold(out_root)}\n")
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Extract ADOM objects from a fleet of FortiManagers in parallel.")
+    p.add_argument("inventory", help="Inventory JSON file (see the module docstring)")
+    p.add_argument("--out", help="Output directory (default: fleet_<timestamp>)")
+    p.add_argument("--parallel", type=int, metavar="N",
+                   help="FortiManagers extracted at the same time (default: all)")
+    p.add_argument("--only", action="append", metavar="NAME", help="Only this inventory entry (repeatable)")
+    p.add_argument("--history-dir", default=HISTORY_DIR, metavar="DIR",
+                   help=f"Fetch timing history, one file per FortiManager (default: {HISTORY_DIR})")
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        fmgs = load_inventory(args.inventory)
+    except (OSError, ValueError) as exc:
+        print(ax.red(f"  Inventory: {exc}"))
+        sys.exit(1)
+    if args.only:
+        only = {ax._sanitize_filename(n) for n in args.only}
+        fmgs = [f for f in fmgs if f["name"] in only]
+        if not fmgs:
+            print(ax.red(f"  None of {', '.join(args.only)} is in the inventory."))
+            sys.exit(1)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_root = args.out or f"fleet_{timestamp}"
+    jobs = []
+    for fmg in fmgs:                   # all secrets up front: prompts and errors before any work
+        try:
+            password = resolve_secret(fmg["password"], fmg["name"])
+        except ValueError as exc:
+            print(ax.red(f"  {exc}"))
+            sys.exit(1)
+        jobs.append({**fmg, "password": password, "timestamp": timestamp,
+                     "out_dir": os.path.join(out_root, fmg["name"]), "history_dir": args.history_dir})
+
+    parallel = max(1, min(args.parallel or len(jobs), len(jobs)))
+    print(f"\n  Extracting {ax.bold(str(len(jobs)))} FortiManager(s), {parallel} at a time → {out_root}")
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    started = time.time()
+    results = []
+    with ProcessPoolExecutor(max_workers=parallel) as pool:
+        futures = {pool.submit(extract_fmg, job): job for job in jobs}
+        for future in as_completed(futures):
+            r = future.result()
+            results.append(r)
+            mark = ax.green("✓") if r["status"] == "ok" else \
+                ax.yellow("!") if r["status"] == "partial" else ax.red("✗")
+            detail = r["error"] or f"{r['entries']} entries, {len(r['adoms'])} ADOM(s)"
+            print(f"  {mark} {r['name']:<18} {r['seconds']:>7.1f}s  {detail}")
+    wall = time.time() - started
+
+    os.makedirs(out_root, exist_ok=True)
+    with open(os.path.join(out_root, REPORT_NAME), "w", encoding="utf-8") as f:
+        json.dump({"started_at": timestamp, "wall_seconds": round(wall, 2), "parallel": parallel,
+                   "fortimanagers": sorted(results, key=lambda r: r["name"])}, f, indent=2)
+    print_report(results, wall, out_root)
+    if any(r["status"] == "failed" for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    profiling.run_main(main)
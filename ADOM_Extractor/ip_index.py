@@ -0,0 +1,503 @@
+"""
+IP / subnet interval index across ADOMs.
+
+Answers "which address objects, groups and VIPs cover 10.20.30.40" (or
+overlap / contain / sit inside a subnet) over an adom_extractor.py snapshot.
+
+Every address-like object is turned into one or more integer ranges:
+
+  firewall/address, address6   subnet / ip6 / iprange (+ dynamic_mapping values)
+  firewall/vip, vip6           external IP range and mapped IP ranges
+  firewall/addrgrp, addrgrp6   union of the members' ranges (nested groups,
+                               Global members resolved)
+
+The ranges live in SQLite (IP_INDEX_DB) keyed by (adom, table, name) with a
+hash of the source object; group member lists are stored too. `update`
+replaces only the ADOMs present in the given snapshot and only rewrites
+objects whose hash changed, so extracting a single ADOM and updating keeps
+every other ADOM's ranges. Global members come from the snapshot's Global
+ADOM, or from the index when the snapshot has none; when Global itself is
+updated, the stored groups of every other ADOM are re-derived. Queries load the
+ranges into an IntervalTree — a sorted array with the max end per implicit
+subtree — which answers stabbing and overlap queries in O(log n + k). The
+trees are built once per process and index generation (bumped by every
+update) and shared by every IpIndex on the same file, so repeated lookups,
+including several queries given to one `lookup` command, skip the rebuild.
+
+Usage:
+    python ip_index.py update fmg_adom_objects_20260101_120000
+    python ip_index.py lookup 10.20.30.40
+    python ip_index.py lookup 10.20.30.40 10.20.30.41 192.0.2.0/24
+    python ip_index.py lookup 10.20.0.0/16 --mode overlap
+    python ip_index.py lookup 2001:db8::/48 --mode within --adom root
+"""
+
+import argparse
+import hashlib
+import ipaddress
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import profiling
+from reference_graph import GLOBAL_ADOM, load_adom_files, snapshot_files
+
+IP_INDEX_DB = "ip_index.sqlite"
+
+ADDRESS_TABLES = ("firewall/address", "firewall/address6")
+VIP_TABLES = ("firewall/vip", "firewall/vip6")
+GROUP_TABLES = ("firewall/addrgrp", "firewall/addrgrp6")
+INDEXED_TABLES = ADDRESS_TABLES + VIP_TABLES + GROUP_TABLES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    adom  TEXT NOT NULL,
+    tbl   TEXT NOT NULL,
+    name  TEXT NOT NULL,
+    hash  TEXT NOT NULL,
+    PRIMARY KEY (adom, tbl, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ranges (
+    adom    TEXT NOT NULL,
+    tbl     TEXT NOT NULL,
+    name    TEXT NOT NULL,
+    kind    TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    start   TEXT NOT NULL,        -- integers as 32-digit hex (IPv6 does not fit INTEGER)
+    end     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ranges_obj ON ranges(adom, tbl, name);
+CREATE TABLE IF NOT EXISTS members (
+    adom    TEXT NOT NULL,
+    tbl     TEXT NOT NULL,
+    name    TEXT NOT NULL,
+    member  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_members_obj ON members(adom, tbl, name);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# ── range parsing ──────────────────────────────────────────────────────────────
+
+def _network(text: str):
+    """'10.0.0.0 255.255.255.0' / '10.0.0.0/24' / '2001:db8::/64' / '10.0.0.1' -> (ver, start, end)."""
+    text = text.strip().replace(" ", "/")
+    net = ipaddress.ip_network(text, strict=False)
+    return net.version, int(net.network_address), int(net.broadcast_address)
+
+
+def _range(text: str):
+    """'10.0.0.1-10.0.0.9' or a single address/subnet -> (ver, start, end)."""
+    if "-" in text:
+        lo, hi = (ipaddress.ip_address(p.strip()) for p in text.split("-", 1))
+        return lo.version, int(lo), int(hi)
+    return _network(text)
+
+
+def _is_netmask(text: str) -> bool:
+    """'255.255.255.0' -> True; an address that is not a contiguous mask -> False."""
+    try:
+        inverted = ~int(ipaddress.IPv4Address(text)) & 0xFFFFFFFF
+    except ValueError:
+        return False
+    return inverted & (inverted + 1) == 0
+
+
+def _as_text(value) -> str | None:
+    if isinstance(value, list):
+        if len(value) == 2 and all(isinstance(v, str) for v in value) and _is_netmask(value[1]):
+            return f"{value[0]} {value[1]}"          # ["10.0.0.0", "255.255.255.0"]
+        value = value[0] if len(value) == 1 else None
+    if isinstance(value, dict):
+        value = value.get("range")
+    return value if isinstance(value, str) and value else None
+
+
+def _values(value) -> list:
+    """
+    Flatten list / dict({'range': ...}) shapes used by mappedip and extip.
+    A two-string list is one [ip, mask] pair only when the second string is
+    a netmask; ["10.0.0.1", "10.0.0.2"] is two values.
+    """
+    if isinstance(value, list) and not (len(value) == 2 and _as_text(value)):
+        return [t for v in value if (t := _as_text(v))]
+    text = _as_text(value)
+    return [text] if text else []
+
+
+def _address_ranges(entry: dict, kind: str = "subnet") -> list:
+    out = []
+    kind_type = entry.get("type")
+    try:
+        if kind_type in (None, "ipmask", 0) and _as_text(entry.get("subnet")):
+            out.append((kind,) + _network(_as_text(entry["subnet"])))
+        elif kind_type in (None, "ipprefix", 0) and isinstance(entry.get("ip6"), str) and entry["ip6"]:
+            out.append((kind,) + _network(entry["ip6"]))
+        elif kind_type in ("iprange", 1) and entry.get("start-ip") and entry.get("end-ip"):
+            out.append((kind,) + _range(f"{entry['start-ip']}-{entry['end-ip']}"))
+    except ValueError:
+        pass
+    for mapping in entry.get("dynamic_mapping") or []:
+        if isinstance(mapping, dict):
+            out.extend(_address_ranges({"type": kind_type, **mapping}, "subnet (dynamic_mapping)"))
+    return [r for r in out if not (r[0] == kind and r[2] == 0 and r[3] == 0)]
+
+
+def _vip_ranges(entry: dict) -> list:
+    out = []
+    for field, kind in (("extip", "vip external"), ("mappedip", "vip mapped")):
+        for text in _values(entry.get(field)):
+            try:
+                out.append((kind,) + _range(text))
+            except ValueError:
+                continue
+    return out
+
+
+def entry_hash(entry: dict) -> str:
+    return hashlib.sha1(json.dumps(entry, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _members(entry: dict) -> list:
+    members = entry.get("member") or []
+    return [m for m in (members if isinstance(members, list) else [members]) if isinstance(m, str)]
+
+
+def group_ranges(own_ranges: dict, groups: dict, global_ranges: dict | None = None) -> dict:
+    """
+    {(table, name): [("group member", version, start, end), ...]} for the groups
+    {name: (table, [member, ...])} of one ADOM. Members resolve to this ADOM's
+    objects first (own_ranges: name -> ranges), then its other groups, then
+    Global (global_ranges: name -> ranges).
+    """
+    def expand(name, seen):
+        if name in own_ranges:
+            return own_ranges[name]
+        if name in groups and name not in seen:
+            seen = seen | {name}
+            out = []
+            for member in groups[name][1]:
+                out.extend(expand(member, seen))
+            return out
+        return (global_ranges or {}).get(name, [])
+
+    out = {}
+    for name, (table, _) in groups.items():
+        ranges = {(v, s, e) for _, v, s, e in expand(name, frozenset())}
+        out[(table, name)] = [("group member",) + r for r in sorted(ranges)]
+    return out
+
+
+def derive_adom(adom: str, tables: dict, global_ranges: dict | None = None) -> dict:
+    """
+    {(table, name): (hash, [(kind, version, start, end), ...])} for one ADOM.
+    Group ranges are the union of their (possibly nested / Global) members;
+    global_ranges maps Global object names to their ranges.
+    """
+    derived = {}
+    own_ranges = {}                      # name -> ranges, addresses + VIPs of this ADOM
+    for table in ADDRESS_TABLES + VIP_TABLES:
+        for entry in tables.get(table, []):
+            name = entry.get("name")
+            if not name:
+                continue
+            ranges = _address_ranges(entry) if table in ADDRESS_TABLES else _vip_ranges(entry)
+            derived[(table, name)] = (entry_hash(entry), ranges)
+            own_ranges.setdefault(name, []).extend(ranges)
+
+    groups, hashes = {}, {}
+    for table in GROUP_TABLES:
+        for entry in tables.get(table, []):
+            if entry.get("name"):
+                groups[entry["name"]] = (table, _members(entry))
+                hashes[entry["name"]] = entry_hash(entry)
+
+    for key, ranges in group_ranges(own_ranges, groups, global_ranges).items():
+        derived[key] = (hashes[key[1]], ranges)
+    return derived
+
+
+def _by_name(derived: dict) -> dict:
+    """derive_adom() output -> {name: ranges}, the shape group_ranges() resolves against."""
+    out = {}
+    for (_, name), (_, ranges) in derived.items():
+        out.setdefault(name, []).extend(ranges)
+    return out
+
+
+# ── interval tree ──────────────────────────────────────────────────────────────
+
+class IntervalTree:
+    """
+    Static interval tree: intervals sorted by start, and for every implicit
+    subtree (rooted at the middle index of [lo, hi)) the largest end in it.
+    """
+
+    def __init__(self, intervals: list):
+        # intervals: [(start, end, payload), ...]
+        self.items = sorted(intervals, key=lambda iv: (iv[0], iv[1]))
+        self.starts = [iv[0] for iv in self.items]
+        self.ends = [iv[1] for iv in self.items]
+        self.max_end = [0] * len(self.items)
+        self._build(0, len(self.items))
+
+    def _build(self, lo: int, hi: int) -> int:
+        if lo >= hi:
+            return -1
+        mid = (lo + hi) // 2
+        self.max_end[mid] = max(self.ends[mid], self._build(lo, mid), self._build(mid + 1, hi))
+        return self.max_end[mid]
+
+    def overlap(self, qs: int, qe: int) -> list:
+        """Every interval with start <= qe and end >= qs."""
+        found, stack = [], [(0, len(self.items))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_end[mid] < qs:
+                continue                    # nothing in this subtree reaches qs
+            stack.append((lo, mid))
+            if self.starts[mid] <= qe:
+                if self.ends[mid] >= qs:
+                    found.append(self.items[mid])
+                stack.append((mid + 1, hi))
+        return found
+
+    def __len__(self):
+        return len(self.items)
+
+
+# ── persistent index ───────────────────────────────────────────────────────────
+
+def _hex(value: int) -> str:
+    return f"{value:032x}"
+
+
+# abspath of the index -> (generation, {version: IntervalTree}), shared by every IpIndex
+_tree_cache = {}
+_tree_cache_lock = threading.Lock()
+
+
+class IpIndex:
+    def __init__(self, db_path: str = IP_INDEX_DB):
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def update(self, files: list) -> dict:
+        """
+        Replace the ADOMs found in the given snapshot files; unchanged objects
+        are left alone. Global members resolve against the snapshot's Global
+        ADOM, or the stored one when the snapshot has none. When Global is in
+        the snapshot, the stored groups of the other ADOMs are re-derived.
+        """
+        stats = {"adoms": 0, "added": 0, "changed": 0, "removed": 0, "unchanged": 0, "rederived": 0}
+        # only the address-like tables are kept; the rest of each file is dropped as it loads
+        adoms = {adom: {t: tables.get(t, []) for t in INDEXED_TABLES}
+                 for adom, tables in load_adom_files(files)}
+        derived_by_adom = {}
+        if GLOBAL_ADOM in adoms:
+            derived_by_adom[GLOBAL_ADOM] = derive_adom(GLOBAL_ADOM, adoms[GLOBAL_ADOM])
+            global_ranges = _by_name(derived_by_adom[GLOBAL_ADOM])
+        else:
+            global_ranges = self._stored_ranges(GLOBAL_ADOM)
+        with self.db:
+            for adom, tables in adoms.items():
+                stats["adoms"] += 1
+                derived = (derived_by_adom[adom] if adom in derived_by_adom
+                           else derive_adom(adom, tables, global_ranges))
+                members = {(t, e["name"]): _members(e) for t in GROUP_TABLES
+                           for e in tables.get(t, []) if e.get("name")}
+                existing = {(tbl, name): h for tbl, name, h in self.db.execute(
+                    "SELECT tbl, name, hash FROM objects WHERE adom = ?", (adom,))}
+                for key in existing.keys() - derived.keys():
+                    self._delete(adom, *key)
+                    stats["removed"] += 1
+                for key, (h, ranges) in derived.items():
+                    old = existing.get(key)
+                    if old == h and key[0] not in GROUP_TABLES:
+                        stats["unchanged"] += 1
+                        continue
+                    if old is not None:
+                        self._delete(adom, *key)
+                    self.db.execute("INSERT INTO objects VALUES (?, ?, ?, ?)", (adom, *key, h))
+                    self.db.executemany(
+                        "INSERT INTO ranges VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [(adom, key[0], key[1], kind, ver, _hex(s), _hex(e)) for kind, ver, s, e in ranges])
+                    if key in members:
+                        self.db.executemany("INSERT INTO members VALUES (?, ?, ?, ?)",
+                                            [(adom, *key, m) for m in members[key]])
+                    # groups are always re-derived (members may have changed), but
+                    # only counted as changed when their own definition did
+                    if old is None:
+                        stats["added"] += 1
+                    elif old != h:
+                        stats["changed"] += 1
+                    else:
+                        stats["unchanged"] += 1
+            if GLOBAL_ADOM in adoms:
+                stored = [a for (a,) in self.db.execute("SELECT DISTINCT adom FROM members")]
+                for adom in stored:
+                    if adom not in adoms:
+                        stats["rederived"] += self._rederive_groups(adom, global_ranges)
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)",
+                            (str(self._generation() + 1),))
+        return stats
+
+    def _generation(self) -> int:
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _stored_ranges(self, adom: str, tables: tuple = INDEXED_TABLES) -> dict:
+        """{name: [(kind, version, start, end), ...]} of one ADOM, read back from the index."""
+        out = {}
+        marks = ",".join("?" * len(tables))
+        for name, in self.db.execute(
+                f"SELECT name FROM objects WHERE adom = ? AND tbl IN ({marks})", (adom, *tables)):
+            out.setdefault(name, [])
+        for name, kind, ver, s, e in self.db.execute(
+                f"SELECT name, kind, version, start, end FROM ranges WHERE adom = ? AND tbl IN ({marks})",
+                (adom, *tables)):
+            out[name].append((kind, ver, int(s, 16), int(e, 16)))
+        return out
+
+    def _rederive_groups(self, adom: str, global_ranges: dict) -> int:
+        """
+        Recompute a stored ADOM's group ranges from its stored objects and
+        member lists against new Global ranges. Only groups whose ranges
+        changed are rewritten; returns how many were.
+        """
+        own_ranges = self._stored_ranges(adom, ADDRESS_TABLES + VIP_TABLES)
+        groups = {}
+        for tbl, name, member in self.db.execute(
+                "SELECT tbl, name, member FROM members WHERE adom = ?", (adom,)):
+            groups.setdefault(name, (tbl, []))[1].append(member)
+        stored = {}
+        for tbl, name, kind, ver, s, e in self.db.execute(
+                "SELECT tbl, name, kind, version, start, end FROM ranges WHERE adom = ? AND tbl IN (?, ?)",
+                (adom, *GROUP_TABLES)):
+            stored.setdefault((tbl, name), []).append((kind, ver, int(s, 16), int(e, 16)))
+        rewritten = 0
+        for key, ranges in group_ranges(own_ranges, groups, global_ranges).items():
+            if sorted(stored.get(key, [])) == ranges:
+                continue
+            tbl, name = key
+            self.db.execute("DELETE FROM ranges WHERE adom = ? AND tbl = ? AND name = ?", (adom, tbl, name))
+            self.db.executemany(
+                "INSERT INTO ranges VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(adom, tbl, name, kind, ver, _hex(s), _hex(e)) for kind, ver, s, e in ranges])
+            rewritten += 1
+        return rewritten
+
+    def _delete(self, adom, tbl, name):
+        self.db.execute("DELETE FROM objects WHERE adom = ? AND tbl = ? AND name = ?", (adom, tbl, name))
+        self.db.execute("DELETE FROM ranges WHERE adom = ? AND tbl = ? AND name = ?", (adom, tbl, name))
+        self.db.execute("DELETE FROM members WHERE adom = ? AND tbl = ? AND name = ?", (adom, tbl, name))
+
+    def trees(self) -> dict:
+        """{4: IntervalTree, 6: IntervalTree}, rebuilt only when the index generation changed."""
+        key = os.path.abspath(self.db_path)
+        generation = self._generation()
+        with _tree_cache_lock:
+            cached = _tree_cache.get(key)
+            if cached and cached[0] == generation:
+                return cached[1]
+            by_version = {4: [], 6: []}
+            for adom, tbl, name, kind, ver, s, e in self.db.execute(
+                    "SELECT adom, tbl, name, kind, version, start, end FROM ranges"):
+                by_version[ver].append((int(s, 16), int(e, 16), (adom, tbl, name, kind)))
+            trees = {ver: IntervalTree(items) for ver, items in by_version.items()}
+            _tree_cache[key] = (generation, trees)
+            return trees
+
+    def lookup(self, query: str, mode: str = "contains", adom: str | None = None,
+               exclude_any: bool = False) -> list:
+        """
+        mode: contains  objects whose range covers the whole query (IP or subnet)
+              overlap   objects whose range overlaps it at all
+              within    objects whose range lies inside the query subnet
+        Returns [(adom, table, name, kind, range_text)].
+        """
+        version, qs, qe = _range(query)
+        tree = self.trees()[version]
+        addr = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+        full = (1 << (32 if version == 4 else 128)) - 1
+        results = []
+        for start, end, (o_adom, tbl, name, kind) in tree.overlap(qs, qe):
+            if adom and o_adom != adom:
+                continue
+            if mode == "contains" and not (start <= qs and end >= qe):
+                continue
+            if mode == "within" and not (start >= qs and end <= qe):
+                continue
+            if exclude_any and start == 0 and end == full:
+                continue
+            results.append((o_adom, tbl, name, kind, f"{addr(start)}-{addr(end)}"))
+        return sorted(results)
+
+
+# ── CLI ────────────────────────────────────────────────────────────────────────
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Cross-ADOM IP/subnet lookup over extracted address objects.")
+    p.add_argument("--db", default=IP_INDEX_DB, help=f"Index path (default: {IP_INDEX_DB})")
+    sub = p.add_subparsers(dest="command", required=True)
+    u = sub.add_parser("update", help="Add or refresh the ADOMs of a snapshot")
+    u.add_argument("source", nargs="+", help="Snapshot stem (fmg_adom_objects_<ts>) or JSON files")
+    q = sub.add_parser("lookup", help="Objects covering / overlapping an IP, range or subnet")
+    q.add_argument("query", nargs="+",
+                   help="10.20.30.40, 10.20.0.0/16, 10.0.0.1-10.0.0.9 or an IPv6 form (several allowed)")
+    q.add_argument("--mode", choices=("contains", "overlap", "within"), default="contains")
+    q.add_argument("--adom", help="Only this ADOM (rootp = Global)")
+    q.add_argument("--exclude-any", action="store_true", help="Hide 0.0.0.0/0 and ::/0 objects")
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    index = IpIndex(args.db)
+    try:
+        if args.command == "update":
+            files = snapshot_files(args.source)
+            if not files:
+                print(f"No snapshot files found for {' '.join(args.source)}")
+                sys.exit(1)
+            started = time.time()
+            stats = index.update(files)
+            print(f"{stats['adoms']} ADOM(s): {stats['added']} added, {stats['changed']} changed, "
+                  f"{stats['removed']} removed, {stats['unchanged']} unchanged, "
+                  f"{stats['rederived']} group(s) re-derived in other ADOMs "
+                  f"({time.time() - started:.1f}s) → {args.db}")
+        else:
+            trees = index.trees()
+            for query in args.query:
+                try:
+                    rows = index.lookup(query, args.mode, args.adom, args.exclude_any)
+                except ValueError as exc:
+                    print(f"Invalid query: {exc}")
+                    sys.exit(1)
+                if len(args.query) > 1:
+                    print(f"{query}:")
+                for adom, table, name, kind, span in rows:
+                    print(f"  {adom:<15} {table:<20} {name:<35} {kind:<26} {span}")
+                print(f"{len(rows)} match(es) across {len(trees[4]) + len(trees[6])} indexed range(s)")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    profiling.run_main(main)
@@ -0,0 +1,149 @@
+"""
+NDJSON output for adom_extractor.py (--format ndjson).
+
+One object per line, tagged with where it came from:
+
+  {"adom": "root", "table": "firewall/address", "name": "WEB_SRV01", "data": {...}}
+
+Lines are streamed from the TableStore straight into the output, optionally
+through gzip or zstd (--compress), and split into shards of about
+--shard-size uncompressed bytes so consumers (Splunk, Spark, jq -c in
+parallel) can read them independently. A shard only ever ends on a line
+boundary. '<stem>.manifest.json' lists every shard with its record count,
+sizes, SHA-256 and the ADOMs / tables it holds.
+
+zstd needs Python 3.14's compression.zstd or the 'zstandard' package;
+gzip is in the standard library.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+from entries import entry_key
+
+COMPRESSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def _zstd_module():
+    """compression.zstd (Python 3.14+) or the 'zstandard' package."""
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise RuntimeError("zstd output needs the 'zstandard' package (pip install zstandard) "
+                           "or Python 3.14+") from None
+
+
+def check_compression(compression: str) -> None:
+    """Fail before the extraction, not after it, when zstd is not available."""
+    if compression == "zstd":
+        _zstd_module()
+
+
+def _open(path: str, compression: str):
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=6)
+    if compression == "zstd":
+        zstd = _zstd_module()
+        if zstd.__name__ == "zstandard":
+            return zstd.ZstdCompressor(level=3).stream_writer(open(path, "wb"))
+        return zstd.open(path, "wb", level=3)
+    return open(path, "wb")
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ShardWriter:
+    """Writes lines to <stem>[.NNNN].ndjson[.gz|.zst], starting a new shard past shard_bytes."""
+
+    def __init__(self, out_stem: str, compression: str = "none", shard_bytes: int | None = None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}'")
+        self.out_stem = out_stem
+        self.compression = compression
+        self.shard_bytes = shard_bytes
+        self.shards = []
+        self._fh = None
+
+    def _path(self, index: int) -> str:
+        shard = f".{index:04d}" if self.shard_bytes else ""
+        return f"{self.out_stem}{shard}.ndjson{COMPRESSIONS[self.compression]}"
+
+    def _start(self) -> None:
+        path = self._path(len(self.shards))
+        self._fh = _open(path, self.compression)
+        self.shards.append({"file": os.path.basename(path), "path": path, "records": 0,
+                            "uncompressed_bytes": 0, "adoms": {}, "tables": set()})
+
+    def _finish(self) -> None:
+        if self._fh is None:
+            return
+        self._fh.close()
+        self._fh = None
+        shard = self.shards[-1]
+        shard["bytes"] = os.path.getsize(shard["path"])
+        shard["sha256"] = _sha256(shard["path"])
+
+    def write(self, adom: str, table: str, line: bytes) -> None:
+        if self._fh is None or (self.shard_bytes and self.shards[-1]["uncompressed_bytes"] >= self.shard_bytes):
+            self._finish()
+            self._start()
+        self._fh.write(line)
+        shard = self.shards[-1]
+        shard["records"] += 1
+        shard["uncompressed_bytes"] += len(line)
+        shard["adoms"][adom] = shard["adoms"].get(adom, 0) + 1
+        shard["tables"].add(table)
+
+    def close(self) -> list:
+        if not self.shards:
+            self._start()                            # empty run: still one (empty) file
+        self._finish()
+        for shard in self.shards:
+            shard.pop("path")
+            shard["tables"] = sorted(shard["tables"])
+        return self.shards
+
+
+def write_ndjson(data: dict, out_stem: str, compression: str = "none",
+                 shard_bytes: int | None = None) -> dict:
+    """Stream a run (metadata + TableStore) to NDJSON shards plus a manifest. Returns the manifest."""
+    store = data["data"]
+    writer = ShardWriter(out_stem, compression, shard_bytes)
+    try:
+        for adom in store.adoms():
+            for table in store.tables(adom):
+                for entry in store.iter_entries(adom, table):
+                    name = entry_key(entry) if isinstance(entry, dict) else ""
+                    record = {"adom": adom, "table": table, "name": name, "data": entry}
+                    line = json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str)
+                    writer.write(adom, table, (line + "\n").encode("utf-8"))
+    finally:
+        shards = writer.close()
+
+    manifest = {
+        "metadata": data["metadata"],
+        "format": "ndjson",
+        "compression": compression,
+        "shard_bytes": shard_bytes,
+        "records": sum(s["records"] for s in shards),
+        "uncompressed_bytes": sum(s["uncompressed_bytes"] for s in shards),
+        "bytes": sum(s["bytes"] for s in shards),
+        "shards": shards,
+    }
+    with open(f"{out_stem}.manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    return manifest
@@ -0,0 +1,311 @@
+"""
+Object reference graph and where-used index over an extracted snapshot.
+
+adom_extractor.py writes one '<stem>_<ADOM>.json' file per ADOM. This tool
+reads those files once and stores a reference graph in SQLite:
+
+  nodes  one row per object   (adom, table, name)
+  edges  object -> object it references, with the field that holds it
+
+References are found by walking every entry (including nested sub-tables
+and dynamic_mapping entries) and matching string values against the object
+names of the same ADOM and of Global ('rootp'); a name found in the same
+ADOM shadows a Global object of that name. Fields listed in FIELD_FAMILIES
+only resolve to the listed tables (e.g. 'service' never points at an
+address); fields in SKIP_FIELDS are never references. Matching
+is deliberately generous — a false edge keeps an object out of the unused
+list, a missed one would wrongly put it there.
+
+Usage:
+    python reference_graph.py build fmg_adom_objects_20260101_120000
+    python reference_graph.py where-used WEB_SRV01 --adom root
+    python reference_graph.py where-used Branch_Nets --recursive
+    python reference_graph.py unused --adom root --table firewall/address
+"""
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import profiling
+from entries import entry_key
+
+GLOBAL_ADOM = "rootp"
+
+# never object references
+SKIP_FIELDS = {
+    "name", "uuid", "comment", "comments", "description", "type", "status",
+    "color", "_scope", "obj-id", "oid", "_image-base64", "fqdn", "subnet",
+    "start-ip", "end-ip", "extip", "mappedip", "ip", "ip6", "macaddr",
+    "country", "wildcard-fqdn", "visibility", "action", "logtraffic",
+}
+
+_ADDRESS = ["firewall/address", "firewall/addrgrp", "firewall/vip", "firewall/vipgrp",
+            "firewall/internet-service", "firewall/proxy-address", "dynamic/address",
+            "system/external-resource"]
+_ADDRESS6 = ["firewall/address6", "firewall/addrgrp6", "firewall/vip6", "firewall/vipgrp6",
+             "dynamic/address", "system/external-resource"]
+_INTERFACE = ["dynamic/interface", "system/zone", "dynamic/input-interface"]
+
+# field -> table-name prefixes it may resolve to (anything else resolves to any table)
+FIELD_FAMILIES = {
+    "srcaddr": _ADDRESS, "dstaddr": _ADDRESS, "srcaddr6": _ADDRESS6, "dstaddr6": _ADDRESS6,
+    "mapped-addr": _ADDRESS, "exclude-member": _ADDRESS + _ADDRESS6,
+    "service": ["firewall/service/"], "srcintf": _INTERFACE, "dstintf": _INTERFACE,
+    "interface": _INTERFACE, "extintf": _INTERFACE, "associated-interface": _INTERFACE,
+    "schedule": ["firewall/schedule/"], "poolname": ["firewall/ippool"],
+    "poolname6": ["firewall/ippool6"], "users": ["user/"], "groups": ["user/group"],
+    "av-profile": ["antivirus/profile"], "webfilter-profile": ["webfilter/profile"],
+    "dnsfilter-profile": ["dnsfilter/profile"], "ips-sensor": ["ips/sensor"],
+    "application-list": ["application/list"], "ssl-ssh-profile": ["firewall/ssl-ssh-profile"],
+    "profile-group": ["firewall/profile-group"], "emailfilter-profile": ["emailfilter/profile"],
+    "dlp-sensor": ["dlp/sensor"], "dlp-profile": ["dlp/profile"],
+    "file-filter-profile": ["file-filter/profile"], "waf-profile": ["waf/profile"],
+    "voip-profile": ["voip/profile"], "icap-profile": ["icap/profile"],
+    "casb-profile": ["casb/profile"], "videofilter-profile": ["videofilter/profile"],
+    "ssh-filter-profile": ["ssh-filter/profile"], "virtual-patch-profile": ["virtual-patch/profile"],
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta  (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS nodes (
+    id    INTEGER PRIMARY KEY,
+    adom  TEXT NOT NULL,
+    tbl   TEXT NOT NULL,
+    name  TEXT NOT NULL,
+    UNIQUE (adom, tbl, name)
+);
+CREATE TABLE IF NOT EXISTS edges (
+    src   INTEGER NOT NULL,
+    dst   INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    PRIMARY KEY (src, dst, field)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_nodes_name ON nodes(name);
+CREATE INDEX IF NOT EXISTS idx_edges_dst  ON edges(dst);
+"""
+
+
+def iter_refs(obj, field=None):
+    """Yield (field, string value) for every candidate reference inside an entry."""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if key in SKIP_FIELDS:
+                continue
+            yield from iter_refs(value, key)
+    elif isinstance(obj, list):
+        for value in obj:
+            yield from iter_refs(value, field)
+    elif isinstance(obj, str) and field and obj:
+        yield field, obj
+
+
+def snapshot_files(source: list) -> list:
+    """Expand a snapshot stem ('fmg_adom_objects_<ts>') or explicit file list."""
+    files = []
+    for item in source:
+        if os.path.isfile(item):
+            files.append(item)
+        else:
+            files.extend(sorted(glob.glob(f"{item}_*.json")))
+    return files
+
+
+def load_adom_files(files: list):
+    """Yield (adom, {table: [entries]}) from extractor JSON files, one file at a time."""
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            doc = json.load(f)
+        for adom, tables in doc.get("data", {}).items():
+            yield adom, tables
+
+
+# ── build ──────────────────────────────────────────────────────────────────────
+
+def build(files: list, db_path: str) -> dict:
+    """
+    One pass over the snapshot: nodes and raw (src, field, value) references
+    go into SQLite; references are then resolved against all nodes in a
+    single join, so Global objects used from local ADOMs are found too.
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db = sqlite3.connect(db_path)
+    db.executescript(SCHEMA)
+    db.execute("CREATE TEMP TABLE refs (src INTEGER, adom TEXT, field TEXT, value TEXT)")
+    db.execute("CREATE TEMP TABLE field_family (field TEXT, prefix TEXT)")
+    db.executemany("INSERT INTO field_family VALUES (?, ?)",
+                   [(f, p) for f, prefixes in FIELD_FAMILIES.items() for p in prefixes])
+    started = time.time()
+    node_count = 0
+
+    with db:
+        for adom, tables in load_adom_files(files):
+            for table, entries in tables.items():
+                for entry in entries:
+                    if not isinstance(entry, dict):
+                        continue
+                    cur = db.execute("INSERT OR IGNORE INTO nodes (adom, tbl, name) VALUES (?, ?, ?)",
+                                     (adom, table, entry_key(entry)))
+                    src = cur.lastrowid if cur.rowcount else db.execute(
+                        "SELECT id FROM nodes WHERE adom = ? AND tbl = ? AND name = ?",
+                        (adom, table, entry_key(entry))).fetchone()[0]
+                    node_count += cur.rowcount
+                    db.executemany("INSERT INTO refs VALUES (?, ?, ?, ?)",
+                                   ((src, adom, f, v) for f, v in iter_refs(entry)))
+
+        db.execute("CREATE INDEX temp.idx_refs_value ON refs(value)")
+        db.execute(f"""
+            CREATE TEMP TABLE matches AS
+            SELECT r.src, r.field, r.value, n.id AS dst, n.adom = r.adom AS local
+            FROM refs r
+            JOIN nodes n ON n.name = r.value AND n.adom IN (r.adom, '{GLOBAL_ADOM}')
+            WHERE n.id != r.src
+              AND (NOT EXISTS (SELECT 1 FROM field_family ff WHERE ff.field = r.field)
+                   OR EXISTS (SELECT 1 FROM field_family ff
+                              WHERE ff.field = r.field AND substr(n.tbl, 1, length(ff.prefix)) = ff.prefix))
+        """)
+        db.execute("CREATE INDEX temp.idx_matches_ref ON matches(src, field, value, local)")
+        # an object of the referencing ADOM shadows a Global object of the same name
+        db.execute("""
+            INSERT OR IGNORE INTO edges (src, dst, field)
+            SELECT m.src, m.dst, m.field FROM matches m
+            WHERE m.local
+               OR NOT EXISTS (SELECT 1 FROM matches l
+                              WHERE l.src = m.src AND l.field = m.field AND l.value = m.value AND l.local)
+        """)
+        edge_count = db.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+        db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+            ("files", json.dumps(files)),
+            ("built_at", time.strftime("%Y-%m-%dT%H:%M:%S")),
+        ])
+    db.close()
+    return {"nodes": node_count, "edges": edge_count, "seconds": time.time() - started}
+
+
+# ── queries ────────────────────────────────────────────────────────────────────
+
+class ReferenceIndex:
+    def __init__(self, db_path: str):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Reference index {db_path} not found — run 'build' first.")
+        self.db = sqlite3.connect(db_path)
+
+    def close(self):
+        self.db.close()
+
+    def _targets(self, name: str, adom: str | None, table: str | None) -> list:
+        sql, args = "SELECT id FROM nodes WHERE name = ?", [name]
+        if adom:
+            sql += " AND adom = ?"
+            args.append(adom)
+        if table:
+            sql += " AND tbl = ?"
+            args.append(table)
+        return [row[0] for row in self.db.execute(sql, args)]
+
+    def where_used(self, name: str, adom: str | None = None, table: str | None = None,
+                   recursive: bool = False) -> list:
+        """[(depth, adom, table, name, field)] of objects referencing the given object."""
+        targets = self._targets(name, adom, table)
+        if not targets:
+            return []
+        placeholders = ",".join("?" * len(targets))
+        max_depth = 32 if recursive else 1
+        return self.db.execute(f"""
+            WITH RECURSIVE users(id, field, depth) AS (
+                SELECT e.src, e.field, 1 FROM edges e WHERE e.dst IN ({placeholders})
+                UNION
+                SELECT e.src, e.field, u.depth + 1 FROM edges e JOIN users u ON e.dst = u.id
+                WHERE u.depth < ?
+            )
+            SELECT MIN(u.depth), n.adom, n.tbl, n.name, u.field
+            FROM users u JOIN nodes n ON n.id = u.id
+            GROUP BY n.id, u.field
+            ORDER BY MIN(u.depth), n.adom, n.tbl, n.name
+        """, [*targets, max_depth]).fetchall()
+
+    def unused(self, adom: str | None = None, table: str | None = None) -> list:
+        """[(adom, table, name)] of objects nothing references."""
+        sql = """SELECT n.adom, n.tbl, n.name FROM nodes n
+                 WHERE NOT EXISTS (SELECT 1 FROM edges e WHERE e.dst = n.id)"""
+        args = []
+        if adom:
+            sql += " AND n.adom = ?"
+            args.append(adom)
+        if table:
+            sql += " AND n.tbl = ?"
+            args.append(table)
+        return self.db.execute(sql + " ORDER BY n.adom, n.tbl, n.name", args).fetchall()
+
+
+# ── CLI ────────────────────────────────────────────────────────────────────────
+
+def default_db(source: list) -> str:
+    stem = source[0]
+    if os.path.isfile(stem):
+        stem = stem.rsplit("_", 1)[0]
+    return f"{stem}_refs.sqlite"
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Where-used index over an adom_extractor.py snapshot.")
+    p.add_argument("--db", help="Index path (default: <stem>_refs.sqlite, or the newest one here)")
+    sub = p.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="Build the index from a snapshot")
+    b.add_argument("source", nargs="+", help="Snapshot stem (fmg_adom_objects_<ts>) or JSON files")
+    w = sub.add_parser("where-used", help="Objects that reference NAME")
+    w.add_argument("name")
+    w.add_argument("--adom", help="ADOM of the object (default: any)")
+    w.add_argument("--table", help="Table of the object, e.g. firewall/address")
+    w.add_argument("--recursive", action="store_true", help="Follow references transitively")
+    u = sub.add_parser("unused", help="Objects nothing references")
+    u.add_argument("--adom")
+    u.add_argument("--table")
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == "build":
+        files = snapshot_files(args.source)
+        if not files:
+            print(f"No snapshot files found for {' '.join(args.source)}")
+            sys.exit(1)
+        db_path = args.db or default_db(args.source)
+        stats = build(files, db_path)
+        print(f"Indexed {stats['nodes']} objects, {stats['edges']} references from "
+              f"{len(files)} file(s) in {stats['seconds']:.1f}s → {db_path}")
+        return
+
+    db_path = args.db or max(glob.glob("*_refs.sqlite"), key=os.path.getmtime, default="")
+    try:
+        index = ReferenceIndex(db_path or "refs.sqlite")
+    except FileNotFoundError as exc:
+        print(exc)
+        sys.exit(1)
+    try:
+        if args.command == "where-used":
+            rows = index.where_used(args.name, args.adom, args.table, args.recursive)
+            if not rows:
+                print(f"'{args.name}' is not referenced by any object.")
+            for depth, adom, table, name, field in rows:
+                indent = "  " * (depth - 1)
+                print(f"  {indent}{adom:<15} {table:<35} {name:<35} via {field}")
+        elif args.command == "unused":
+            rows = index.unused(args.adom, args.table)
+            for adom, table, name in rows:
+                print(f"  {adom:<15} {table:<35} {name}")
+            print(f"{len(rows)} unreferenced object(s)")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    profiling.run_main(main)
@@ -0,0 +1,199 @@
+"""
+Object-level diff between two adom_extractor.py snapshots.
+
+Objects are keyed by (ADOM, table, name / id / policyid / ...) so re-ordered
+tables do not show up as changes. The two snapshots are compared one ADOM
+file pair at a time: every entry is hashed (sorted-key JSON), and only
+entries whose hash differs are compared field by field. Cost is one hash
+per entry, and memory is bounded by the largest ADOM, not the snapshot.
+
+Field paths use dots for nested keys and [key] for list items that carry a
+name (members of sub-tables, dynamic_mapping scopes), e.g.
+  dynamic_mapping[FGT-01/root].subnet
+
+Usage:
+    python snapshot_diff.py fmg_adom_objects_20260101_120000 fmg_adom_objects_20260201_120000
+    python snapshot_diff.py old_root.json new_root.json --table firewall/address
+    python snapshot_diff.py OLD NEW --summary --json changes.json
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import profiling
+from entries import entry_key
+
+MISSING = "<absent>"
+
+
+# ── pairing ────────────────────────────────────────────────────────────────────
+
+def snapshot_map(source: str) -> dict:
+    """Stem -> {file suffix (ADOM display name): path}; a single file maps to itself."""
+    if os.path.isfile(source):
+        return {"": source}
+    prefix = os.path.basename(source) + "_"
+    return {os.path.basename(path)[len(prefix):-len(".json")]: path
+            for path in sorted(glob.glob(f"{source}_*.json"))}
+
+
+def load_tables(path: str | None) -> dict:
+    """{(adom, table): [entries]} for one extractor JSON file."""
+    if path is None:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    return {(adom, table): entries
+            for adom, tables in doc.get("data", {}).items()
+            for table, entries in tables.items()}
+
+
+# ── hashing / keys ─────────────────────────────────────────────────────────────
+
+def digest(entry) -> bytes:
+    return hashlib.blake2b(json.dumps(entry, sort_keys=True, separators=(",", ":"),
+                                      default=str).encode(), digest_size=16).digest()
+
+
+def keyed(entries: list) -> dict:
+    """{object key: entry}; unnamed or repeated keys get a '#n' ordinal."""
+    out, seen = {}, Counter()
+    for entry in entries:
+        key = entry_key(entry) if isinstance(entry, dict) else ""
+        seen[key] += 1
+        out[key if seen[key] == 1 and key else f"{key}#{seen[key]}"] = entry
+    return out
+
+
+def _item_key(item) -> str:
+    if not isinstance(item, dict):
+        return ""
+    key = entry_key(item)
+    if key:
+        return key
+    scope = item.get("_scope")
+    if isinstance(scope, list) and scope and isinstance(scope[0], dict):
+        return ",".join(f"{s.get('name', '')}/{s.get('vdom', '')}" for s in scope)
+    return ""
+
+
+# ── field diff ─────────────────────────────────────────────────────────────────
+
+def field_changes(old, new, path: str = "") -> list:
+    """[(path, old value, new value)] between two entries."""
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key in sorted(old.keys() | new.keys()):
+            sub = f"{path}.{key}" if path else key
+            changes.extend(field_changes(old.get(key, MISSING), new.get(key, MISSING), sub))
+        return changes
+    if isinstance(old, list) and isinstance(new, list):
+        old_keys = [_item_key(i) for i in old]
+        new_keys = [_item_key(i) for i in new]
+        if all(old_keys) and all(new_keys) and len(set(old_keys)) == len(old) \
+                and len(set(new_keys)) == len(new):
+            old_items, new_items = dict(zip(old_keys, old)), dict(zip(new_keys, new))
+            changes = []
+            for key in sorted(old_items.keys() | new_items.keys()):
+                changes.extend(field_changes(old_items.get(key, MISSING),
+                                             new_items.get(key, MISSING), f"{path}[{key}]"))
+            return changes
+    return [(path, old, new)]
+
+
+# ── diff ───────────────────────────────────────────────────────────────────────
+
+def diff_snapshots(old_source: str, new_source: str, tables: set | None = None):
+    """Yield ("added" | "removed" | "modified", adom, table, name, field changes)."""
+    old_files, new_files = snapshot_map(old_source), snapshot_map(new_source)
+    if "" in old_files or "" in new_files:          # explicit files: compare them directly
+        pairs = [(old_files.get("") or next(iter(old_files.values()), None),
+                  new_files.get("") or next(iter(new_files.values()), None))]
+    else:
+        pairs = [(old_files.get(s), new_files.get(s)) for s in sorted(old_files.keys() | new_files.keys())]
+
+    for old_path, new_path in pairs:
+        old_tables, new_tables = load_tables(old_path), load_tables(new_path)
+        for adom, table in sorted(old_tables.keys() | new_tables.keys()):
+            if tables and table not in tables:
+                continue
+            old_objs = keyed(old_tables.get((adom, table), []))
+            new_objs = keyed(new_tables.get((adom, table), []))
+            for name, entry in new_objs.items():
+                before = old_objs.get(name)
+                if before is None:
+                    yield "added", adom, table, name, []
+                elif digest(before) != digest(entry):
+                    # reordered named list items (or 1 vs 1.0) change the digest but no field
+                    changes = field_changes(before, entry)
+                    if changes:
+                        yield "modified", adom, table, name, changes
+            for name in old_objs:
+                if name not in new_objs:
+                    yield "removed", adom, table, name, []
+
+
+def _short(value, width: int = 60) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Diff two adom_extractor.py snapshots object by object.")
+    p.add_argument("old", help="Older snapshot stem (fmg_adom_objects_<ts>) or JSON file")
+    p.add_argument("new", help="Newer snapshot stem or JSON file")
+    p.add_argument("--table", action="append", help="Only this table (repeatable)")
+    p.add_argument("--summary", action="store_true", help="Only print counts per ADOM and table")
+    p.add_argument("--json", help="Also write every change, with field values, to this JSON file")
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    for source in (args.old, args.new):
+        if not snapshot_map(source):
+            print(f"No snapshot files found for {source}")
+            sys.exit(1)
+
+    started = time.time()
+    totals, per_table = Counter(), Counter()
+    records = [] if args.json else None
+    for kind, adom, table, name, changes in diff_snapshots(args.old, args.new, set(args.table or [])):
+        totals[kind] += 1
+        per_table[(adom, table, kind)] += 1
+        if records is not None:
+            records.append({"change": kind, "adom": adom, "table": table, "name": name,
+                            "fields": [{"path": p, "old": o, "new": n} for p, o, n in changes]})
+        if args.summary:
+            continue
+        mark = {"added": "+", "removed": "-", "modified": "~"}[kind]
+        print(f"  {mark} {adom:<15} {table:<35} {name}")
+        for path, old, new in changes:
+            print(f"        {path}: {_short(old)} → {_short(new)}")
+
+    if per_table:
+        print(f"\n  {'ADOM':<15} {'Table':<40} {'Added':>7} {'Removed':>8} {'Modified':>9}")
+        print("  " + "─" * 82)
+        for adom, table in sorted({(a, t) for a, t, _ in per_table}):
+            print(f"  {adom:<15} {table:<40} {per_table[(adom, table, 'added')]:>7} "
+                  f"{per_table[(adom, table, 'removed')]:>8} {per_table[(adom, table, 'modified')]:>9}")
+    print(f"\n  {totals['added']} added, {totals['removed']} removed, {totals['modified']} modified "
+          f"({time.time() - started:.1f}s)")
+    if records is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"old": args.old, "new": args.new, "changes": records}, f, indent=2, default=str)
+        print(f"  Changes written to {args.json}")
+
+
+if __name__ == "__main__":
+    profiling.run_main(main)
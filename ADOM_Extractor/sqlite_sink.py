@@ -0,0 +1,116 @@
+"""
+SQLite output for adom_extractor.py (--format sqlite).
+
+All ADOMs of a run go into one '<stem>.sqlite':
+
+  meta         key / value run metadata (extracted_at, adoms, ...)
+  entries      one row per object: adom, tbl, name, comment, data (the entry as JSON)
+  entries_fts  FTS5 index over the comment / comments / description text
+  "<table>"    one view per object table (e.g. "firewall/address") over entries
+
+Rows are streamed from the TableStore and inserted in BATCH_ROWS chunks
+inside a single transaction; indexes and the full-text index are built once
+after the load, which is much faster than maintaining them per row. Fields
+stay queryable without loading the snapshot, e.g.
+
+    SELECT adom, name, json_extract(data, '$.subnet') FROM "firewall/address";
+    SELECT adom, tbl, name FROM entries_fts JOIN entries ON entries.id = entries_fts.rowid
+     WHERE entries_fts MATCH 'decommission*';
+"""
+
+import json
+import os
+import sqlite3
+
+from entries import entry_key
+
+BATCH_ROWS = 50_000
+COMMENT_FIELDS = ("comment", "comments", "description")
+
+SCHEMA = """
+CREATE TABLE meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE entries (
+    id      INTEGER PRIMARY KEY,
+    adom    TEXT NOT NULL,
+    tbl     TEXT NOT NULL,
+    name    TEXT NOT NULL,
+    comment TEXT,
+    data    TEXT NOT NULL
+);
+"""
+
+INDEXES = (
+    "CREATE INDEX idx_entries_adom_tbl_name ON entries(adom, tbl, name)",
+    "CREATE INDEX idx_entries_tbl_name ON entries(tbl, name)",
+    "CREATE INDEX idx_entries_name ON entries(name)",
+)
+
+
+def _comment(entry: dict) -> str | None:
+    parts = [entry[f] for f in COMMENT_FIELDS if isinstance(entry.get(f), str) and entry[f]]
+    return " ".join(parts) or None
+
+
+def _rows(store, adom: str, table: str):
+    for entry in store.iter_entries(adom, table):
+        if isinstance(entry, dict):
+            yield (adom, table, entry_key(entry), _comment(entry),
+                   json.dumps(entry, separators=(",", ":"), default=str))
+
+
+def _batches(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_sqlite(data: dict, path: str) -> dict:
+    """Write a run (metadata + TableStore) to a new SQLite file. Returns counts for the caller to print."""
+    if os.path.exists(path):
+        os.remove(path)
+    store = data["data"]
+    db = sqlite3.connect(path, isolation_level=None)
+    stats = {"rows": 0, "tables": set(), "fts": True}
+    try:
+        db.execute("PRAGMA journal_mode = OFF")      # new file: nothing to roll back to
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute("PRAGMA cache_size = -65536")     # 64 MB page cache for the index builds
+        db.executescript(SCHEMA)
+        db.execute("BEGIN")
+        db.executemany("INSERT INTO meta VALUES (?, ?)",
+                       [(k, v if isinstance(v, str) else json.dumps(v, default=str))
+                        for k, v in data["metadata"].items()])
+        for adom in store.adoms():
+            for table in store.tables(adom):
+                stats["tables"].add(table)
+                for batch in _batches(_rows(store, adom, table), BATCH_ROWS):
+                    db.executemany(
+                        "INSERT INTO entries (adom, tbl, name, comment, data) VALUES (?, ?, ?, ?, ?)", batch)
+                    stats["rows"] += len(batch)
+        for statement in INDEXES:            # executescript() would commit the load early
+            db.execute(statement)
+        for table in sorted(stats["tables"]):
+            quoted = table.replace('"', '""')
+            literal = table.replace("'", "''")
+            db.execute(f'CREATE VIEW "{quoted}" AS SELECT id, adom, name, comment, data '
+                       f"FROM entries WHERE tbl = '{literal}'")
+        try:
+            db.execute("CREATE VIRTUAL TABLE entries_fts USING fts5("
+                       "comment, content='entries', content_rowid='id')")
+            db.execute("INSERT INTO entries_fts(entries_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError:
+            stats["fts"] = False                     # SQLite built without FTS5
+        db.execute("COMMIT")
+        db.execute("ANALYZE")
+    finally:
+        db.close()
+    stats["tables"] = len(stats["tables"])
+    return stats
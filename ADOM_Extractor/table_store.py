@@ -0,0 +1,173 @@
+"""
+Table storage for adom_extractor.py with an optional memory budget.
+
+Every fetched page of a table is appended to a TableStore instead of a
+dict of lists. Without a budget the store simply keeps the lists in memory.
+With one (--max-memory), the store tracks an estimate of what the buffered
+entries cost and, once the estimate goes over the budget, moves the largest
+buffers to on-disk segments (one NDJSON file per ADOM/table in a temporary
+directory). Writers read tables back through iter_entries(), which streams a
+spilled segment line by line followed by whatever is still in memory, so the
+output files are identical whether or not anything spilled.
+
+append() and discard() may be called from several fetch threads at once.
+
+The estimate is the compact JSON size of the entries times
+PY_OBJECT_FACTOR — parsed JSON takes several times its text size as Python
+objects.
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+PY_OBJECT_FACTOR = 3
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(text: str) -> int:
+    """'512M' / '2G' / '1.5g' / '1048576' -> bytes."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*", str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size '{text}' (use e.g. 512M or 2G)")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def fmt_size(num: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if num < 1024 or unit == "GB":
+            return f"{num:.0f} {unit}" if unit == "B" else f"{num:.1f} {unit}"
+        num /= 1024
+
+
+class _Table:
+    __slots__ = ("entries", "est_bytes", "segment", "spilled_count", "spilled_bytes")
+
+    def __init__(self):
+        self.entries = []
+        self.est_bytes = 0
+        self.segment = None       # path of the on-disk part, if any
+        self.spilled_count = 0
+        self.spilled_bytes = 0    # size of the on-disk part
+
+    def __len__(self):
+        return self.spilled_count + len(self.entries)
+
+
+class TableStore:
+    def __init__(self, max_bytes: int | None = None, spill_dir: str | None = None):
+        self.max_bytes = max_bytes
+        self._spill_root = spill_dir
+        self._tmpdir = None
+        self._tables: dict = {}          # adom -> {table_name: _Table}
+        self.mem_bytes = 0
+        self.peak_bytes = 0
+        self.spilled_bytes = 0
+        self.spill_events = 0
+        self._lock = threading.Lock()
+
+    # ── writing ────────────────────────────────────────────────────────────────
+
+    def append(self, adom: str, table: str, entries: list) -> None:
+        cost = 0
+        if self.max_bytes is not None:
+            cost = len(json.dumps(entries, separators=(",", ":"), default=str)) * PY_OBJECT_FACTOR
+        with self._lock:
+            tbl = self._tables.setdefault(adom, {}).setdefault(table, _Table())
+            tbl.entries.extend(entries)
+            if self.max_bytes is None:
+                return
+            tbl.est_bytes += cost
+            self.mem_bytes += cost
+            self.peak_bytes = max(self.peak_bytes, self.mem_bytes)
+            if self.mem_bytes > self.max_bytes:
+                self._spill()
+
+    def discard(self, adom: str, table: str) -> None:
+        """Forget a table whose fetch failed part-way."""
+        with self._lock:
+            tbl = self._tables.get(adom, {}).pop(table, None)
+            if tbl is not None:
+                self.mem_bytes -= tbl.est_bytes
+                self.spilled_bytes -= tbl.spilled_bytes
+                if tbl.segment and os.path.exists(tbl.segment):
+                    os.remove(tbl.segment)
+
+    def ensure(self, adom: str, tables: list = ()) -> None:
+        """
+        Register an ADOM even if none of its tables returned data, and its
+        tables in output order (fetches may finish in any order).
+        """
+        with self._lock:
+            registered = self._tables.setdefault(adom, {})
+            for table in tables:
+                registered.setdefault(table, _Table())
+
+    def _segment_path(self, adom: str, table: str) -> str:
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="fmg_extract_spill_", dir=self._spill_root)
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in f"{adom}__{table}")
+        return os.path.join(self._tmpdir, f"{safe}.ndjson")
+
+    def _spill(self) -> None:
+        """Move the biggest in-memory buffers to disk until back under 3/4 of the budget."""
+        target = self.max_bytes * 3 // 4
+        buffered = sorted(
+            ((adom, name, tbl) for adom, tables in self._tables.items()
+             for name, tbl in tables.items() if tbl.entries),
+            key=lambda item: item[2].est_bytes, reverse=True)
+        for adom, name, tbl in buffered:
+            if self.mem_bytes <= target:
+                break
+            if tbl.segment is None:
+                tbl.segment = self._segment_path(adom, name)
+            with open(tbl.segment, "a", encoding="utf-8") as f:
+                start = f.tell()
+                for entry in tbl.entries:
+                    f.write(json.dumps(entry, separators=(",", ":"), default=str))
+                    f.write("\n")
+                written = f.tell() - start
+            tbl.spilled_bytes += written
+            self.spilled_bytes += written
+            tbl.spilled_count += len(tbl.entries)
+            tbl.entries = []
+            self.mem_bytes -= tbl.est_bytes
+            tbl.est_bytes = 0
+            self.spill_events += 1
+
+    # ── reading ────────────────────────────────────────────────────────────────
+
+    def adoms(self) -> list:
+        return list(self._tables)
+
+    def tables(self, adom: str) -> list:
+        return list(self._tables.get(adom, {}))
+
+    def count(self, adom: str, table: str) -> int:
+        return len(self._tables[adom][table])
+
+    def iter_entries(self, adom: str, table: str):
+        tbl = self._tables[adom][table]
+        if tbl.segment:
+            with open(tbl.segment, encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+        yield from tbl.entries
+
+    def spilled_tables(self) -> int:
+        return sum(1 for tables in self._tables.values() for t in tables.values() if t.segment)
+
+    def close(self) -> None:
+        if self._tmpdir:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,91 @@
+"""
+Indexed ADOM inventory for adom_upgrade.py.
+
+One bulk /dvmdb/adom fetch (projected to the handful of fields the upgrader
+reads) builds an index by name and by OID, with versions parsed once into
+(major, minor) tuples. After an upgrade task only the touched ADOMs are
+refreshed — again with a single bulk request filtered by name — instead of
+one /dvmdb/adom/{name} call per ADOM.
+"""
+
+from upgrade_planner import adom_version, fmt_version
+
+ADOM_FIELDS = ["name", "oid", "os_ver", "mr", "restricted_prds"]
+GLOBAL_OID = "10"
+
+
+class AdomRecord:
+    __slots__ = ("name", "oid", "prds", "version", "raw")
+
+    def __init__(self, raw: dict):
+        self.raw = raw
+        self.name = raw.get("name")
+        self.oid = str(raw.get("oid"))
+        self.prds = raw.get("restricted_prds")
+        self.version = adom_version(raw)
+
+    @property
+    def version_str(self) -> str:
+        return fmt_version(self.version)
+
+    @property
+    def is_global(self) -> bool:
+        return self.oid == GLOBAL_OID
+
+
+class AdomInventory:
+    """
+    fetch(params_extra) must perform a JSON-RPC "get" on /dvmdb/adom with the
+    given extra params and return the parsed response.
+    """
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self.by_name: dict = {}
+        self.by_oid: dict = {}
+        self.order: list = []        # names in FMG order
+
+    def _get(self, extra: dict) -> list:
+        res = self._fetch({"fields": ADOM_FIELDS, **extra})
+        result = res.get("result", [{}])[0]
+        status = result.get("status", {})
+        if status.get("code", 0) != 0:
+            raise RuntimeError(f"Failed to list ADOMs: {status.get('message')}")
+        data = result.get("data", [])
+        return data if isinstance(data, list) else [data]
+
+    def _index(self, raw: dict) -> AdomRecord:
+        rec = AdomRecord(raw)
+        if rec.name not in self.by_name:
+            self.order.append(rec.name)
+        self.by_name[rec.name] = rec
+        self.by_oid[rec.oid] = rec
+        return rec
+
+    def load(self) -> "AdomInventory":
+        self.by_name.clear()
+        self.by_oid.clear()
+        self.order.clear()
+        for raw in self._get({}):
+            self._index(raw)
+        return self
+
+    def refresh(self, names) -> list:
+        """Re-read only the given ADOMs in one request. Returns their records."""
+        names = [n for n in dict.fromkeys(names) if n]
+        if not names:
+            return []
+        return [self._index(raw) for raw in self._get({"filter": ["name", "in", *names]})]
+
+    def __iter__(self):
+        return (self.by_name[n] for n in self.order)
+
+    def __len__(self):
+        return len(self.order)
+
+    def get(self, name: str) -> AdomRecord | None:
+        return self.by_name.get(name)
+
+    @property
+    def global_adom(self) -> AdomRecord | None:
+        return self.by_oid.get(GLOBAL_OID)
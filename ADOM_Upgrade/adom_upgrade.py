@@ -1,8 +1,18 @@
-import requests
+import argparse
+import os
+import sys
 import time
+import requests
 import urllib3
 from datetime import datetime, timezone
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import profiling
+from fmg_common.task_watcher import TaskWatcher
+import upgrade_planner
+from adom_inventory import AdomInventory
+from upgrade_planner import fmt_version
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # --- Configuration ---
@@ -42,151 +52,183 @@ def fmg_rpc(method, url, data=None, session=None, params_extra=None):
     return requests.post(URL, json=payload, verify=False, timeout=20).json()
 
 
-def wait_for_task(task_id, session_id):
-    while True:
-        # Get task details including history lines
-        task_res = fmg_rpc("get", f"/task/task/{task_id}", session=session_id)
-        task_data = task_res.get("result", [{}])[0].get("data", {})
-        percent = task_data.get("percent", 0)
-
-        print(f"    Task Progress: {percent}%", end='\r')
-
-        if int(percent) >= 100:
-            print()
-            # If the state is not 'done', or percent is 100 but no upgrade happened
-            # we check the logs for errors
-            if task_data.get("state") != "done":
-                history = task_data.get("line", [])
-                # Get the last meaningful detail from the logs
-                error_detail = "Unknown error"
-                for line in reversed(history):
-                    detail = line.get("detail", "")
-                    if detail:
-                        error_detail = detail
-                        break
-                print(f"    [!] TASK STATUS: {error_detail}")
-            break
-        time.sleep(2)
+def fmg_rpc_multi(method, params, session=None):
+    payload = {"id": 1, "method": method, "params": params}
+    if session: payload["session"] = session
+    return requests.post(URL, json=payload, verify=False, timeout=20).json()
 
 
-# --- EXECUTION ---
-login_res = fmg_rpc("exec", "/sys/login/user", data={"user": USER, "passwd": PASS})
-session_id = login_res.get("session")
-
-try:
-    status_res = fmg_rpc("get", "/sys/status", session=session_id)
-    fmg_ver = f"{status_res['result'][0]['data']['Major']}.{status_res['result'][0]['data']['Minor']}"
-
-    adom_res = fmg_rpc("get", "/dvmdb/adom", session=session_id, params_extra={"option": "name"})
-    adoms = adom_res.get("result", [{}])[0].get("data", [])
-
-    global_data = next(a for a in adoms if str(a.get('oid')) == "10")
-    # Initial global version query
-    g_info = fmg_rpc("get", f"/dvmdb/adom/{global_data.get('name')}", session=session_id)
-    gd = g_info.get("result", [{}])[0].get("data", {})
-    g_ver_orig = f"{str(gd.get('os_ver')).split('.')[0]}.{gd.get('mr')}"
-
-    print("=" * 65)
-    print(f"FORTIMANAGER SYSTEM VERSION: {fmg_ver}")
-    print(f"CURRENT GLOBAL ADOM VERSION: {g_ver_orig}")
-    print("=" * 65)
-
-    target_v = min(float(fmg_ver), float(g_ver_orig) + 0.2)
-    target_str = f"{target_v:.1f}"
-
-    version_map = {}
-    for a in adoms:
-        v = f"{str(a.get('os_ver')).split('.')[0]}.{a.get('mr')}"
-        version_map[a.get('name')] = {"prev": v, "curr": v, "upgraded": False}
-
-    # --- PHASE 1: UPGRADE LOCAL ADOMS ---
-    print(f"[{now_iso()}] STEP 1: Upgrading local ADOMS first...")
-
-    for adom in adoms:
-        name, oid, raw_prods = adom.get("name"), str(adom.get("oid")), adom.get("restricted_prds")
-        if oid == "10" or name in UPGRADE_IGNORE or raw_prods not in UPGRADABLE_ADOMS:
-            continue
-
-        cur_v = float(version_map[name]["prev"])
-        if cur_v < target_v:
-            step_v = min(target_v, cur_v + 0.2)
-            step_str = f"{step_v:.1f}"
-
-            print(f"    >>> Upgrading Local '{name}' ({cur_v} -> {step_str})")
-            up_exec = fmg_rpc("exec", f"/pm/config/adom/{oid}/_upgrade", session=session_id)
-            wait_for_task(up_exec['result'][0]['data']['task'], session_id)
-
-            # Re-query actual ADOM version after task completion
-            updated_info = fmg_rpc("get", f"/dvmdb/adom/{name}", session=session_id)
-            u_data = updated_info.get("result", [{}])[0].get("data", {})
-            real_v = f"{str(u_data.get('os_ver')).split('.')[0]}.{u_data.get('mr')}"
-
-            version_map[name]["curr"] = real_v
-            version_map[name]["upgraded"] = True if float(real_v) > cur_v else False
-
-    # --- PHASE 2: UPGRADE GLOBAL ---
-    print("-" * 65)
-    all_ready = True
-    for name, vdata in version_map.items():
-        match_adom = next(a for a in adoms if a['name'] == name)
-        if str(match_adom.get('oid')) == "10" or name in UPGRADE_IGNORE or match_adom.get(
-                'restricted_prds') not in UPGRADABLE_ADOMS:
-            continue
-        if float(vdata["curr"]) < target_v:
-            all_ready = False
-
-    if all_ready and float(g_ver_orig) < target_v:
-        g_step_v = min(target_v, float(g_ver_orig) + 0.2)
-        g_step_str = f"{g_step_v:.1f}"
-        print(f"[{now_iso()}] STEP 3: Now upgrading Global Database to {g_step_str}...")
-        global_up = fmg_rpc("exec", "/pm/config/adom/10/_upgrade", session=session_id)
-        wait_for_task(global_up['result'][0]['data']['task'], session_id)
-
-        updated_g = fmg_rpc("get", "/dvmdb/adom/rootp", session=session_id)
-        ug_data = updated_g.get("result", [{}])[0].get("data", {})
-        real_gv = f"{str(ug_data.get('os_ver')).split('.')[0]}.{ug_data.get('mr')}"
-
-        version_map[global_data.get('name')]["curr"] = real_gv
-        version_map[global_data.get('name')]["upgraded"] = True if float(real_gv) > float(g_ver_orig) else False
-    else:
-        print(f"[{now_iso()}] GLOBAL UPGRADE: Skipped (Already at target or locals not ready).")
-
-    # --- FINAL SUMMARY REPORT ---
-    print("\n" + "=" * 110)
-    print(f"{'FINAL ADOM UPGRADE STATUS REPORT':^110}")
-    print("=" * 110)
-    print(f"{'ADOM Name':<25} | {'Product Type':<25} | {'Prev Ver':<10} | {'Curr Ver':<10} | {'Status'}")
-    print("-" * 110)
-
-
-    def sort_logic(x):
-        is_global = str(x.get('oid')) == "10"
-        is_ignored = x.get('name') in UPGRADE_IGNORE and not is_global
-        is_upgradable = x.get('restricted_prds') in UPGRADABLE_ADOMS or is_global
-        if is_upgradable and not is_ignored and not is_global:
-            group = 0
-        elif is_global:
-            group = 1
-        else:
-            group = 2
-        return (group, x.get('name'))
+def make_task_watcher(session_id):
+    def fetch(params):
+        return fmg_rpc_multi("get", params, session=session_id).get("result", [])
 
+    def show(task_id, task_data):
+        print(f"    Task Progress: {task_data.get('percent', 0)}%", end='\r')
 
-    for adom in sorted(adoms, key=sort_logic):
-        name, oid, raw_p = adom.get('name'), str(adom.get('oid')), adom.get('restricted_prds')
-        v_data = version_map[name]
-        if oid == "10":
-            type_n = "Global Database"
-        elif raw_p in UPGRADABLE_ADOMS and name not in UPGRADE_IGNORE:
-            type_n = UPGRADABLE_ADOMS[raw_p]
+    return TaskWatcher(fetch, min_interval=1, max_interval=10, on_update=show)
+
+
+def wait_for_task(task_id, watcher):
+    task_data = watcher.wait(task_id)
+    print()
+    # If the state is not 'done', or percent is 100 but no upgrade happened
+    # we check the logs for errors
+    if task_data.get("state") not in ("done", 4):
+        history = task_data.get("line", [])
+        # Get the last meaningful detail from the logs
+        error_detail = "Unknown error"
+        for line in reversed(history):
+            detail = line.get("detail", "")
+            if detail:
+                error_detail = detail
+                break
+        print(f"    [!] TASK STATUS: {error_detail}")
+    return task_data
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Sequential ADOM upgrader for FortiManager.")
+    p.add_argument("--plan", action="store_true",
+                   help="Dry run: print the full multi-hop upgrade plan with time estimates and exit")
+    p.add_argument("--max-parallel", type=int, default=4,
+                   help="Widest parallel schedule the planner may consider (default: 4)")
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+
+# --- EXECUTION ---
+def main():
+    args = parse_args()
+    login_res = fmg_rpc("exec", "/sys/login/user", data={"user": USER, "passwd": PASS})
+    session_id = login_res.get("session")
+    watcher = make_task_watcher(session_id)
+
+    try:
+        status_res = fmg_rpc("get", "/sys/status", session=session_id)
+        fmg_ver = f"{status_res['result'][0]['data']['Major']}.{status_res['result'][0]['data']['Minor']}"
+
+        inventory = AdomInventory(
+            lambda extra: fmg_rpc("get", "/dvmdb/adom", session=session_id, params_extra=extra)).load()
+        global_rec = inventory.global_adom
+        g_ver_orig = global_rec.version
+        if g_ver_orig is None:
+            print(f"Cannot read the Global ADOM version (os_ver={global_rec.raw.get('os_ver')!r}); "
+                  f"nothing to plan against.")
+            raise SystemExit(1)
+
+        print("=" * 65)
+        print(f"FORTIMANAGER SYSTEM VERSION: {fmg_ver}")
+        print(f"CURRENT GLOBAL ADOM VERSION: {global_rec.version_str}")
+        print("=" * 65)
+
+        def is_upgradable_local(rec):
+            # ADOMs without a readable version are reported but never planned or upgraded
+            return (not rec.is_global and rec.name not in UPGRADE_IGNORE
+                    and rec.prds in UPGRADABLE_ADOMS and rec.version is not None)
+
+        locals_to_check = [rec for rec in inventory if is_upgradable_local(rec)]
+
+        if args.plan:
+            plan_locals = [(rec.name, rec.prds, rec.version) for rec in locals_to_check]
+            model = upgrade_planner.DurationModel(upgrade_planner.load_history())
+            steps = upgrade_planner.build_plan(
+                plan_locals, g_ver_orig, upgrade_planner.parse_version(fmg_ver), model)
+            width, makespan, by_width = upgrade_planner.best_schedule(steps, args.max_parallel)
+            upgrade_planner.print_plan(steps, width, makespan, by_width)
+            raise SystemExit(0)
+
+        fmg_v = upgrade_planner.parse_version(fmg_ver)
+        target_v = min(fmg_v, upgrade_planner.next_version(g_ver_orig) or g_ver_orig)
+
+        version_map = {}
+        for rec in inventory:
+            version_map[rec.name] = {"prev": rec.version, "curr": rec.version, "upgraded": False}
+
+        # --- PHASE 1: UPGRADE LOCAL ADOMS ---
+        print(f"[{now_iso()}] STEP 1: Upgrading local ADOMS first...")
+
+        elapsed_by_name = {}
+        for rec in locals_to_check:
+            cur_v = version_map[rec.name]["prev"]
+            if cur_v < target_v:
+                step_v = min(target_v, upgrade_planner.next_version(cur_v) or target_v)
+
+                print(f"    >>> Upgrading Local '{rec.name}' ({fmt_version(cur_v)} -> {fmt_version(step_v)})")
+                t_start = time.time()
+                up_exec = fmg_rpc("exec", f"/pm/config/adom/{rec.oid}/_upgrade", session=session_id)
+                wait_for_task(up_exec['result'][0]['data']['task'], watcher)
+                elapsed_by_name[rec.name] = time.time() - t_start
+
+        # Re-query actual versions of the upgraded ADOMs in one request
+        for rec in inventory.refresh(elapsed_by_name):
+            vdata = version_map[rec.name]
+            vdata["curr"] = rec.version
+            vdata["upgraded"] = rec.version is not None and rec.version > vdata["prev"]
+            if vdata["upgraded"]:
+                upgrade_planner.record_duration(rec.name, rec.prds, vdata["prev"], rec.version,
+                                                elapsed_by_name[rec.name])
+
+        # --- PHASE 2: UPGRADE GLOBAL ---
+        print("-" * 65)
+        all_ready = all(version_map[rec.name]["curr"] is not None and version_map[rec.name]["curr"] >= target_v
+                        for rec in locals_to_check)
+
+        if all_ready and g_ver_orig < target_v:
+            print(f"[{now_iso()}] STEP 3: Now upgrading Global Database to {fmt_version(target_v)}...")
+            t_start = time.time()
+            global_up = fmg_rpc("exec", f"/pm/config/adom/{global_rec.oid}/_upgrade", session=session_id)
+            wait_for_task(global_up['result'][0]['data']['task'], watcher)
+            t_elapsed = time.time() - t_start
+
+            global_rec = inventory.refresh([global_rec.name])[0]
+            g_data = version_map[global_rec.name]
+            g_data["curr"] = global_rec.version
+            g_data["upgraded"] = global_rec.version is not None and global_rec.version > g_ver_orig
+            if g_data["upgraded"]:
+                upgrade_planner.record_duration(upgrade_planner.GLOBAL_NAME, upgrade_planner.GLOBAL_NAME,
+                                                g_ver_orig, global_rec.version, t_elapsed)
         else:
-            type_n = "Non-Upgradable/System"
-        status = "Upgraded" if v_data["upgraded"] else (
-            "Ignored" if type_n == "Non-Upgradable/System" else "Not Upgraded")
-        print(f"{name:<25} | {type_n:<25} | {v_data['prev']:<10} | {v_data['curr']:<10} | {status}")
-    print("=" * 110)
-
-finally:
-    if 'session_id' in locals():
-        fmg_rpc("exec", "/sys/logout", session=session_id)
-        print(f"[{now_iso()}] SESSION CLOSED.")
+            print(f"[{now_iso()}] GLOBAL UPGRADE: Skipped (Already at target or locals not ready).")
+
+        # --- FINAL SUMMARY REPORT ---
+        print("\n" + "=" * 110)
+        print(f"{'FINAL ADOM UPGRADE STATUS REPORT':^110}")
+        print("=" * 110)
+        print(f"{'ADOM Name':<25} | {'Product Type':<25} | {'Prev Ver':<10} | {'Curr Ver':<10} | {'Status'}")
+        print("-" * 110)
+
+
+        def sort_logic(rec):
+            if is_upgradable_local(rec):
+                group = 0
+            elif rec.is_global:
+                group = 1
+            else:
+                group = 2
+            return (group, rec.name)
+
+
+        for rec in sorted(inventory, key=sort_logic):
+            v_data = version_map[rec.name]
+            if rec.is_global:
+                type_n = "Global Database"
+            elif is_upgradable_local(rec):
+                type_n = UPGRADABLE_ADOMS[rec.prds]
+            elif rec.version is None and rec.prds in UPGRADABLE_ADOMS:
+                type_n = "Unknown Version"
+            else:
+                type_n = "Non-Upgradable/System"
+            status = "Upgraded" if v_data["upgraded"] else (
+                "Ignored" if type_n in ("Non-Upgradable/System", "Unknown Version") else "Not Upgraded")
+            print(f"{rec.name:<25} | {type_n:<25} | {fmt_version(v_data['prev']):<10} | "
+                  f"{fmt_version(v_data['curr']):<10} | {status}")
+        print("=" * 110)
+
+    finally:
+        if 'session_id' in locals():
+            fmg_rpc("exec", "/sys/logout", session=session_id)
+            print(f"[{now_iso()}] SESSION CLOSED.")
+
+
+if __name__ == "__main__":
+    profiling.run_main(main)
@@ -0,0 +1,309 @@
+"""
+ADOM upgrade plan simulator.
+
+Builds the complete multi-hop upgrade plan up front instead of discovering it
+one `cur_v + 0.2` step at a time:
+
+  * every local ADOM walks the version ladder one hop at a time up to the
+    FortiManager's own version,
+  * a local ADOM may only move to version V once Global is at the hop before
+    V, and Global may only move to V once every local ADOM has reached V.
+
+The result is a dependency graph (DAG) of upgrade steps. Each step gets a
+duration estimate from the history of previous runs (UPGRADE_HISTORY_FILE,
+written by adom_upgrade.py), which gives the critical path and the shortest
+possible window. Several parallel widths are simulated with critical-path
+list scheduling and the one with the smallest makespan is chosen.
+
+Nothing here talks to the FortiManager — it works on the ADOM records that
+adom_upgrade.py already fetched.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+UPGRADE_HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    "upgrade_history.json")
+DEFAULT_STEP_SECONDS = 120
+GLOBAL_NAME = "Global"
+
+# ADOM database versions in upgrade order — an upgrade always moves exactly
+# one position to the right.
+VERSION_LADDER = [
+    (5, 0), (5, 2), (5, 4), (5, 6),
+    (6, 0), (6, 2), (6, 4),
+    (7, 0), (7, 2), (7, 4), (7, 6),
+    (8, 0),
+]
+
+
+def parse_version(value) -> tuple:
+    """'7.4' / 7.4 / (7, 4) -> (7, 4)."""
+    if isinstance(value, tuple):
+        return value
+    major, _, minor = str(value).partition(".")
+    return int(major), int(minor or 0)
+
+
+def fmt_version(ver: tuple | None) -> str:
+    return f"{ver[0]}.{ver[1]}" if ver else "unknown"
+
+
+def adom_version(adom: dict) -> tuple | None:
+    """
+    Version tuple from a /dvmdb/adom record (os_ver '7.0' / 7, mr 4), or None
+    when os_ver / mr are missing or not numeric ('unknown', None, ...).
+    """
+    try:
+        return int(str(adom.get("os_ver")).split(".")[0]), int(adom.get("mr") or 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def next_version(ver: tuple) -> tuple | None:
+    """Next ADOM version on the ladder, or None when already at the top."""
+    later = [v for v in VERSION_LADDER if v > ver]
+    return later[0] if later else None
+
+
+def hops(start: tuple, target: tuple) -> list:
+    """Versions visited when walking from start up to target (exclusive/inclusive)."""
+    path, cur = [], start
+    while cur < target:
+        nxt = next_version(cur)
+        if nxt is None or nxt > target:
+            break
+        path.append(nxt)
+        cur = nxt
+    return path
+
+
+# ── duration history ───────────────────────────────────────────────────────────
+
+def load_history(path: str | None = None) -> list:
+    path = path or UPGRADE_HISTORY_FILE
+    if not os.path.isfile(path):
+        return []
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def record_duration(adom: str, product, from_v, to_v, seconds: float,
+                    path: str | None = None) -> None:
+    """Append one finished upgrade task to the history file."""
+    path = path or UPGRADE_HISTORY_FILE
+    history = load_history(path)
+    history.append({
+        "adom": adom,
+        "product": str(product),
+        "from": fmt_version(parse_version(from_v)),
+        "to": fmt_version(parse_version(to_v)),
+        "seconds": round(seconds, 1),
+        "at": datetime.now(timezone.utc).isoformat(),
+    })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+
+
+class DurationModel:
+    """
+    Estimates a step's duration from history, from most to least specific:
+    same ADOM and hop → same product and hop → same hop → same product →
+    everything → DEFAULT_STEP_SECONDS.
+    """
+
+    def __init__(self, history: list):
+        self._buckets: dict = {}
+        for rec in history:
+            hop = (rec.get("from"), rec.get("to"))
+            for key in (("adom", rec.get("adom"), hop), ("prod", rec.get("product"), hop),
+                        ("hop", hop), ("prod_any", rec.get("product")), ("all",)):
+                self._buckets.setdefault(key, []).append(float(rec.get("seconds", 0)))
+
+    def estimate(self, adom: str, product, from_v: tuple, to_v: tuple) -> float:
+        hop = (fmt_version(from_v), fmt_version(to_v))
+        for key in (("adom", adom, hop), ("prod", str(product), hop),
+                    ("hop", hop), ("prod_any", str(product)), ("all",)):
+            samples = self._buckets.get(key)
+            if samples:
+                return sum(samples) / len(samples)
+        return float(DEFAULT_STEP_SECONDS)
+
+
+# ── plan graph ─────────────────────────────────────────────────────────────────
+
+class Step:
+    def __init__(self, key: str, adom: str, from_v: tuple, to_v: tuple, seconds: float):
+        self.key = key
+        self.adom = adom
+        self.from_v = from_v
+        self.to_v = to_v
+        self.seconds = seconds
+        self.deps: list = []
+        self.rank = 0.0          # longest path from this step to the end
+        self.start = 0.0
+        self.end = 0.0
+        self.critical = False
+
+    def __repr__(self):
+        return f"Step({self.key}, {self.seconds:.0f}s)"
+
+
+def build_plan(local_adoms: list, global_version: tuple, target: tuple,
+               model: DurationModel) -> list:
+    """
+    Build the upgrade DAG.
+
+    local_adoms is a list of (name, product, version_tuple). Returns the steps
+    in a valid topological order.
+    """
+    steps: list = []
+    global_steps: dict = {}          # to_version -> Step
+    local_steps: dict = {}           # (name, to_version) -> Step
+
+    global_path = hops(global_version, target)
+    for name, product, ver in local_adoms:
+        if ver is None:                      # unreadable os_ver: never planned
+            continue
+        prev = None
+        for to_v in hops(ver, target):
+            from_v = prev.to_v if prev else ver
+            step = Step(f"{name}@{fmt_version(to_v)}", name, from_v, to_v,
+                        model.estimate(name, product, from_v, to_v))
+            if prev:
+                step.deps.append(prev)
+            local_steps[(name, to_v)] = step
+            prev = step
+
+    prev_global = None
+    for to_v in global_path:
+        from_v = prev_global.to_v if prev_global else global_version
+        step = Step(f"{GLOBAL_NAME}@{fmt_version(to_v)}", GLOBAL_NAME, from_v, to_v,
+                    model.estimate(GLOBAL_NAME, GLOBAL_NAME, from_v, to_v))
+        if prev_global:
+            step.deps.append(prev_global)
+        global_steps[to_v] = step
+        prev_global = step
+
+    # cross-ADOM edges
+    for (name, to_v), step in local_steps.items():
+        before = [v for v in VERSION_LADDER if v < to_v]
+        gate = global_steps.get(before[-1]) if before else None
+        if gate:                                   # Global must be one hop behind
+            step.deps.append(gate)
+    for to_v, gstep in global_steps.items():
+        gstep.deps.extend(s for (n, v), s in local_steps.items() if v == to_v)
+
+    # topological order (Kahn)
+    all_steps = list(local_steps.values()) + list(global_steps.values())
+    indeg = {s.key: len(s.deps) for s in all_steps}
+    children: dict = {s.key: [] for s in all_steps}
+    for s in all_steps:
+        for d in s.deps:
+            children[d.key].append(s)
+    ready = [s for s in all_steps if indeg[s.key] == 0]
+    while ready:
+        s = ready.pop(0)
+        steps.append(s)
+        for c in children[s.key]:
+            indeg[c.key] -= 1
+            if indeg[c.key] == 0:
+                ready.append(c)
+    if len(steps) != len(all_steps):
+        raise RuntimeError("Upgrade plan contains a dependency cycle.")
+
+    # rank = longest remaining path, used for critical path and priorities
+    for s in reversed(steps):
+        s.rank = s.seconds + max((c.rank for c in children[s.key]), default=0.0)
+    return steps
+
+
+def critical_path(steps: list) -> list:
+    """Longest-duration chain through the DAG."""
+    if not steps:
+        return []
+    children: dict = {s.key: [] for s in steps}
+    for s in steps:
+        for d in s.deps:
+            children[d.key].append(s)
+    cur = max((s for s in steps if not s.deps), key=lambda s: s.rank)
+    path = [cur]
+    while children[cur.key]:
+        cur = max(children[cur.key], key=lambda s: s.rank)
+        path.append(cur)
+    return path
+
+
+def simulate(steps: list, width: int) -> float:
+    """
+    List-schedule the DAG on `width` concurrent upgrade slots, highest rank
+    first. Fills in start/end on every step and returns the makespan.
+    """
+    finished: set = set()
+    running: list = []       # (end_time, step)
+    waiting = list(steps)
+    clock = 0.0
+    while waiting or running:
+        ready = [s for s in waiting if all(d.key in finished for d in s.deps)]
+        ready.sort(key=lambda s: -s.rank)
+        while ready and len(running) < width:
+            s = ready.pop(0)
+            waiting.remove(s)
+            s.start, s.end = clock, clock + s.seconds
+            running.append((s.end, s))
+        running.sort(key=lambda r: r[0])
+        end, s = running.pop(0)
+        clock = end
+        finished.add(s.key)
+    return clock
+
+
+def best_schedule(steps: list, max_parallel: int) -> tuple[int, float, dict]:
+    """
+    Try widths 1..max_parallel and keep the shortest makespan (ties go to
+    the narrower schedule — less load on the FortiManager).
+    Returns (width, makespan, {width: makespan}).
+    """
+    results = {w: simulate(steps, w) for w in range(1, max(1, max_parallel) + 1)}
+    width = min(results, key=lambda w: (round(results[w], 3), w))
+    simulate(steps, width)   # leave the chosen schedule on the steps
+    for s in critical_path(steps):
+        s.critical = True
+    return width, results[width], results
+
+
+def _fmt_secs(sec: float) -> str:
+    m, s = divmod(int(round(sec)), 60)
+    h, m = divmod(m, 60)
+    return f"{h:d}:{m:02d}:{s:02d}"
+
+
+def print_plan(steps: list, width: int, makespan: float, by_width: dict) -> None:
+    print("=" * 90)
+    print(f"{'UPGRADE PLAN (DRY RUN)':^90}")
+    print("=" * 90)
+    if not steps:
+        print("  Nothing to upgrade — every ADOM is already at the target version.")
+        print("=" * 90)
+        return
+    print(f"{'Start':>8} | {'End':>8} | {'ADOM':<25} | {'From':<6} | {'To':<6} | {'Est.':>8} |")
+    print("-" * 90)
+    for s in sorted(steps, key=lambda s: (s.start, s.key)):
+        flag = "critical" if s.critical else ""
+        print(f"{_fmt_secs(s.start):>8} | {_fmt_secs(s.end):>8} | {s.adom:<25} | "
+              f"{fmt_version(s.from_v):<6} | {fmt_version(s.to_v):<6} | {_fmt_secs(s.seconds):>8} | {flag}")
+    print("-" * 90)
+    cp = critical_path(steps)
+    print(f"  Steps           : {len(steps)}")
+    print(f"  Critical path   : {_fmt_secs(sum(s.seconds for s in cp))} "
+          f"({' -> '.join(s.key for s in cp)})")
+    print(f"  Serial total    : {_fmt_secs(sum(s.seconds for s in steps))}")
+    for w, span in by_width.items():
+        mark = "  <- chosen" if w == width else ""
+        print(f"  Width {w:<2} window : {_fmt_secs(span)}{mark}")
+    print(f"  Est. window     : {_fmt_secs(makespan)} with {width} parallel upgrade(s)")
+    print("=" * 90)
@@ -3,14 +3,29 @@ FortiManager Devices' Retrieve Configuration
 Logs into FortiManager, lets you pick ADOM and device(s),
 then Retrieves config.
 
+Headless mode (no prompts) runs when any of --all-adoms, --adom-regex or
+--device-file is given:
+    python config_retrieve_automation.py --host 10.0.0.1 --user admin --all-adoms
+    python config_retrieve_automation.py --adom-regex '^branch-' --summary out.json
+    python config_retrieve_automation.py --device-file devices.txt
+
 by: Farhan Ahmed - www.farhan.ch
 """
 
+import argparse
 import os
+import re
 import requests
 import json
+import shutil
 import time
 import sys
+from collections import deque
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import profiling
+from fmg_common.task_watcher import TaskWatcher
 
 # Suppress insecure request warnings
 requests.packages.urllib3.disable_warnings()
@@ -38,6 +53,296 @@ def read_password(label):
     except Exception:
         return input(label)
 
+def rpc(base_url, session, method, params, **extra):
+    payload = {"id": 1, "method": method, "params": params, **extra}
+    if session:
+        payload["session"] = session
+    return requests.post(base_url, json=payload, verify=False).json()
+
+def retrieve_adoms(base_url, session):
+    """FortiOS-family ADOM names (Global excluded), as offered in the ADOM picker."""
+    adom_res = rpc(base_url, session, "get", [{"url": "/dvmdb/adom", "fields": ["name", "restricted_prds"]}], verbose=1)
+    raw_data = adom_res['result'][0].get('data', [])
+
+    # Updated: Use string codes as per your environment
+    allowed_products = ["fos", "foc", "ffw", "fwc", "fpx"]
+    filtered_adoms = []
+
+    for a in raw_data:
+        # Skip non-dict data and exclude rootp (Global ADOM)
+        if not isinstance(a, dict) or a.get('name') == 'rootp':
+            continue
+
+        product_code = str(a.get('restricted_prds', '')).lower()
+        if product_code in allowed_products:
+            filtered_adoms.append(a['name'])
+    return filtered_adoms
+
+class DeviceCache:
+    """
+    Per-ADOM device list cache.
+
+    Only the fields the script actually shows are requested (name, sn), which
+    keeps /dvmdb/adom/{adom}/device responses a fraction of the full device
+    records. Lists are reused for `ttl` seconds, so going back to the same
+    ADOM does not hit the FortiManager again; several stale ADOMs are fetched
+    together in one multi-params request.
+    """
+
+    FIELDS = ["name", "sn"]
+
+    def __init__(self, base_url, session, ttl=60):
+        self.base_url = base_url
+        self.session = session
+        self.ttl = ttl
+        self._entries = {}     # adom -> (fetched_at, devices)
+
+    def _fresh(self, adom):
+        hit = self._entries.get(adom)
+        return hit is not None and time.monotonic() - hit[0] < self.ttl
+
+    def get_many(self, adoms, force=False):
+        """Return {adom: [device, ...]} for every requested ADOM."""
+        stale = [a for a in adoms if force or not self._fresh(a)]
+        if stale:
+            res = rpc(self.base_url, self.session, "get",
+                      [{"url": f"/dvmdb/adom/{a}/device", "fields": self.FIELDS} for a in stale], verbose=1)
+            now = time.monotonic()
+            for adom, r in zip(stale, res.get('result', [])):
+                data = r.get('data') or []
+                self._entries[adom] = (now, [d for d in data if isinstance(d, dict)])
+        return {a: self._entries.get(a, (0, []))[1] for a in adoms}
+
+    def get(self, adom, force=False):
+        return self.get_many([adom], force=force)[adom]
+
+    def invalidate(self, adom=None):
+        if adom is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(adom, None)
+
+def trigger_retrieve(base_url, session, adom, target_list):
+    """Start a non-blocking dev-list reload task. Returns the task id (or None)."""
+    exec_res = rpc(base_url, session, "exec", [{"url": "dvm/cmd/reload/dev-list", "data": {"adom": adom, "flags": ["create_task", "nonblocking"], "reload-dev-member-list": target_list, "from": "dvm"}}])
+    return exec_res['result'][0].get('data', {}).get('taskid')
+
+def line_passed(entry):
+    return entry.get('state') in ('done', 4) and entry.get('err', 0) == 0
+
+def make_task_watcher(base_url, session, on_update=None):
+    def fetch(params):
+        res = requests.post(base_url, json={"id": 1, "session": session, "method": "get", "params": params}, verify=False).json()
+        return res.get('result', [])
+    return TaskWatcher(fetch, min_interval=0.5, max_interval=5, on_update=on_update)
+
+ANSI_ESCAPE = re.compile(r"\033\[[0-9;]*[A-Za-z]")
+
+class LiveRenderer:
+    """
+    Redraws a block of status lines in place.
+
+    On a TTY only the lines that changed since the previous frame are
+    rewritten (ANSI cursor movement, one write per frame), and frames are
+    rate-limited to one per min_interval seconds. When stdout is not a TTY
+    (cron, CI, redirected to a file) every changed line is printed once as a
+    plain log line instead — no escape codes, no repeated frames.
+
+    The cursor cannot move above the top of the screen, so a TTY frame is
+    cut to the terminal height: the first lines, a "+N more" line, and the
+    last keep_tail lines (the progress bar).
+    """
+
+    def __init__(self, stream=None, min_interval=0.25, keep_tail=2):
+        self.stream = stream or sys.stdout
+        self.is_tty = self.stream.isatty()
+        self.min_interval = min_interval
+        self.keep_tail = keep_tail
+        self._frame = []
+        self._last_draw = 0.0
+        self._pending = None
+
+    def render(self, lines, force=False):
+        now = time.monotonic()
+        if not force and self._frame and now - self._last_draw < self.min_interval:
+            self._pending = lines
+            return
+        self._pending = None
+        self._last_draw = now
+        if self.is_tty:
+            lines = self._fit(lines)
+            self._draw_ansi(lines)
+        else:
+            self._draw_plain(lines)
+        self._frame = list(lines)
+
+    def _fit(self, lines):
+        limit = max(shutil.get_terminal_size().lines - 1, self.keep_tail + 2)
+        if len(lines) <= limit:
+            return lines
+        head = limit - 1 - self.keep_tail
+        hidden = len(lines) - head - self.keep_tail
+        tail = lines[len(lines) - self.keep_tail:] if self.keep_tail else []
+        return lines[:head] + [f"  … +{hidden} more line(s)"] + tail
+
+    def _draw_ansi(self, lines):
+        prev = self._frame
+        out = []
+        if prev:
+            out.append(f"\033[{len(prev)}F")          # back to the first line of the frame
+        for i, line in enumerate(lines):
+            if i < len(prev) and prev[i] == line:
+                out.append("\033[1E")                  # unchanged — step over it
+            else:
+                out.append(f"\033[2K{line}\n")
+        for _ in range(len(lines), len(prev)):          # frame shrank — blank the leftovers
+            out.append("\033[2K\n")
+        if len(prev) > len(lines):
+            out.append(f"\033[{len(prev) - len(lines)}F")
+        self.stream.write("".join(out))
+        self.stream.flush()
+
+    def _draw_plain(self, lines):
+        seen = set(self._frame)
+        changed = [ANSI_ESCAPE.sub("", line) for line in lines if line.strip() and line not in seen]
+        if changed:
+            self.stream.write("\n".join(changed) + "\n")
+            self.stream.flush()
+
+    def finish(self):
+        """Flush the last rate-limited frame."""
+        if self._pending is not None:
+            self.render(self._pending, force=True)
+
+class RetrieveBatch:
+    """
+    Runs dev-list reloads for many devices as several concurrent chunk tasks.
+
+    Each ADOM's device list is cut into chunks of chunk_size devices (0 = one
+    chunk per ADOM) and every chunk becomes its own reload task, so one slow
+    or unreachable device only holds back its own chunk. At most
+    max_in_flight devices (0 = no cap) are being retrieved at any time; new
+    chunks are submitted as earlier ones finish. Devices that failed in a
+    finished chunk — or every device of a chunk whose task could not be
+    created — are re-queued as a new chunk, up to `retries` times, while
+    the other chunks keep running. All chunk tasks share one TaskWatcher.
+    """
+
+    def __init__(self, base_url, session, chunk_size=0, max_in_flight=0, retries=0,
+                 on_update=None, on_chunk_done=None):
+        self.base_url = base_url
+        self.session = session
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self._on_update = on_update
+        self._on_chunk_done = on_chunk_done
+        self.watcher = make_task_watcher(base_url, session, on_update=self._update)
+        self._queue = deque()          # (adom, names, attempt)
+        self.in_flight = 0
+        self.total = 0
+        self.tasks = {}                # task_id -> chunk dict
+        self.results = {}              # (adom, name) -> final line entry
+
+    @property
+    def pending_devices(self):
+        """Devices queued (first attempts and retries) but not yet submitted."""
+        return sum(len(names) for _, names, _ in self._queue)
+
+    def add(self, adom, names):
+        step = self.chunk_size or len(names) or 1
+        for i in range(0, len(names), step):
+            self._queue.append((adom, names[i:i + step], 1))
+        self.total += len(names)
+
+    def run(self):
+        self._submit_ready()
+        self.watcher.run()
+        return self.results
+
+    # ── internals ──────────────────────────────────────────────────────────────
+
+    def _submit_ready(self):
+        while self._queue:
+            adom, names, attempt = self._queue[0]
+            if self.max_in_flight and self.in_flight and self.in_flight + len(names) > self.max_in_flight:
+                break
+            self._queue.popleft()
+            task_id = trigger_retrieve(self.base_url, self.session, adom, [{"name": n} for n in names])
+            if not task_id:
+                self._record(adom, names, attempt, {}, "task was not created")
+                if attempt <= self.retries:
+                    self._queue.append((adom, names, attempt + 1))
+                continue
+            self.tasks[task_id] = {"task_id": task_id, "adom": adom, "devices": names,
+                                   "attempt": attempt, "task": {}, "done": False}
+            self.in_flight += len(names)
+            fut = self.watcher.watch(task_id)
+            fut.add_done_callback(lambda f, tid=task_id: self._chunk_done(tid, f))
+
+    def _update(self, task_id, task_data):
+        self.tasks[task_id]["task"] = task_data
+        if self._on_update:
+            self._on_update(self)
+
+    def _chunk_done(self, task_id, future):
+        chunk = self.tasks[task_id]
+        chunk["done"] = True
+        self.in_flight -= len(chunk["devices"])
+        if future.exception() is not None:
+            lines, missing = {}, str(future.exception())
+        else:
+            chunk["task"] = future.result()
+            lines, missing = {l.get('name'): l for l in chunk["task"].get('line', []) or []}, "no result line"
+        failed = self._record(chunk["adom"], chunk["devices"], chunk["attempt"], lines, missing)
+        if failed and chunk["attempt"] <= self.retries:
+            self._queue.append((chunk["adom"], failed, chunk["attempt"] + 1))
+        if self._on_chunk_done:
+            self._on_chunk_done(chunk, failed)
+        self._submit_ready()
+
+    def _record(self, adom, names, attempt, lines, missing_detail):
+        failed = []
+        for name in names:
+            line = lines.get(name) or {"name": name, "err": 1, "detail": missing_detail}
+            self.results[(adom, name)] = {**line, "attempt": attempt}
+            if not line_passed(line):
+                failed.append(name)
+        return failed
+
+    def final_task_data(self):
+        """Merged result in the shape of a /task/task payload, for print_final_table."""
+        lines = list(self.results.values())
+        return {"num_lines": len(lines), "num_done": len(lines),
+                "num_err": sum(1 for l in lines if not line_passed(l)), "line": lines}
+
+def batch_progress_lines(batch):
+    running = [c for c in batch.tasks.values() if not c["done"]]
+    if len(batch.tasks) == 1:
+        title = f"TASK ID: {next(iter(batch.tasks))}"
+    else:
+        title = f"{len(batch.tasks)} TASKS, {len(running)} RUNNING"
+    lines = [f"{Colors.BLUE}{Colors.BOLD}⚙ RUNNING RETRIEVAL ({title}){Colors.END}", ""]
+    for chunk in batch.tasks.values():
+        retry = f" {Colors.YELLOW}(retry {chunk['attempt'] - 1}){Colors.END}" if chunk["attempt"] > 1 else ""
+        for dev_entry in chunk["task"].get('line', []) or []:
+            color = Colors.GREEN if "finish" in dev_entry.get('detail', '').lower() else Colors.YELLOW
+            lines.append(f"  {Colors.CYAN}→{Colors.END} {dev_entry.get('name', ''):<25} | {color}{dev_entry.get('detail', ''):<25}{Colors.END}{retry}")
+
+    # device-weighted progress over everything submitted or still queued
+    done_units = sum(len(c["devices"]) * (100 if c["done"] else int(c["task"].get('percent', 0) or 0))
+                     for c in batch.tasks.values())
+    units = sum(len(c["devices"]) for c in batch.tasks.values()) + batch.pending_devices
+    percent = done_units // units if units else 0
+    bar = '█' * int(25 * percent / 100) + '░' * (25 - int(25 * percent / 100))
+    lines += ["", f"  Progress: |{Colors.BLUE}{bar}{Colors.END}| {percent}%"]
+    return lines
+
+def make_progress_drawer(renderer):
+    def draw(batch):
+        renderer.render(batch_progress_lines(batch))
+    return draw
+
 def print_final_table(task_data):
     print(f"\n{Colors.BOLD}{Colors.HEADER}TASK SUMMARY{Colors.END}")
     print(f" Total: {task_data.get('num_lines', 0)}  |  "
@@ -49,19 +354,133 @@ def print_final_table(task_data):
     print(" " + "-" * (len(header) + 10))
 
     for entry in task_data.get('line', []):
-        is_pass = entry.get('state') in ('done', 4) and entry.get('err', 0) == 0
+        is_pass = line_passed(entry)
         badge = f"{Colors.GREEN}PASS{Colors.END}" if is_pass else f"{Colors.RED}FAIL{Colors.END}"
         print(f" {badge:<19} | {entry.get('name', 'Unknown'):<25} | {entry.get('ip', 'N/A'):<18} | {entry.get('detail', '')}")
     print()
 
+def parse_args():
+    p = argparse.ArgumentParser(description="Retrieve device configuration through FortiManager.")
+    p.add_argument("--host", default=os.environ.get("FMG_HOST"), help="FMG IP/URL (default: $FMG_HOST)")
+    p.add_argument("--user", default=os.environ.get("FMG_USER"), help="Admin username (default: $FMG_USER)")
+    p.add_argument("--password", default=os.environ.get("FMG_PASS"), help="Admin password (default: $FMG_PASS, else prompt)")
+    p.add_argument("--device-ttl", type=int, default=60, help="Seconds to reuse a cached ADOM device list (default: 60)")
+    chunking = p.add_argument_group("chunking")
+    chunking.add_argument("--chunk-size", type=int, default=0, help="Devices per reload task (default: 0 = one task per ADOM)")
+    chunking.add_argument("--max-in-flight", type=int, default=0, help="Max devices being retrieved at once (default: 0 = no cap)")
+    chunking.add_argument("--retries", type=int, default=0, help="Retry failed devices this many times (default: 0)")
+    headless = p.add_argument_group("headless mode")
+    headless.add_argument("--all-adoms", action="store_true", help="Retrieve every device in every FortiOS-family ADOM")
+    headless.add_argument("--adom-regex", help="Only ADOMs whose name matches this regular expression")
+    headless.add_argument("--device-file", help="Only devices listed in this file (one name per line, # comments allowed)")
+    headless.add_argument("--summary", default="", help="Summary JSON path (default: retrieve_summary_<timestamp>.json)")
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+def read_device_file(path):
+    with open(path, encoding="utf-8") as f:
+        return {line.split('#', 1)[0].strip() for line in f if line.split('#', 1)[0].strip()}
+
+def run_headless(args):
+    """Non-interactive retrieve across many ADOMs; chunk tasks per ADOM, all watched together."""
+    if not args.host or not args.user:
+        print(f"{Colors.RED}✘ --host and --user (or FMG_HOST / FMG_USER) are required in headless mode.{Colors.END}")
+        return 2
+    pwd = args.password or read_password("Admin Password: ")
+    base_url = f"https://{args.host}/jsonrpc"
+    started = datetime.now(timezone.utc)
+
+    login_res = rpc(base_url, None, "exec", [{"data": {"user": args.user, "passwd": pwd}, "url": "/sys/login/user"}])
+    session = login_res.get("session")
+    if not session:
+        print(f"{Colors.RED}✘ Login failed. Check credentials.{Colors.END}")
+        return 2
+
+    summary = {"host": args.host, "started_at": started.isoformat(), "adoms": []}
+    try:
+        status_res = rpc(base_url, session, "get", [{"url": "/sys/status"}], verbose=1)
+        adom_enabled = status_res['result'][0]['data'].get('Admin Domain Configuration') != 'Disabled'
+        adoms = retrieve_adoms(base_url, session) if adom_enabled else ['root']
+        if args.adom_regex:
+            pattern = re.compile(args.adom_regex)
+            adoms = [a for a in adoms if pattern.search(a)]
+        wanted = read_device_file(args.device_file) if args.device_file else None
+
+        # one multi-params request for every ADOM's device list
+        device_lists = DeviceCache(base_url, session).get_many(adoms)
+        targets = {}
+        for adom in adoms:
+            names = [d['name'] for d in device_lists[adom]]
+            if wanted is not None:
+                names = [n for n in names if n in wanted]
+            if names:
+                targets[adom] = names
+
+        if wanted is not None:
+            found = {n for names in targets.values() for n in names}
+            for missing in sorted(wanted - found):
+                print(f"{Colors.YELLOW}⚠ Device not found in any selected ADOM: {missing}{Colors.END}")
+
+        total = sum(len(v) for v in targets.values())
+        print(f"{Colors.YELLOW}⚙ Triggering retrieval for {total} device(s) in {len(targets)} ADOM(s)...{Colors.END}")
+
+        def chunk_done(chunk, failed):
+            n = len(chunk["devices"])
+            color = Colors.GREEN if not failed else Colors.RED
+            retry = f" (attempt {chunk['attempt']})" if chunk["attempt"] > 1 else ""
+            print(f"  {color}✔{Colors.END} {chunk['adom']:<25} task {chunk['task_id']}{retry}: "
+                  f"{n - len(failed)} passed, {len(failed)} failed")
+
+        batch = RetrieveBatch(base_url, session, chunk_size=args.chunk_size,
+                              max_in_flight=args.max_in_flight, retries=args.retries,
+                              on_chunk_done=chunk_done)
+        for adom, names in targets.items():
+            batch.add(adom, names)
+        batch.run()
+    finally:
+        rpc(base_url, session, "exec", [{"url": "/sys/logout"}])
+
+    for adom, names in targets.items():
+        summary["adoms"].append({
+            "adom": adom,
+            "requested": names,
+            "tasks": [{"task_id": c["task_id"], "attempt": c["attempt"], "devices": c["devices"],
+                       "state": c["task"].get('state')}
+                      for c in batch.tasks.values() if c["adom"] == adom],
+            "devices": [{"name": n, "ip": line.get('ip'), "passed": line_passed(line),
+                         "attempt": line["attempt"], "detail": line.get('detail', '')}
+                        for n in names for line in [batch.results[(adom, n)]]],
+        })
+
+    devices = [d for e in summary["adoms"] for d in e["devices"]]
+    summary["finished_at"] = datetime.now(timezone.utc).isoformat()
+    summary["totals"] = {
+        "adoms": len(summary["adoms"]),
+        "tasks": len(batch.tasks),
+        "devices": len(devices),
+        "passed": sum(1 for d in devices if d["passed"]),
+        "failed": sum(1 for d in devices if not d["passed"]),
+    }
+    out_path = args.summary or f"retrieve_summary_{started.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    t = summary["totals"]
+    print(f"\n{Colors.BOLD}Done:{Colors.END} {t['passed']} passed, {t['failed']} failed "
+          f"across {t['adoms']} ADOM(s). Summary → {out_path}")
+    return 0 if not t["failed"] else 1
+
 def main():
+    args = parse_args()
+    if args.all_adoms or args.adom_regex or args.device_file:
+        sys.exit(run_headless(args))
+
     print(f"{Colors.BLUE}{Colors.BOLD}{'=' * 60}{Colors.END}")
     print(f"{Colors.BOLD}   FORTIMANAGER RETRIEVE CONFIGURATION AUTOMATION{Colors.END}")
     print(f"{Colors.BLUE}{'=' * 60}{Colors.END}\n")
 
-    host = input(f"{Colors.CYAN}{Colors.BOLD}FMG IP/URL:{Colors.END} ").strip()
-    user = input(f"{Colors.CYAN}{Colors.BOLD}Admin Username:{Colors.END} ").strip()
-    pwd = read_password(f"{Colors.CYAN}{Colors.BOLD}Admin Password:{Colors.END} ")
+    host = args.host or input(f"{Colors.CYAN}{Colors.BOLD}FMG IP/URL:{Colors.END} ").strip()
+    user = args.user or input(f"{Colors.CYAN}{Colors.BOLD}Admin Username:{Colors.END} ").strip()
+    pwd = args.password or read_password(f"{Colors.CYAN}{Colors.BOLD}Admin Password:{Colors.END} ")
     base_url = f"https://{host}/jsonrpc"
 
     try:
@@ -80,26 +499,13 @@ def main():
     status_res = requests.post(base_url, json={"id": 1, "session": session, "method": "get", "params": [{"url": "/sys/status"}], "verbose": 1}, verify=False).json()
     adom_enabled = status_res['result'][0]['data'].get('Admin Domain Configuration') != 'Disabled'
     selected_adom = 'root' if not adom_enabled else None
+    device_cache = DeviceCache(base_url, session, ttl=args.device_ttl)
 
     try:
         while True:
             # --- ADOM SELECTION ---
             if adom_enabled and not selected_adom:
-                adom_res = requests.post(base_url, json={"id": 2, "session": session, "method": "get", "verbose": 1, "params": [{"url": "/dvmdb/adom", "fields": ["name", "restricted_prds"]}]}, verify=False).json()
-                raw_data = adom_res['result'][0].get('data', [])
-
-                # Updated: Use string codes as per your environment
-                allowed_products = ["fos", "foc", "ffw", "fwc", "fpx"]
-                filtered_adoms = []
-
-                for a in raw_data:
-                    # Skip non-dict data and exclude rootp (Global ADOM)
-                    if not isinstance(a, dict) or a.get('name') == 'rootp':
-                        continue
-
-                    product_code = str(a.get('restricted_prds', '')).lower()
-                    if product_code in allowed_products:
-                        filtered_adoms.append(a['name'])
+                filtered_adoms = retrieve_adoms(base_url, session)
 
                 if not filtered_adoms:
                     print(f"\n{Colors.YELLOW}⚠ No matching ADOMs found. Defaulting to 'root'.{Colors.END}")
@@ -121,8 +527,7 @@ def main():
                         continue
 
             # --- DEVICE SELECTION ---
-            dev_res = requests.post(base_url, json={"id": 1, "session": session, "verbose": 1, "method": "get", "params": [{"url": f"/dvmdb/adom/{selected_adom}/device"}]}, verify=False).json()
-            devices = dev_res['result'][0].get('data', [])
+            devices = device_cache.get(selected_adom)
 
             if not devices:
                 print(f"\n{Colors.YELLOW}⚠ No devices in {selected_adom}.{Colors.END}")
@@ -164,29 +569,15 @@ def main():
 
             # --- EXECUTION ---
             print(f"\n{Colors.YELLOW}⚙ Triggering retrieval...{Colors.END}")
-            exec_res = requests.post(base_url, json={"id": 1, "session": session, "method": "exec", "params": [{"url": "dvm/cmd/reload/dev-list", "data": {"adom": selected_adom, "flags": ["create_task", "nonblocking"], "reload-dev-member-list": target_list, "from": "dvm"}}]}, verify=False).json()
-
-            task_id = exec_res['result'][0].get('data', {}).get('taskid')
-            if task_id:
-                while True:
-                    status_res = requests.post(base_url, json={"id": 1, "session": session, "method": "get", "params": [{"url": f"/task/task/{task_id}"}]}, verify=False).json()
-                    task_data = status_res['result'][0]['data']
-                    percent = task_data.get('percent', 0)
-
-                    clear_terminal()
-                    print(f"{Colors.BLUE}{Colors.BOLD}⚙ RUNNING RETRIEVAL (TASK ID: {task_id}){Colors.END}\n")
-                    for dev_entry in task_data.get('line', []):
-                        color = Colors.GREEN if "finish" in dev_entry.get('detail', '').lower() else Colors.YELLOW
-                        print(f"  {Colors.CYAN}→{Colors.END} {dev_entry.get('name', ''):<25} | {color}{dev_entry.get('detail', ''):<25}{Colors.END}")
-
-                    bar = '█' * int(25 * percent / 100) + '░' * (25 - int(25 * percent / 100))
-                    print(f"\n  Progress: |{Colors.BLUE}{bar}{Colors.END}| {percent}%")
-
-                    if percent >= 100:
-                        clear_terminal()
-                        print_final_table(task_data)
-                        break
-                    time.sleep(1)
+            renderer = LiveRenderer()
+            batch = RetrieveBatch(base_url, session, chunk_size=args.chunk_size,
+                                  max_in_flight=args.max_in_flight, retries=args.retries,
+                                  on_update=make_progress_drawer(renderer))
+            batch.add(selected_adom, [t["name"] for t in target_list])
+            batch.run()
+            renderer.finish()
+            if batch.tasks:
+                print_final_table(batch.final_task_data())
 
             action = input(f"Next Action: [1] Same ADOM [2] Change ADOM [3] Exit: ").strip()
             if action == "2":
@@ -200,4 +591,4 @@ def main():
         print(f"\n{Colors.BLUE}✔ Session closed safely.{Colors.END}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    profiling.run_main(main)
\ No newline at end of file
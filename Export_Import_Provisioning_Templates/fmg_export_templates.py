@@ -1,10 +1,23 @@
+import argparse
+import base64
+import binascii
+import gzip
+import hashlib
 import requests
 import time
 import urllib3
 import json
 import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import flatui, profiling
+from template_catalog import content_hash, load_json_bundle
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # ─── Configuration ────────────────────────────────────────────────────────────
@@ -22,6 +35,25 @@ TEMPLATE_CATEGORIES = [
 ]
 
 EXPORT_DIR = "./fmg_exports"
+
+# --incremental: where each category's objects live, used to fingerprint the
+# category before exporting. Incremental snapshots cover ONLY these
+# categories (INCREMENTAL_CATEGORIES); the others cannot be fingerprinted and
+# need a regular export. A category whose lookup fails is re-exported.
+CATEGORY_URLS = {
+    "cli-prof":      ["/pm/config/adom/{adom}/obj/cli/template",
+                      "/pm/config/adom/{adom}/obj/cli/template-group"],
+    "sys-prof":      ["/pm/devprof/adom/{adom}"],
+    "sdwan-prof":    ["/pm/wanprof/adom/{adom}"],
+    "tmplgrp-prof":  ["/pm/tmplgrp/adom/{adom}"],
+    "cst-prof":      ["/pm/config/adom/{adom}/obj/certificate/template"],
+    "ap-prof":       ["/pm/config/adom/{adom}/obj/wireless-controller/wtp-profile"],
+    "fext-prof":     ["/pm/config/adom/{adom}/obj/extender-controller/extender-profile"],
+    "dev-blueprint": ["/pm/config/adom/{adom}/obj/fmg/device/blueprint"],
+}
+INCREMENTAL_CATEGORIES = [c for c in TEMPLATE_CATEGORIES if c in CATEGORY_URLS]
+INCREMENTAL_STATE = os.path.join(EXPORT_DIR, "incremental_state.json")
+PARTIAL_DIR = os.path.join(EXPORT_DIR, "partial")
 # ──────────────────────────────────────────────────────────────────────────────
 
 
@@ -137,15 +169,17 @@ def prompt_adom_selection(session, csrf_token):
             print("Please enter a valid number.")
 
 
-def initiate_export(session, csrf_token, adom_oid):
-    print(f"\n[{now_iso()}] Initiating template export for ADOM OID {adom_oid}...")
+def initiate_export(session, csrf_token, adom_oid, categories=None):
+    categories = categories or TEMPLATE_CATEGORIES
+    print(f"\n[{now_iso()}] Initiating template export for ADOM OID {adom_oid} "
+          f"({len(categories)} categor{'y' if len(categories) == 1 else 'ies'})...")
     payload = {
         "method": "exec",
         "params": [{
             "url": "/deployment/export/template",
             "data": {
                 "adom": adom_oid,
-                "category": TEMPLATE_CATEGORIES,
+                "category": categories,
                 "create_task": "true"
             }
         }],
@@ -169,85 +203,324 @@ def initiate_export(session, csrf_token, adom_oid):
     return task_id, file_name
 
 
-def wait_for_task(session, csrf_token, task_id, poll_interval=3, timeout=120):
+def wait_for_task(session, csrf_token, task_id, poll_interval=3, timeout=120, watcher=None):
     print(f"[{now_iso()}] Polling task {task_id}...", end="", flush=True)
-    deadline = time.time() + timeout
-    while time.time() < deadline:
-        payload = {
-            "method": "get",
-            "params": [{"url": f"/task/task/{task_id}"}],
-            "id": "3"
-        }
-        resp = session.post(
-            f"{BASE_URL}/cgi-bin/module/flatui/forward",
-            headers={"XSRF-TOKEN": csrf_token},
-            json=payload, verify=False
-        )
-        resp.raise_for_status()
-
-        raw = resp.json()
-
-        try:
-            task = raw["result"][0]["data"]
-        except (KeyError, IndexError, TypeError):
-            try:
-                task = raw["data"]["result"][0]["data"]
-            except (KeyError, IndexError, TypeError):
-                task = {}
-
-        # ── Uncomment to debug the live task payload ───────────────────
-        # print(f"\nDEBUG task payload: {json.dumps(task, indent=2)}")
-
-        percent   = task.get("percent", 0)
-        state     = task.get("state", -1)
-        num_done  = task.get("num_done", 0)
-        num_lines = task.get("num_lines", -1)
-
-        print(f" {percent}%", end="", flush=True)
-
-        if state in (4, "4") or percent == 100 or (num_lines > 0 and num_done >= num_lines):
-            print(f"\n[{now_iso()}] Task {task_id} completed successfully.")
-            return task
+    watcher = watcher or flatui.make_task_watcher(BASE_URL, session, csrf_token, poll_interval)
+    try:
+        task = watcher.wait(task_id, timeout=timeout)
+    except TimeoutError:
+        raise TimeoutError(f"Task {task_id} did not complete within {timeout}s.") from None
 
-        if state in (2, "2"):
-            raise RuntimeError(f"Task {task_id} reported an error state. Response: {task}")
+    # ── Uncomment to debug the live task payload ───────────────────
+    # print(f"\nDEBUG task payload: {json.dumps(task, indent=2)}")
 
-        time.sleep(poll_interval)
+    if task.get("state") in (2, "2"):
+        raise RuntimeError(f"Task {task_id} reported an error state. Response: {task}")
 
-    raise TimeoutError(f"Task {task_id} did not complete within {timeout}s.")
+    print(f"\n[{now_iso()}] Task {task_id} completed successfully.")
+    return task
 
 
-def download_export(session, csrf_token, task_id, file_name):
+def _expected_digest(resp):
+    """
+    (algorithm, hex digest) announced by the server, if any.
+    Understands 'Digest: sha-256=<b64>' and 'Content-MD5: <b64>'.
+    A malformed value counts as no checksum at all.
+    """
+    digest = resp.headers.get("Digest", "")
+    try:
+        for part in digest.split(","):
+            algo, _, value = part.strip().partition("=")
+            if algo.lower() == "sha-256" and value:
+                return "sha256", base64.b64decode(value).hex()
+        md5 = resp.headers.get("Content-MD5")
+        if md5:
+            return "md5", base64.b64decode(md5).hex()
+    except binascii.Error:
+        pass
+    return None
+
+
+def download_export(session, csrf_token, task_id, file_name, chunk_size=256 * 1024, max_retries=3):
     """
     Request 6 — GET /flatui/api/gui/deploy/export
     Downloads the actual template export bundle from FMG.
-    Saves the raw response content as-is — no extra text added.
+    Saves the response body as-is — no extra text added.
+
+    The body is streamed in chunks straight into '<file>.part'. If the
+    connection drops, the download resumes from the bytes already on disk
+    with an HTTP Range request (when the server answers 206; a plain 200
+    restarts from zero). When complete, the size is checked against the
+    Content-Range total and the full response's Content-Length, and any
+    server-provided checksum is verified. A resumed file that fails the size
+    check is fetched once more from scratch; a fresh one is an error.
+
+    With a Content-Encoding (gzip, ...) the body is decoded while streaming,
+    so the announced sizes and checksums, which describe the encoded bytes,
+    are not checked, and an interrupted download restarts from zero (Range
+    offsets would count encoded bytes too).
+
+    Finally a '<file>.sha256' sidecar is written from the bytes received
+    and the .part file is renamed into place atomically.
     """
     os.makedirs(EXPORT_DIR, exist_ok=True)
     download_name = f"{task_id}_{file_name}"
     local_path = os.path.join(EXPORT_DIR, download_name)
+    part_path = local_path + ".part"
 
     print(f"[{now_iso()}] Downloading export file...")
-    resp = session.get(
-        f"{BASE_URL}/flatui/api/gui/deploy/export",
-        headers={
+    attempt = 0
+    expected = None         # checksum announced by the full (200) response
+    total = None            # size of the whole file, when known
+    resumed = False
+    allow_resume = True
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset and not allow_resume:
+            os.remove(part_path)
+            offset = 0
+        headers = {
             "XSRF-TOKEN": csrf_token,
             "Referer": f"{BASE_URL}/ui/dvm/prvtmpl/clitmpl"
-        },
-        params={
-            "filename":     file_name,
-            "downloadname": download_name
-        },
-        verify=False
-    )
-    resp.raise_for_status()
+        }
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        try:
+            with session.get(
+                f"{BASE_URL}/flatui/api/gui/deploy/export",
+                headers=headers,
+                params={
+                    "filename":     file_name,
+                    "downloadname": download_name
+                },
+                verify=False,
+                stream=True
+            ) as resp:
+                if resp.status_code == 416 and offset:
+                    # Range not satisfiable — the .part file is stale; start over
+                    os.remove(part_path)
+                    continue
+                resp.raise_for_status()
+                if offset and resp.status_code != 206:
+                    offset = 0          # server ignored Range — rewrite from scratch
+                length = resp.headers.get("Content-Length")
+                if not offset:
+                    resumed = False
+                    encoded = resp.headers.get("Content-Encoding", "identity").lower() != "identity"
+                    expected = None if encoded else _expected_digest(resp)
+                    total = int(length) if length is not None and not encoded else None
+                    allow_resume = not encoded
+                else:
+                    resumed = True
+                    content_range = resp.headers.get("Content-Range", "")
+                    if "/" in content_range and not content_range.endswith("/*"):
+                        range_total = int(content_range.rsplit("/", 1)[1])
+                        if total is not None and range_total != total:
+                            print(f"[{now_iso()}] Export changed size on the server "
+                                  f"({total} -> {range_total} bytes); downloading it again in full...")
+                            allow_resume = False
+                            continue
+                        total = range_total
+                    elif total is None and length is not None:
+                        total = int(length) + offset
+
+                # ── Save the response body as received (iter_content undoes any
+                #    Content-Encoding) — no extra text added ─────────────────────
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for chunk in resp.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+        except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as exc:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            print(f"[{now_iso()}] Download interrupted ({exc.__class__.__name__}); "
+                  f"{'resuming' if allow_resume else 'restarting'} ({attempt}/{max_retries})...")
+            time.sleep(attempt)
+            continue
+
+        size = os.path.getsize(part_path)
+        if total is not None and size != total:
+            if resumed:
+                print(f"[{now_iso()}] Resumed download is {size} of {total} bytes; "
+                      f"downloading it again in full...")
+                allow_resume = False
+                continue
+            raise RuntimeError(f"Export download incomplete: {size} of {total} bytes in {part_path}")
+        break
+
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    with open(part_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(block)
+            md5.update(block)
+    if expected:
+        algo, value = expected
+        actual = sha256.hexdigest() if algo == "sha256" else md5.hexdigest()
+        if actual != value:
+            raise RuntimeError(f"Export checksum mismatch ({algo}): expected {value}, got {actual}")
+
+    with open(local_path + ".sha256", "w", encoding="utf-8") as f:
+        f.write(f"{sha256.hexdigest()}  {download_name}\n")
+    os.replace(part_path, local_path)
+
+    print(f"[{now_iso()}] Export file saved to: {local_path} ({size} bytes, sha256 {sha256.hexdigest()[:12]}...)")
+    return local_path, download_name
 
-    # ── Save raw response bytes exactly as received — no modifications ─
-    with open(local_path, "wb") as f:
-        f.write(resp.content)
 
-    print(f"[{now_iso()}] Export file saved to: {local_path}")
-    return local_path, download_name
+# ── incremental export ────────────────────────────────────────────────────────
+
+_state_lock = threading.Lock()
+
+
+def _load_state():
+    if not os.path.isfile(INCREMENTAL_STATE):
+        return {}
+    try:
+        with open(INCREMENTAL_STATE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_adom_state(adom_name, entry):
+    """Update one ADOM's entry (batch workers share the file)."""
+    with _state_lock:
+        state = _load_state()
+        state[adom_name] = entry
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        tmp = INCREMENTAL_STATE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, INCREMENTAL_STATE)
+
+
+def category_fingerprints(session, csrf_token, adom_name):
+    """
+    {category: hash or None} for every INCREMENTAL_CATEGORIES entry, from
+    ONE multi-params get. None means "unknown" — the category is re-exported.
+    """
+    fingerprints = {cat: None for cat in INCREMENTAL_CATEGORIES}
+    params, owners = [], []
+    for cat in INCREMENTAL_CATEGORIES:
+        for url in CATEGORY_URLS[cat]:
+            params.append({"url": url.format(adom=adom_name)})
+            owners.append(cat)
+    if not params:
+        return fingerprints
+    results = flatui.forward_get(BASE_URL, session, csrf_token, params)
+    if len(results) != len(params):
+        return fingerprints
+
+    collected, failed = {}, set()
+    for cat, res in zip(owners, results):
+        status = (res or {}).get("status", {}) or {}
+        if status.get("code", 0) != 0:
+            failed.add(cat)
+            continue
+        collected.setdefault(cat, []).append((res or {}).get("data"))
+    for cat, data in collected.items():
+        if cat not in failed:
+            fingerprints[cat] = content_hash(data)
+    return fingerprints
+
+
+def merge_bundles(previous_path, delta_path, out_path, changed):
+    """
+    Overlay the re-exported categories onto the previous snapshot.
+    Top-level keys named after a re-exported category are dropped from the
+    previous bundle first, so objects deleted on FMG do not linger.
+    Returns False when either bundle is not a single JSON document, or when
+    the delta has top-level keys other than the re-exported categories (the
+    bundle is then not laid out per category and cannot be overlaid safely).
+    """
+    previous, _ = load_json_bundle(previous_path)
+    delta, gzipped = load_json_bundle(delta_path)
+    if not isinstance(previous, dict) or not isinstance(delta, dict):
+        return False
+    if not set(delta) <= set(changed):
+        return False
+    merged = {k: v for k, v in previous.items() if k not in changed}
+    merged.update(delta)
+    body = json.dumps(merged).encode()
+    if gzipped:
+        body = gzip.compress(body)
+    tmp = out_path + ".part"
+    with open(tmp, "wb") as f:
+        f.write(body)
+    with open(out_path + ".sha256", "w", encoding="utf-8") as f:
+        f.write(f"{hashlib.sha256(body).hexdigest()}  {os.path.basename(out_path)}\n")
+    os.replace(tmp, out_path)
+    return True
+
+
+def _park_partial(local_path):
+    """Move a delta-only download out of EXPORT_DIR so it is never imported by mistake."""
+    os.makedirs(PARTIAL_DIR, exist_ok=True)
+    parked = os.path.join(PARTIAL_DIR, os.path.basename(local_path))
+    os.replace(local_path, parked)
+    if os.path.exists(local_path + ".sha256"):
+        os.replace(local_path + ".sha256", parked + ".sha256")
+    return parked
+
+
+def export_adom(session, csrf_token, adom_oid, adom_name, incremental=False, watcher=None):
+    """
+    Export one ADOM. Returns a dict with task_id, file, path and the
+    categories actually exported.
+
+    With incremental=True only INCREMENTAL_CATEGORIES are covered. They are
+    fingerprinted first and only those that changed since the last run are
+    exported; the result is merged with the previous snapshot into a
+    complete bundle at the usual '{task_id}_{file_name}' path. Falls back to
+    exporting every incremental category on the first run, when the
+    previous snapshot is missing, or when a bundle cannot be merged.
+    """
+    full = INCREMENTAL_CATEGORIES if incremental else TEMPLATE_CATEGORIES
+    categories = full
+    fingerprints, previous = None, None
+    if incremental:
+        fingerprints = category_fingerprints(session, csrf_token, adom_name)
+        previous = _load_state().get(adom_name)
+        if previous and os.path.isfile(previous.get("path", "")):
+            old = previous.get("categories", {})
+            categories = [c for c in full
+                          if fingerprints[c] is None or fingerprints[c] != old.get(c)]
+            if not categories:
+                print(f"[{now_iso()}] ADOM {adom_name}: no category changed since "
+                      f"{previous.get('exported_at')} — reusing {previous['path']}")
+                return {"task_id": None, "file": os.path.basename(previous["path"]),
+                        "path": previous["path"], "categories": [], "unchanged": True}
+            print(f"[{now_iso()}] ADOM {adom_name}: {len(categories)} changed categor"
+                  f"{'y' if len(categories) == 1 else 'ies'}: {', '.join(categories)}")
+        else:
+            previous = None
+
+    task_id, file_name = initiate_export(session, csrf_token, adom_oid, categories)
+    wait_for_task(session, csrf_token, task_id, watcher=watcher)
+    local_path, _ = download_export(session, csrf_token, task_id, file_name)
+
+    if previous and len(categories) < len(full):
+        partial_path = _park_partial(local_path)
+        if not merge_bundles(previous["path"], partial_path, local_path, set(categories)):
+            print(f"[{now_iso()}] Bundles cannot be merged per category — falling back to a full export.")
+            categories = full
+            task_id, file_name = initiate_export(session, csrf_token, adom_oid, categories)
+            wait_for_task(session, csrf_token, task_id, watcher=watcher)
+            local_path, _ = download_export(session, csrf_token, task_id, file_name)
+        else:
+            print(f"[{now_iso()}] Merged with {previous['path']} into complete snapshot {local_path}")
+
+    if incremental:
+        # a failed lookup keeps the last known hash rather than forgetting it
+        old = (previous or {}).get("categories", {})
+        _save_adom_state(adom_name, {
+            "path": local_path,
+            "exported_at": now_iso(),
+            "categories": {c: h if h is not None else old.get(c) for c, h in fingerprints.items()},
+        })
+    return {"task_id": task_id, "file": file_name, "path": local_path,
+            "categories": categories, "unchanged": False}
 
 
 def print_console_report(adom_oid, adom_name, task_id, file_name,
@@ -274,8 +547,112 @@ def print_console_report(adom_oid, adom_name, task_id, file_name,
     print("\n".join(lines))
 
 
+def export_one_adom(session, csrf_token, adom, incremental=False):
+    """switch → export → wait → download for one ADOM on one GUI session."""
+    start = time.time()
+    entry = {"adom": adom.get("name"), "oid": adom.get("oid"), "status": "failed"}
+    try:
+        switch_adom(session, csrf_token, adom["oid"])
+        watcher = flatui.make_task_watcher(BASE_URL, session, csrf_token, show_progress=False)
+        result = export_adom(session, csrf_token, adom["oid"], adom.get("name"),
+                             incremental=incremental, watcher=watcher)
+        local_path = result["path"]
+        with open(local_path + ".sha256", encoding="utf-8") as f:
+            sha256 = f.read().split()[0]
+        entry.update(task_id=result["task_id"], file=result["file"], path=local_path,
+                     size=os.path.getsize(local_path), sha256=sha256, status="ok",
+                     categories=result["categories"], unchanged=result["unchanged"])
+    except Exception as e:
+        entry["error"] = str(e)
+        print(f"\n[{now_iso()}] [ERROR] ADOM {adom.get('name')}: {e}")
+    entry["duration_sec"] = round(time.time() - start, 1)
+    return entry
+
+
+def run_batch_export(adom_selector, workers, manifest_path=None, incremental=False):
+    """
+    Export every selected ADOM using a pool of independent GUI sessions.
+
+    ADOM switching is per GUI session, so each worker logs in on its own
+    requests.Session and keeps it for all the ADOMs it processes; exports,
+    task polling and downloads of different ADOMs overlap. A JSON manifest of
+    the resulting files is written to EXPORT_DIR.
+    """
+    started = datetime.now(timezone.utc)
+    pool = queue.Queue()
+    logged_in = []
+    try:
+        for _ in range(max(1, workers)):
+            session = requests.Session()
+            csrf_token = login(session)
+            logged_in.append((session, csrf_token))
+            pool.put((session, csrf_token))
+
+        selected = flatui.select_batch_adoms(list_adoms(*logged_in[0]), adom_selector)
+
+        print(f"[{now_iso()}] Exporting {len(selected)} ADOM(s) with {len(logged_in)} session(s)...")
+
+        def job(adom):
+            session, csrf_token = pool.get()
+            try:
+                return export_one_adom(session, csrf_token, adom, incremental)
+            finally:
+                pool.put((session, csrf_token))
+
+        with ThreadPoolExecutor(max_workers=len(logged_in)) as executor:
+            results = list(executor.map(job, selected))
+    finally:
+        for session, csrf_token in logged_in:
+            logout(session, csrf_token)
+
+    manifest = {
+        "fmg_host": HOST,
+        "started_at": started.isoformat(),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "categories": TEMPLATE_CATEGORIES,
+        "incremental": incremental,
+        "exports": results,
+    }
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(
+        EXPORT_DIR, f"export_manifest_{started.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    ok = sum(1 for r in results if r["status"] == "ok")
+    print(f"\n{'ADOM':<30} {'Status':<8} {'Duration':>9}  File")
+    print("-" * 90)
+    for r in results:
+        print(f"{r['adom']:<30} {r['status']:<8} {r['duration_sec']:>8.1f}s  {r.get('path', r.get('error', ''))}")
+    print("-" * 90)
+    print(f"[{now_iso()}] {ok}/{len(results)} ADOM(s) exported. Manifest: {manifest_path}")
+    return results
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Export FortiManager provisioning templates.")
+    p.add_argument("--adoms", help="Batch mode: comma-separated ADOM names, or 'all' (Global excluded)")
+    p.add_argument("--workers", type=int, default=3,
+                   help="Batch mode: number of parallel GUI sessions (default: 3)")
+    p.add_argument("--manifest", help="Batch mode: manifest path (default: EXPORT_DIR/export_manifest_<ts>.json)")
+    p.add_argument("--incremental", action="store_true",
+                   help="Export only categories changed since the last run and merge with the previous bundle "
+                        "(covers the fingerprintable categories in CATEGORY_URLS only)")
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+
 # ─── Main ─────────────────────────────────────────────────────────────────────
 def main():
+    args = parse_args()
+    if args.incremental:
+        skipped = [c for c in TEMPLATE_CATEGORIES if c not in INCREMENTAL_CATEGORIES]
+        print(f"[{now_iso()}] Incremental mode covers {len(INCREMENTAL_CATEGORIES)} categories; "
+              f"not included: {', '.join(skipped)}")
+    if args.adoms:
+        results = run_batch_export(args.adoms, args.workers, args.manifest, args.incremental)
+        sys.exit(0 if all(r["status"] == "ok" for r in results) else 1)
+
     session = requests.Session()
     csrf_token = None
     start = time.time()
@@ -284,23 +661,21 @@ def main():
         csrf_token = login(session)
         adom_oid, adom_name = prompt_adom_selection(session, csrf_token)
 
-        task_id, file_name = initiate_export(session, csrf_token, adom_oid)
-        wait_for_task(session, csrf_token, task_id)
-        local_path, _ = download_export(session, csrf_token, task_id, file_name)
+        result = export_adom(session, csrf_token, adom_oid, adom_name, incremental=args.incremental)
 
         duration = time.time() - start
         print_console_report(
-            adom_oid, adom_name, task_id, file_name,
-            local_path, TEMPLATE_CATEGORIES, duration
+            adom_oid, adom_name, result["task_id"], result["file"],
+            result["path"], result["categories"], duration
         )
 
     except Exception as e:
         print(f"\n[ERROR] {e}")
-        raisen
+        raise
     finally:
         if csrf_token:
             logout(session, csrf_token)
 
 
 if __name__ == "__main__":
-    main()
+    profiling.run_main(main)
@@ -1,10 +1,18 @@
+import argparse
+import io
 import requests
 import time
 import urllib3
 import json
 import os
+import sys
+import uuid
+from collections import deque
 from datetime import datetime, timezone
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import flatui, profiling
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # ─── Configuration ────────────────────────────────────────────────────────────
@@ -162,24 +170,109 @@ def prompt_import_file():
         print(f"  File not found: '{file_path}'. Please try again.")
 
 
-def upload_template_file(session, csrf_token, file_path):
+class StreamingMultipartUpload:
+    """
+    multipart/form-data body that is produced while it is being sent.
+
+    requests' files= builds the whole multipart body in memory before the
+    first byte goes out. This object instead exposes the body as a
+    file-like stream with a known length: form fields and part headers are
+    small pre-encoded byte strings, and the file itself is read from disk in
+    blocks of at most chunk_size bytes, so memory use stays constant no
+    matter how large the bundle is. progress(sent, total) is called after
+    every block.
+    """
+
+    def __init__(self, fields, file_field, file_path, content_type="application/octet-stream",
+                 chunk_size=64 * 1024, progress=None):
+        self.boundary = uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self.progress = progress
+        file_size = os.path.getsize(file_path)
+
+        head = b""
+        for name, value in fields.items():
+            head += (f"--{self.boundary}\r\n"
+                     f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                     f"{value}\r\n").encode()
+        head += (f"--{self.boundary}\r\n"
+                 f'Content-Disposition: form-data; name="{file_field}"; '
+                 f'filename="{os.path.basename(file_path)}"\r\n'
+                 f"Content-Type: {content_type}\r\n\r\n").encode()
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+        self._parts = [io.BytesIO(head), open(file_path, "rb"), io.BytesIO(tail)]
+        self._index = 0
+        self.total = len(head) + file_size + len(tail)
+        self.sent = 0
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self.total
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.chunk_size:
+            size = self.chunk_size
+        while self._index < len(self._parts):
+            block = self._parts[self._index].read(size)
+            if block:
+                self.sent += len(block)
+                if self.progress:
+                    self.progress(self.sent, self.total)
+                return block
+            self._index += 1
+        return b""
+
+    def __iter__(self):
+        return iter(lambda: self.read(self.chunk_size), b"")
+
+    def close(self):
+        for part in self._parts:
+            part.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _upload_progress_printer():
+    """progress callback that redraws one line, only when the percentage changes."""
+    last = [-1]
+
+    def show(sent, total):
+        pct = 100 * sent // total if total else 100
+        if pct != last[0]:
+            last[0] = pct
+            print(f"\r[{now_iso()}] Uploading: {pct:>3}% ({sent / 1048576:.1f} / {total / 1048576:.1f} MB)",
+                  end="", flush=True)
+    return show
+
+
+def upload_template_file(session, csrf_token, file_path, chunk_size=64 * 1024):
     print(f"[{now_iso()}] Uploading template file: {file_path}")
-    with open(file_path, "rb") as f:
-        files = {"filepath": (os.path.basename(file_path), f, "application/json")}
-        data = {
-            "csrfmiddlewaretoken": csrf_token,
-            "csrf_token":         csrf_token,
-        }
+    data = {
+        "csrfmiddlewaretoken": csrf_token,
+        "csrf_token":         csrf_token,
+    }
+    with StreamingMultipartUpload(data, "filepath", file_path, "application/json",
+                                  chunk_size=chunk_size, progress=_upload_progress_printer()) as body:
         resp = session.post(
             f"{BASE_URL}/flatui/api/gui/deploy/import",
             headers={
                 "XSRF-TOKEN": csrf_token,
-                "Referer": f"{BASE_URL}/ui/dvm/prvtmpl/clitmpl"
+                "Referer": f"{BASE_URL}/ui/dvm/prvtmpl/clitmpl",
+                "Content-Type": body.content_type,
+                "Content-Length": str(len(body)),
             },
-            data=data,
-            files=files,
+            data=body,
             verify=False
         )
+    print()
     resp.raise_for_status()
     print(f"[{now_iso()}] File uploaded successfully.")
     return resp.json()
@@ -218,77 +311,35 @@ def execute_import(session, csrf_token, adom_oid):
     return task_id, file_name
 
 
-def wait_for_task(session, csrf_token, task_id, poll_interval=3, timeout=180):
+def wait_for_task(session, csrf_token, task_id, poll_interval=3, timeout=180, watcher=None):
     """
     Poll task until FMG marks it finished. Returns the full task dict
     (including line/history) for reporting.
     """
     print(f"[{now_iso()}] Polling task {task_id}...", end="", flush=True)
-    deadline = time.time() + timeout
-    last_task = {}
-
-    while time.time() < deadline:
-        payload = {
-            "method": "get",
-            "params": [{"url": f"/task/task/{task_id}"}],
-            "id": "3"
-        }
-        resp = session.post(
-            f"{BASE_URL}/cgi-bin/module/flatui/forward",
-            headers={"XSRF-TOKEN": csrf_token},
-            json=payload,
-            verify=False
-        )
-        resp.raise_for_status()
-        raw = resp.json()
-
-        # Try both response shapes: result[0].data or data.result[0].data
-        try:
-            task = raw["result"][0]["data"]
-        except (KeyError, IndexError, TypeError):
-            try:
-                task = raw["data"]["result"][0]["data"]
-            except (KeyError, IndexError, TypeError):
-                task = {}
-
-        last_task = task
-
-        percent   = task.get("percent", 0)
-        state     = task.get("state", -1)   # 4 = success, 5 = finished with errors
-        num_done  = task.get("num_done", 0)
-        num_lines = task.get("num_lines", -1)
-
-        print(f" {percent}%", end="", flush=True)
-
-        done = state in (4, 5, "4", "5") or percent == 100 or (num_lines > 0 and num_done >= num_lines)
-        if done:
-            print(f"\n[{now_iso()}] Task {task_id} finished (state={state}).")
-            return task
-
-        if state in (2, "2"):
-            raise RuntimeError(f"Task {task_id} reported an explicit error state: {task}")
+    watcher = watcher or flatui.make_task_watcher(BASE_URL, session, csrf_token, poll_interval)
+    try:
+        task = watcher.wait(task_id, timeout=timeout)
+    except TimeoutError:
+        raise TimeoutError(f"Task {task_id} did not complete within {timeout}s.") from None
 
-        time.sleep(poll_interval)
+    if task.get("state") in (2, "2"):
+        raise RuntimeError(f"Task {task_id} reported an explicit error state: {task}")
 
-    raise TimeoutError(f"Task {task_id} did not complete within {timeout}s. Last payload: {last_task}")
+    print(f"\n[{now_iso()}] Task {task_id} finished (state={task.get('state')}).")
+    return task
 
 
-def print_import_report(adom_oid, adom_name, task_id, file_path, task_result, duration_sec):
+def collect_task_errors(task_result):
+    """Returns (error_entries, has_errors) from a finished import task."""
     task_state    = task_result.get("state", "N/A")
-    task_percent  = task_result.get("percent", "N/A")
     lines_list    = task_result.get("line", []) or []
     history_list  = task_result.get("history", []) or []
 
     error_entries = []
 
     # Per-step errors often show up in 'detail' with text like "mismatch", "invalid", etc.
-    for entry in lines_list:
-        err = entry.get("err", 0)
-        detail = entry.get("detail") or entry.get("msg") or ""
-        if err != 0 or ("error" in detail.lower()) or ("mismatch" in detail.lower()) or ("invalid" in detail.lower()):
-            error_entries.append(entry)
-
-    for entry in history_list:
+    for entry in lines_list + history_list:
         err = entry.get("err", 0)
         detail = entry.get("detail") or entry.get("msg") or ""
         if err != 0 or ("error" in detail.lower()) or ("mismatch" in detail.lower()) or ("invalid" in detail.lower()):
@@ -296,6 +347,13 @@ def print_import_report(adom_oid, adom_name, task_id, file_path, task_result, du
 
     # Treat anything not state==4 or with error entries as failure
     has_errors = len(error_entries) > 0 or str(task_state) not in ("4",)
+    return error_entries, has_errors
+
+
+def print_import_report(adom_oid, adom_name, task_id, file_path, task_result, duration_sec):
+    task_state    = task_result.get("state", "N/A")
+    task_percent  = task_result.get("percent", "N/A")
+    error_entries, has_errors = collect_task_errors(task_result)
 
     lines = [
         "",
@@ -330,14 +388,180 @@ def print_import_report(adom_oid, adom_name, task_id, file_path, task_result, du
     print("\n".join(lines))
 
 
+STAGED_FILE_PATH = "/var/tmp/deploy_import"
+STAGED_FILE_MISSING = ("no such file", "does not exist", "not exist", "not found")
+
+
+def _staged_file_missing(error_text):
+    """True only for errors that say the staged bundle itself is missing."""
+    text = error_text.lower()
+    return STAGED_FILE_PATH in text and any(marker in text for marker in STAGED_FILE_MISSING)
+
+
+def run_batch_import(session, csrf_token, file_path, adoms, concurrency=3, timeout=1800):
+    """
+    Fan one uploaded bundle out to many ADOMs.
+
+    The file is uploaded once; FMG stages it at /var/tmp/deploy_import and
+    every import task reads it from there. At most `concurrency` import tasks
+    run at a time, all polled together by one TaskWatcher. The GUI session
+    carries the current ADOM, so each running import gets its own logged-in
+    session (the caller's plus concurrency-1 extra logins) which is switched
+    to the target ADOM before the import is started.
+
+    If an import reports that the staged file is gone, no new imports are
+    started; once the ones in flight have finished the bundle is uploaded
+    again and the affected ADOMs are retried (once each). ADOMs whose task
+    is still running after `timeout` seconds are reported as "pending" with
+    their task ID. Returns one result dict per ADOM, built from each task's
+    line/history entries.
+    """
+    upload_template_file(session, csrf_token, file_path)
+    uploads = 1
+    watcher = flatui.make_task_watcher(BASE_URL, session, csrf_token, show_progress=False)
+    queue = deque((adom, 1) for adom in adoms)
+    lost = []                  # (adom, attempt) waiting for the bundle to be re-uploaded
+    results = {}
+    running = {}
+    lanes = [(session, csrf_token)]
+    extra_lanes = []
+    for _ in range(min(max(1, concurrency), len(adoms)) - 1):
+        lane_session = requests.Session()
+        extra_lanes.append((lane_session, login(lane_session)))
+    lanes += extra_lanes
+
+    def record(adom, attempt, start, task_id=None, task=None, error=None, status="failed"):
+        entry = {"adom": adom.get("name"), "oid": adom.get("oid"), "task_id": task_id,
+                 "attempt": attempt, "duration_sec": round(time.time() - start, 1)}
+        if task is not None:
+            error_entries, has_errors = collect_task_errors(task)
+            entry.update(state=task.get("state"), status="failed" if has_errors else "ok",
+                         errors=[e.get("detail") or e.get("msg") or "" for e in error_entries])
+        else:
+            entry.update(state=None, status=status, errors=[error])
+        results[adom.get("oid")] = entry
+        mark = "✔" if entry["status"] == "ok" else "✘"
+        print(f"[{now_iso()}] {mark} {entry['adom']} (OID {entry['oid']}): {entry['status']}"
+              + (f" — {entry['errors'][0]}" if entry["errors"] and entry["errors"][0] else ""))
+        return entry
+
+    def staged_file_lost(adom, attempt, errors):
+        if attempt == 1 and any(_staged_file_missing(e) for e in errors):
+            print(f"[{now_iso()}] Staged import file missing for {adom.get('name')} — "
+                  f"will upload again once running imports finish.")
+            lost.append((adom, attempt + 1))
+            return True
+        return False
+
+    def finished(task_id, future):
+        adom, attempt, start, lane = running.pop(task_id)
+        lanes.append(lane)
+        if future.exception() is not None:
+            record(adom, attempt, start, task_id, error=str(future.exception()))
+        else:
+            task = future.result()
+            entry = record(adom, attempt, start, task_id, task=task)
+            if entry["status"] != "ok" and staged_file_lost(adom, attempt, entry["errors"]):
+                results.pop(adom.get("oid"))
+        submit()
+
+    def submit():
+        nonlocal uploads
+        if lost:
+            if running:
+                return          # never replace the bundle under imports still reading it
+            upload_template_file(session, csrf_token, file_path)
+            uploads += 1
+            queue.extendleft(reversed(lost))
+            lost.clear()
+        while queue and lanes and not lost:
+            adom, attempt = queue.popleft()
+            lane = lanes.pop()
+            lane_session, lane_csrf = lane
+            start = time.time()
+            try:
+                switch_adom(lane_session, lane_csrf, adom["oid"])
+                task_id, _ = execute_import(lane_session, lane_csrf, adom["oid"])
+            except (RuntimeError, requests.RequestException) as e:
+                lanes.append(lane)
+                if not staged_file_lost(adom, attempt, [str(e)]):
+                    record(adom, attempt, start, error=str(e))
+                continue
+            running[task_id] = (adom, attempt, start, lane)
+            fut = watcher.watch(task_id)
+            fut.add_done_callback(lambda f, tid=task_id: finished(tid, f))
+        if lost and not running:
+            submit()
+
+    try:
+        submit()
+        try:
+            watcher.run(timeout=timeout)
+        except TimeoutError:
+            print(f"[{now_iso()}] Timed out after {timeout}s with {len(running)} import task(s) still pending.")
+            for task_id, (adom, attempt, start, _) in sorted(running.items(), key=lambda kv: str(kv[0])):
+                record(adom, attempt, start, task_id, status="pending",
+                       error=f"task {task_id} still running on FMG after {timeout}s")
+            for adom, attempt in list(queue) + lost:
+                record(adom, attempt, time.time(), status="skipped", error="not started before the timeout")
+    finally:
+        for lane_session, lane_csrf in extra_lanes:
+            logout(lane_session, lane_csrf)
+    print(f"[{now_iso()}] Bundle uploaded {uploads} time(s) for {len(adoms)} ADOM(s).")
+    return [results[a.get("oid")] for a in adoms if a.get("oid") in results]
+
+
+def print_batch_report(file_path, results, duration_sec, report_path=None):
+    print(f"\n{'ADOM':<30} {'OID':<8} {'Task':<8} {'Status':<8} Details")
+    print("-" * 90)
+    for r in results:
+        detail = "; ".join(e for e in r["errors"] if e)[:60]
+        print(f"{r['adom']:<30} {str(r['oid']):<8} {str(r['task_id'] or '-'):<8} {r['status']:<8} {detail}")
+    print("-" * 90)
+    ok = sum(1 for r in results if r["status"] == "ok")
+    print(f"[{now_iso()}] {ok}/{len(results)} ADOM(s) imported in {duration_sec:.1f}s.")
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump({"fmg_host": HOST, "source_file": file_path, "finished_at": now_iso(),
+                       "duration_sec": round(duration_sec, 1), "results": results}, f, indent=2)
+        print(f"[{now_iso()}] Report saved to: {report_path}")
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Import FortiManager provisioning templates.")
+    p.add_argument("--adoms", help="Batch mode: comma-separated ADOM names, or 'all' (Global excluded)")
+    p.add_argument("--file", help="Batch mode: export file name in EXPORT_DIR (or a path)")
+    p.add_argument("--concurrency", type=int, default=3,
+                   help="Batch mode: max import tasks running at once (default: 3)")
+    p.add_argument("--timeout", type=int, default=1800,
+                   help="Batch mode: seconds to wait for the import tasks (default: 1800)")
+    p.add_argument("--report", help="Batch mode: write per-ADOM results to this JSON file")
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+
 # ─── Main ─────────────────────────────────────────────────────────────────────
 def main():
+    args = parse_args()
     session = requests.Session()
     start = time.time()
     csrf_token = None
 
     try:
         csrf_token = login(session)
+
+        if args.adoms:
+            if not args.file:
+                raise RuntimeError("--file is required with --adoms.")
+            file_path = args.file if os.path.isfile(args.file) else os.path.join(EXPORT_DIR, args.file)
+            if not os.path.isfile(file_path):
+                raise RuntimeError(f"File not found: '{file_path}'")
+            adoms = flatui.select_batch_adoms(list_adoms(session, csrf_token), args.adoms)
+            results = run_batch_import(session, csrf_token, file_path, adoms,
+                                       args.concurrency, args.timeout)
+            print_batch_report(file_path, results, time.time() - start, args.report)
+            return
+
         adom_oid, adom_name = prompt_adom_selection(session, csrf_token)
 
         file_path = prompt_import_file()
@@ -361,4 +585,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    profiling.run_main(main)
@@ -0,0 +1,331 @@
+"""
+Indexed catalog of exported template bundles.
+
+Export files pile up in EXPORT_DIR as '{task_id}_{file_name}' blobs. This
+tool parses every bundle ONCE and records, per template, its category, name
+and a content hash in a local SQLite index (EXPORT_DIR/catalog.sqlite).
+Files that were already indexed and have not changed (same size and mtime)
+are skipped on the next run, so re-indexing is cheap.
+
+Usage:
+    python template_catalog.py index                  # (re)index EXPORT_DIR
+    python template_catalog.py list                   # indexed exports
+    python template_catalog.py find Branch_SDWAN      # exports containing a template
+    python template_catalog.py diff 12_a.dat 15_b.dat # templates changed between exports
+    python template_catalog.py --dir /backups/fmg index
+
+Bundles may be plain JSON, gzip-compressed JSON or a (gzipped) tar archive
+of JSON files. Any list of objects found under a top-level key (or one level
+deeper) is treated as a template category; each object's 'name' (falling
+back to '_name' / 'oid') is its template name.
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tarfile
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import profiling
+
+EXPORT_DIR = "./fmg_exports"
+CATALOG_NAME = "catalog.sqlite"
+
+# fields that differ between otherwise identical templates (per ADOM / per export)
+VOLATILE_KEYS = {"oid", "uuid", "_last-modified", "_created timestamp", "_modified timestamp"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exports (
+    id          INTEGER PRIMARY KEY,
+    file        TEXT UNIQUE NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime       REAL NOT NULL,
+    sha256      TEXT NOT NULL,
+    adom        TEXT,
+    indexed_at  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS templates (
+    export_id    INTEGER NOT NULL REFERENCES exports(id) ON DELETE CASCADE,
+    category     TEXT NOT NULL,
+    name         TEXT NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_templates_name     ON templates(name);
+CREATE INDEX IF NOT EXISTS idx_templates_export   ON templates(export_id);
+CREATE INDEX IF NOT EXISTS idx_templates_category ON templates(category, name);
+"""
+
+
+# ── bundle parsing ─────────────────────────────────────────────────────────────
+
+def _strip_volatile(obj):
+    if isinstance(obj, dict):
+        return {k: _strip_volatile(v) for k, v in obj.items() if k not in VOLATILE_KEYS}
+    if isinstance(obj, list):
+        return [_strip_volatile(v) for v in obj]
+    return obj
+
+
+def content_hash(obj) -> str:
+    """Stable hash of a template, independent of key order and volatile fields."""
+    canonical = json.dumps(_strip_volatile(obj), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _template_name(obj: dict) -> str:
+    for key in ("name", "_name", "oid"):
+        if obj.get(key) not in (None, ""):
+            return str(obj[key])
+    return "(unnamed)"
+
+
+def _walk_templates(doc, prefix="", depth=0):
+    """Yield (category, name, template_obj) from a parsed bundle document."""
+    if isinstance(doc, list):
+        for obj in doc:
+            if isinstance(obj, dict):
+                yield prefix or "(root)", _template_name(obj), obj
+        return
+    if not isinstance(doc, dict):
+        return
+    for key, value in doc.items():
+        category = f"{prefix}/{key}" if prefix else str(key)
+        if isinstance(value, list) and any(isinstance(v, dict) for v in value):
+            yield from _walk_templates(value, category, depth + 1)
+        elif isinstance(value, dict) and depth < 1:
+            yield from _walk_templates(value, category, depth + 1)
+
+
+def _json_documents(raw: bytes):
+    """Yield parsed JSON documents from a bundle's raw bytes."""
+    if raw[:2] == b"\x1f\x8b":
+        try:
+            raw = gzip.decompress(raw)
+        except OSError:
+            pass
+    bio = io.BytesIO(raw)
+    if tarfile.is_tarfile(bio):
+        bio.seek(0)
+        with tarfile.open(fileobj=bio) as tar:
+            for member in tar.getmembers():
+                if member.isfile():
+                    data = tar.extractfile(member).read()
+                    try:
+                        yield json.loads(data)
+                    except ValueError:
+                        continue
+        return
+    yield json.loads(raw)
+
+
+def load_json_bundle(path: str) -> tuple:
+    """
+    (document, gzipped) for a single-document JSON bundle, or (None, False)
+    when the bundle is a tar archive or not JSON at all.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    gzipped = raw[:2] == b"\x1f\x8b"
+    try:
+        docs = list(_json_documents(raw))
+    except (ValueError, OSError, tarfile.TarError):
+        return None, False
+    if len(docs) != 1 or tarfile.is_tarfile(io.BytesIO(gzip.decompress(raw) if gzipped else raw)):
+        return None, False
+    return docs[0], gzipped
+
+
+def parse_bundle(path: str) -> list:
+    """Return [(category, name, content_hash), ...] for one export file."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    rows = []
+    for doc in _json_documents(raw):
+        for category, name, obj in _walk_templates(doc):
+            rows.append((category, name, content_hash(obj)))
+    return rows
+
+
+# ── catalog ────────────────────────────────────────────────────────────────────
+
+class TemplateCatalog:
+    def __init__(self, export_dir: str = EXPORT_DIR, db_path: str | None = None):
+        self.export_dir = export_dir
+        self.db_path = db_path or os.path.join(export_dir, CATALOG_NAME)
+        os.makedirs(export_dir, exist_ok=True)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _manifest_adoms(self) -> dict:
+        """basename -> ADOM, from export_manifest_*.json files written by batch exports."""
+        adoms = {}
+        for fname in os.listdir(self.export_dir):
+            if fname.startswith("export_manifest_") and fname.endswith(".json"):
+                try:
+                    with open(os.path.join(self.export_dir, fname), encoding="utf-8") as f:
+                        for entry in json.load(f).get("exports", []):
+                            if entry.get("path"):
+                                adoms[os.path.basename(entry["path"])] = entry.get("adom")
+                except (OSError, ValueError):
+                    continue
+        return adoms
+
+    def bundle_files(self) -> list:
+        skip_suffixes = (".part", ".sha256", ".sqlite", ".sqlite-journal")
+        return sorted(
+            f for f in os.listdir(self.export_dir)
+            if os.path.isfile(os.path.join(self.export_dir, f))
+            and not f.endswith(skip_suffixes)
+            and not f.startswith("export_manifest_")
+            and f != "incremental_state.json"
+        )
+
+    def index(self, verbose: bool = True) -> dict:
+        """Parse new or changed bundles; drop entries for deleted files."""
+        stats = {"indexed": 0, "unchanged": 0, "failed": 0, "removed": 0}
+        known = {row[0]: row[1:] for row in self.db.execute("SELECT file, size, mtime, id FROM exports")}
+        adoms = self._manifest_adoms()
+        present = set()
+
+        for fname in self.bundle_files():
+            path = os.path.join(self.export_dir, fname)
+            st = os.stat(path)
+            present.add(fname)
+            if fname in known and known[fname][0] == st.st_size and known[fname][1] == st.st_mtime:
+                stats["unchanged"] += 1
+                continue
+            try:
+                rows = parse_bundle(path)
+            except (ValueError, OSError, tarfile.TarError) as exc:
+                stats["failed"] += 1
+                if verbose:
+                    print(f"  ! {fname}: not a parseable bundle ({exc.__class__.__name__})")
+                continue
+            sha256 = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    sha256.update(chunk)
+            sha256 = sha256.hexdigest()
+            with self.db:
+                self.db.execute("DELETE FROM exports WHERE file = ?", (fname,))
+                cur = self.db.execute(
+                    "INSERT INTO exports (file, size, mtime, sha256, adom, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (fname, st.st_size, st.st_mtime, sha256, adoms.get(fname),
+                     datetime.now(timezone.utc).isoformat()))
+                self.db.executemany(
+                    "INSERT INTO templates (export_id, category, name, content_hash) VALUES (?, ?, ?, ?)",
+                    [(cur.lastrowid, c, n, h) for c, n, h in rows])
+            stats["indexed"] += 1
+            if verbose:
+                print(f"  + {fname}: {len(rows)} template(s)")
+
+        gone = [f for f in known if f not in present]
+        if gone:
+            with self.db:
+                self.db.executemany("DELETE FROM exports WHERE file = ?", [(f,) for f in gone])
+            stats["removed"] = len(gone)
+        return stats
+
+    def exports(self) -> list:
+        return self.db.execute("""
+            SELECT e.file, e.adom, e.indexed_at, COUNT(t.name)
+            FROM exports e LEFT JOIN templates t ON t.export_id = e.id
+            GROUP BY e.id ORDER BY e.file
+        """).fetchall()
+
+    def find(self, name: str, category: str | None = None, like: bool = False) -> list:
+        """[(file, adom, category, name, content_hash)] of exports containing a template."""
+        op = "LIKE" if like else "="
+        sql = (f"SELECT e.file, e.adom, t.category, t.name, t.content_hash "
+               f"FROM templates t JOIN exports e ON e.id = t.export_id WHERE t.name {op} ?")
+        args = [name]
+        if category:
+            sql += " AND t.category = ?"
+            args.append(category)
+        return self.db.execute(sql + " ORDER BY e.file, t.category", args).fetchall()
+
+    def _export_id(self, file: str) -> int:
+        row = self.db.execute("SELECT id FROM exports WHERE file = ?", (os.path.basename(file),)).fetchone()
+        if not row:
+            raise KeyError(f"Export '{file}' is not in the catalog — run 'index' first.")
+        return row[0]
+
+    def diff(self, old_file: str, new_file: str) -> dict:
+        """Templates added / removed / changed between two exports."""
+        def load(export_id):
+            return {(c, n): h for c, n, h in self.db.execute(
+                "SELECT category, name, content_hash FROM templates WHERE export_id = ?", (export_id,))}
+        old, new = load(self._export_id(old_file)), load(self._export_id(new_file))
+        return {
+            "added":   sorted(k for k in new if k not in old),
+            "removed": sorted(k for k in old if k not in new),
+            "changed": sorted(k for k in new if k in old and new[k] != old[k]),
+        }
+
+
+# ── CLI ────────────────────────────────────────────────────────────────────────
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Index and query exported FortiManager template bundles.")
+    p.add_argument("--dir", default=EXPORT_DIR, help=f"Export directory (default: {EXPORT_DIR})")
+    p.add_argument("--db", help="Catalog path (default: <dir>/catalog.sqlite)")
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("index", help="Index new or changed export bundles")
+    sub.add_parser("list", help="List indexed exports")
+    f = sub.add_parser("find", help="Which exports contain a template")
+    f.add_argument("name", help="Template name (use --like for SQL wildcards, e.g. 'Branch%%')")
+    f.add_argument("--category", help="Restrict to one category")
+    f.add_argument("--like", action="store_true", help="Treat name as a LIKE pattern")
+    d = sub.add_parser("diff", help="Templates changed between two exports")
+    d.add_argument("old")
+    d.add_argument("new")
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    catalog = TemplateCatalog(args.dir, args.db)
+    try:
+        if args.command == "index":
+            stats = catalog.index()
+            print(f"Indexed {stats['indexed']}, unchanged {stats['unchanged']}, "
+                  f"failed {stats['failed']}, removed {stats['removed']} — {catalog.db_path}")
+        elif args.command == "list":
+            print(f"{'Export File':<50} {'ADOM':<20} {'Templates':>9}")
+            print("-" * 81)
+            for file, adom, _, count in catalog.exports():
+                print(f"{file:<50} {adom or '-':<20} {count:>9}")
+        elif args.command == "find":
+            rows = catalog.find(args.name, args.category, args.like)
+            if not rows:
+                print(f"No indexed export contains '{args.name}'.")
+            for file, adom, category, name, h in rows:
+                print(f"{file:<50} {adom or '-':<20} {category:<20} {name}  [{h[:12]}]")
+        elif args.command == "diff":
+            try:
+                changes = catalog.diff(args.old, args.new)
+            except KeyError as exc:
+                print(exc.args[0])
+                sys.exit(1)
+            for kind, mark in (("added", "+"), ("removed", "-"), ("changed", "~")):
+                for category, name in changes[kind]:
+                    print(f"  {mark} {category:<25} {name}")
+            print(f"{len(changes['added'])} added, {len(changes['removed'])} removed, "
+                  f"{len(changes['changed'])} changed")
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    profiling.run_main(main)
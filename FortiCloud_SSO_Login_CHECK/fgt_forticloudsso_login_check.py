@@ -1,8 +1,14 @@
 
+import argparse
+import os
+import sys
 import requests
 import json
 import urllib3
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import cassette, profiling
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # ─── CONFIG ───────────────────────────────────────────────────────────────────
@@ -16,12 +22,20 @@ session.verify = False
 JSONRPC = f"{FMG_HOST}/jsonrpc"
 
 
-def fmg_request(payload: dict) -> dict:
+def http_post(payload: dict) -> dict:
     r = session.post(JSONRPC, json=payload)
     r.raise_for_status()
     return r.json()
 
 
+# replaced by a recording / replaying wrapper with --record / --replay
+send = http_post
+
+
+def fmg_request(payload: dict) -> dict:
+    return send(payload)
+
+
 # 1. Login
 def login() -> str:
     resp = fmg_request({
@@ -110,8 +124,21 @@ def print_report(results: list[dict]):
     print(f"{'─'*47}\n")
 
 
+def parse_args():
+    p = argparse.ArgumentParser(
+        description="Audit admin-forticloud-sso-login on every FortiGate managed by FortiManager.")
+    p.add_argument("--out", default="sso_report.json", help="JSON report path (default: sso_report.json)")
+    cassette.add_arguments(p)
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+
 # ── MAIN ──────────────────────────────────────────────────────────────────────
-if __name__ == "__main__":
+def main():
+    global send
+    args    = parse_args()
+    send    = cassette.wrap(http_post, record=args.record, replay=args.replay,
+                            latency=args.replay_latency)
     token   = login()
     targets = list_devices(token)
     results = fetch_sso_status(token, targets)
@@ -119,6 +146,10 @@ if __name__ == "__main__":
     print_report(results)
 
     # Optional: export to JSON
-    with open("sso_report.json", "w") as f:
+    with open(args.out, "w") as f:
         json.dump(results, f, indent=2)
-    print("💾 Report saved to sso_report.json")
+    print(f"💾 Report saved to {args.out}")
+
+
+if __name__ == "__main__":
+    profiling.run_main(main)
@@ -1,12 +1,18 @@
+import argparse
+import os
+import sys
 import requests
 import csv
 import json
 import urllib3
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fmg_common import cassette, profiling
+
 # --- Bypass urllib3 SSL Certificate Warnings ---
 urllib3.disable_warnings()
 
-# --- FMG details --- 
+# --- FMG details ---
 FMG_IP = "https://<FMG_IP>/jsonrpc"
 USERNAME = "<ADMIN>"
 PASSWORD = "<PASSWORD>"
@@ -15,6 +21,15 @@ ADOM = "root"
 session = requests.Session()
 session.verify = False
 
+
+def http_post(payload):
+    r = session.post(FMG_IP, json=payload)
+    return r.json()
+
+
+# replaced by a recording / replaying wrapper with --record / --replay
+send = http_post
+
 # --- UPDATED FUNCTION TO ACCEPT SESSION_ID ---
 def rpc(method, params, session_id=None):
     payload = {
@@ -25,80 +40,104 @@ def rpc(method, params, session_id=None):
     # Explicitly add the session key to the JSON body
     if session_id:
         payload["session"] = session_id
-        
-    r = session.post(FMG_IP, json=payload)
-    return r.json()
 
-# ---- LOGIN ----
-login_payload = {
-    "url": "/sys/login/user",
-    "data": {
-        "user": USERNAME,
-        "passwd": PASSWORD
-    }
-}
+    return send(payload)
 
-resp = rpc("exec", [login_payload])
 
-# Extract the session key from the response
-try:
-    SESSION_ID = resp["session"]
-    print(f"Logged in. Session ID: {SESSION_ID[:20]}...") 
-except KeyError:
-    print(json.dumps(resp, indent=2))
-    raise SystemExit("Login failed: Session key not found in response.")
+def result_data(resp):
+    """data list from result[0], which some FMG builds nest under 'response'."""
+    res = resp["result"][0]
+    if "data" in res:
+        return res["data"]
+    if "response" in res and "data" in res["response"]:
+        return res["response"]["data"]
+    return None
 
 
+# ---- LOGIN ----
+def login():
+    login_payload = {
+        "url": "/sys/login/user",
+        "data": {
+            "user": USERNAME,
+            "passwd": PASSWORD
+        }
+    }
 
-# ---- GET DEVICES (Passing the SESSION_ID) ----
-devices = rpc("get", [{"url": f"/dvmdb/adom/{ADOM}/device"}], session_id=SESSION_ID)
+    resp = rpc("exec", [login_payload])
+
+    # Extract the session key from the response
+    try:
+        session_id = resp["session"]
+        print(f"Logged in. Session ID: {session_id[:20]}...")
+    except KeyError:
+        print(json.dumps(resp, indent=2))
+        raise SystemExit("Login failed: Session key not found in response.")
+    return session_id
 
-res = devices["result"][0]
-if "data" in res:
-    dev_list = res["data"]
-elif "response" in res and "data" in res["response"]:
-    dev_list = res["response"]["data"]
-else:
-    print(json.dumps(devices, indent=2))
-    raise SystemExit("Could not find device list in response")
 
-rows = []
+# ---- GET DEVICES (Passing the SESSION_ID) ----
+def list_devices(session_id, adom):
+    devices = rpc("get", [{"url": f"/dvmdb/adom/{adom}/device"}], session_id=session_id)
+    dev_list = result_data(devices)
+    if dev_list is None:
+        print(json.dumps(devices, indent=2))
+        raise SystemExit("Could not find device list in response")
+    return dev_list
 
-# ---- LOOP DEVICES ----
-for d in dev_list:
-    name = d["name"]
 
+def device_interfaces(session_id, name):
     # Passing the SESSION_ID here as well
     iface_resp = rpc("get", [{
         "url": f"/pm/config/device/{name}/global/system/interface"
-    }], session_id=SESSION_ID)
+    }], session_id=session_id)
 
-    ires = iface_resp["result"][0]
-
-    if "data" in ires:
-        ifaces = ires["data"]
-    elif "response" in ires and "data" in ires["response"]:
-        ifaces = ires["response"]["data"]
-    else:
-        ifaces = []
-
-    for i in ifaces:
+    rows = []
+    for i in result_data(iface_resp) or []:
         iface = i.get("name","")
         ip = i.get("ip","")
         mode = i.get("mode","static")
         dhcp = "enabled" if mode == "dhcp" else "disabled"
 
         rows.append([name, iface, ip, dhcp])
+    return rows
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Export FortiGate interface settings from FortiManager to CSV.")
+    p.add_argument("--adom", default=ADOM, help=f"ADOM to query (default: {ADOM})")
+    p.add_argument("--out", default="interfaces.csv", help="CSV path (default: interfaces.csv)")
+    cassette.add_arguments(p)
+    profiling.add_arguments(p)
+    return p.parse_args()
+
+
+def main():
+    global send
+    args = parse_args()
+    send = cassette.wrap(http_post, record=args.record, replay=args.replay,
+                         latency=args.replay_latency)
+    session_id = login()
+
+    rows = []
+
+    # ---- LOOP DEVICES ----
+    for d in list_devices(session_id, args.adom):
+        name = d["name"]
+        rows.extend(device_interfaces(session_id, name))
+        print(f"Pulled {name}")
+
+    # ---- WRITE CSV ----
+    with open(args.out,"w",newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["Hostname","Interface","IP","DHCP"])
+        w.writerows(rows)
 
-    print(f"Pulled {name}")
+    # ---- LOGOUT (Best Practice) ----
+    rpc("exec", [{"url": "/sys/logout"}], session_id=session_id)
 
-# ---- WRITE CSV ----
-with open("interfaces.csv","w",newline="") as f:
-    w = csv.writer(f)
-    w.writerow(["Hostname","Interface","IP","DHCP"])
-    w.writerows(rows)
+    print(f"{args.out} created and logged out.")
 
-# ---- LOGOUT (Best Practice) ----
-rpc("exec", [{"url": "/sys/logout"}], session_id=SESSION_ID)
 
-print("interfaces.csv created and logged out.")
+if __name__ == "__main__":
+    profiling.run_main(main)
@@ -0,0 +1,7 @@
+"""
+Shared helpers for the FMG_Python scripts.
+
+The scripts in this repository are meant to be run directly from their own
+folders, so each one puts the repository root on sys.path before importing
+from this package.
+"""
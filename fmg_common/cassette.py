@@ -0,0 +1,153 @@
+"""
+Record / replay of FortiManager JSON-RPC traffic ("cassettes").
+
+A cassette is a gzip-compressed file of compact JSON lines, one per
+request/response pair, with the time the call took:
+
+    {"request": {...}, "response": {...}, "elapsed": 0.184}
+
+Secrets never reach the file: session tokens, password-like fields and
+FortiOS "ENC ..." values are replaced by placeholders before anything is
+written. Replaying serves the recorded responses without touching the
+appliance, either with the recorded latency (to reproduce a real run's
+timing) or with none (to profile parsing and writing on real data shapes).
+
+Scripts wrap whatever function they use to send one JSON-RPC payload:
+
+    send = cassette.wrap(http_post, record="run.cassette.gz")      # capture
+    send = cassette.wrap(http_post, replay="run.cassette.gz",       # offline
+                         latency="zero")
+    response = send({"method": "get", "params": [...], "session": sid, "id": 3})
+
+Requests are matched on method + params (request "id" and session token
+ignored). Identical requests are answered in the order they were recorded.
+"""
+
+import atexit
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+SESSION_PLACEHOLDER = "<session>"
+REDACTED = "<redacted>"
+SECRET_KEYS = {"passwd", "password", "secretkey", "secret", "pass", "token",
+               "apikey", "api_key", "psksecret", "private-key"}
+LATENCY_MODES = ("recorded", "zero")
+
+
+def scrub(obj):
+    """Copy of a JSON-RPC request or response with secrets replaced."""
+    if isinstance(obj, dict):
+        clean = {}
+        for key, value in obj.items():
+            if key == "session" and value:
+                clean[key] = SESSION_PLACEHOLDER
+            elif key.lower() in SECRET_KEYS and value not in (None, "", []):
+                clean[key] = REDACTED
+            else:
+                clean[key] = scrub(value)
+        return clean
+    if isinstance(obj, list):
+        return [scrub(v) for v in obj]
+    if isinstance(obj, str) and obj.startswith("ENC "):
+        return REDACTED
+    return obj
+
+
+def request_key(payload: dict) -> str:
+    """Match key: method + params, secrets scrubbed, id/session ignored."""
+    return json.dumps({"method": payload.get("method"), "params": scrub(payload.get("params"))},
+                      sort_keys=True, separators=(",", ":"), default=str)
+
+
+class Recorder:
+    """Appends scrubbed request/response pairs to a cassette file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.count = 0
+        atexit.register(self.close)
+
+    def record(self, payload: dict, response: dict, elapsed: float) -> None:
+        line = json.dumps({"request": scrub(payload), "response": scrub(response),
+                           "elapsed": round(elapsed, 4)},
+                          separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class Replayer:
+    """Serves responses from a cassette instead of the network."""
+
+    def __init__(self, path: str, latency: str = "recorded"):
+        if latency not in LATENCY_MODES:
+            raise ValueError(f"latency must be one of {LATENCY_MODES}, not {latency!r}")
+        self.path = path
+        self.latency = latency
+        self._entries = defaultdict(deque)
+        self._lock = threading.Lock()
+        self.served = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[request_key(entry["request"])].append(entry)
+
+    def __call__(self, payload: dict) -> dict:
+        key = request_key(payload)
+        with self._lock:
+            queue = self._entries.get(key)
+            if not queue:
+                raise LookupError(
+                    f"Cassette {self.path} has no (more) recorded responses for "
+                    f"{payload.get('method')} {[p.get('url') for p in payload.get('params') or []]}")
+            # keep the last answer for requests repeated more often than recorded
+            # (e.g. task polling that finishes sooner on replay)
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+            self.served += 1
+        if self.latency == "recorded":
+            time.sleep(entry.get("elapsed", 0))
+        return entry["response"]
+
+
+def wrap(post, record: str | None = None, replay: str | None = None,
+         latency: str = "recorded"):
+    """
+    Wrap post(payload) -> response for recording or replay.
+    With neither path set, post is returned unchanged.
+    """
+    if replay:
+        return Replayer(replay, latency)
+    if not record:
+        return post
+    recorder = Recorder(record)
+
+    def recording_post(payload: dict) -> dict:
+        start = time.perf_counter()
+        response = post(payload)
+        recorder.record(payload, response, time.perf_counter() - start)
+        return response
+
+    recording_post.recorder = recorder
+    return recording_post
+
+
+def add_arguments(parser) -> None:
+    """Add the shared --record / --replay / --replay-latency options."""
+    group = parser.add_argument_group("record / replay")
+    group.add_argument("--record", metavar="FILE",
+                       help="Save scrubbed JSON-RPC traffic to a compressed cassette")
+    group.add_argument("--replay", metavar="FILE",
+                       help="Serve responses from a cassette instead of FortiManager")
+    group.add_argument("--replay-latency", choices=LATENCY_MODES, default="recorded",
+                       help="Sleep the recorded time per call, or not at all (default: recorded)")
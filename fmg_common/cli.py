@@ -0,0 +1,98 @@
+"""
+Single `fmg` entry point for every tool in the repository.
+
+    fmg extract --adom root --category firewall
+    fmg retrieve --all-adoms --summary out.json
+    fmg export --adoms all --incremental
+    fmg --help
+
+Subcommands are looked up in COMMANDS and the tool module is imported only
+when that subcommand runs, so `fmg --help` and `fmg <cmd> --help` pay for
+nothing but the one module they need. Everything after the subcommand is
+handed to the tool's own argument parser unchanged.
+
+Tools are loaded from their folders in the repository, so install with
+`pip install -e .` (or run `python -m fmg_common.cli` from the repo root).
+"""
+
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# subcommand -> (folder, module, one-line help)
+COMMANDS = {
+    "extract":    ("ADOM_Extractor", "adom_extractor",
+                   "Extract every ADOM-level object table to JSON/CSV"),
+    "fleet":      ("ADOM_Extractor", "fleet_extract",
+                   "Extract several FortiManagers in parallel from an inventory"),
+    "interfaces": ("Get_FGT_Interfaces", "get_interfaces",
+                   "Export FortiGate interface IP/DHCP settings to CSV"),
+    "sso":        ("FortiCloud_SSO_Login_CHECK", "fgt_forticloudsso_login_check",
+                   "Audit admin-forticloud-sso-login across managed FortiGates"),
+    "upgrade":    ("ADOM_Upgrade", "adom_upgrade",
+                   "Upgrade ADOMs hop by hop (or --plan a dry run)"),
+    "retrieve":   ("Configuration_Retrieve_Automation", "config_retrieve_automation",
+                   "Retrieve device configurations into FortiManager"),
+    "export":     ("Export_Import_Provisioning_Templates", "fmg_export_templates",
+                   "Export provisioning templates from one or many ADOMs"),
+    "import":     ("Export_Import_Provisioning_Templates", "fmg_import_templates",
+                   "Import a provisioning template bundle into one or many ADOMs"),
+    "catalog":    ("Export_Import_Provisioning_Templates", "template_catalog",
+                   "Index and query exported template bundles"),
+    "bench":      ("fmg_common", "startup_bench",
+                   "Measure start-up and import time of every subcommand"),
+}
+
+
+def usage() -> str:
+    width = max(len(name) for name in COMMANDS)
+    lines = [
+        "usage: fmg <command> [options]",
+        "",
+        "FortiManager automation toolkit.",
+        "",
+        "commands:",
+    ]
+    for name, (_, _, help_text) in COMMANDS.items():
+        lines.append(f"  {name:<{width}}  {help_text}")
+    lines += ["", "Run 'fmg <command> --help' for the options of one command."]
+    return "\n".join(lines)
+
+
+def load(command: str):
+    """Import the module behind a subcommand (its folder goes on sys.path first)."""
+    folder, module, _ = COMMANDS[command]
+    folder_path = os.path.join(REPO_ROOT, folder)
+    if folder != "fmg_common" and folder_path not in sys.path:
+        sys.path.insert(0, folder_path)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    name = f"fmg_common.{module}" if folder == "fmg_common" else module
+    # __import__ rather than importlib.import_module so that -X importtime
+    # (used by `fmg bench`) attributes the imports to the tool module
+    __import__(name)
+    return sys.modules[name]
+
+
+def main(argv=None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ("-h", "--help", "help"):
+        print(usage())
+        return 0
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"fmg: unknown command '{command}'\n", file=sys.stderr)
+        print(usage(), file=sys.stderr)
+        return 2
+
+    module = load(command)
+    # the tool parses sys.argv itself — make it look like a direct run
+    sys.argv = [f"fmg {command}", *rest]
+    from fmg_common import profiling
+    result = profiling.run_main(module.main)
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
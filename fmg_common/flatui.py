@@ -0,0 +1,83 @@
+"""
+Helpers for the FortiManager GUI ("flatui") API shared by the template
+export and import scripts.
+
+Both scripts log in through /cgi-bin/module/flatui_auth and keep a
+requests.Session plus its XSRF token. The helpers here take the script's
+BASE_URL explicitly, since each script has its own connection settings:
+
+    from fmg_common import flatui
+
+    watcher = flatui.make_task_watcher(BASE_URL, session, csrf_token)
+    task = watcher.wait(task_id, timeout=180)
+"""
+
+from fmg_common.task_watcher import TaskWatcher
+
+GLOBAL_ADOM_OID = "10"
+
+
+def forward_get(base_url, session, csrf_token, params):
+    """
+    Multi-params GET through the flatui forwarder. Returns the JSON-RPC
+    "result" list, one entry per params dict, in request order.
+    """
+    payload = {
+        "method": "get",
+        "params": params,
+        "id": "3"
+    }
+    resp = session.post(
+        f"{base_url}/cgi-bin/module/flatui/forward",
+        headers={"XSRF-TOKEN": csrf_token},
+        json=payload, verify=False
+    )
+    resp.raise_for_status()
+    raw = resp.json()
+
+    # Try both response shapes: result[...] or data.result[...]
+    try:
+        return raw["result"]
+    except (KeyError, TypeError):
+        try:
+            return raw["data"]["result"]
+        except (KeyError, TypeError):
+            return []
+
+
+def task_done(task):
+    state     = task.get("state", -1)   # 4 = success, 5 = finished with errors
+    percent   = task.get("percent", 0)
+    num_done  = task.get("num_done", 0)
+    num_lines = task.get("num_lines", -1)
+    if state in (2, "2"):
+        return True
+    return state in (4, 5, "4", "5") or percent == 100 or (num_lines > 0 and num_done >= num_lines)
+
+
+def make_task_watcher(base_url, session, csrf_token, poll_interval=3, show_progress=True):
+    """TaskWatcher polling through the forwarder; prints ' NN%' per update unless show_progress is False."""
+    def show(task_id, task):
+        print(f" {task.get('percent', 0)}%", end="", flush=True)
+
+    return TaskWatcher(
+        lambda params: forward_get(base_url, session, csrf_token, params),
+        min_interval=1, max_interval=poll_interval * 2, initial_interval=poll_interval,
+        is_done=task_done, on_update=show if show_progress else None,
+    )
+
+
+def select_batch_adoms(adoms, adom_selector):
+    """
+    Pick the batch ADOMs from a /gui/switch/adoms/list result:
+    'all' (Global excluded) or a comma-separated list of ADOM names, kept in
+    the given order. Raises RuntimeError for names that do not exist.
+    """
+    if adom_selector.strip().lower() == "all":
+        return [a for a in adoms if str(a.get("oid")) != GLOBAL_ADOM_OID]
+    wanted = [n.strip() for n in adom_selector.split(",") if n.strip()]
+    by_name = {a.get("name"): a for a in adoms}
+    missing = [n for n in wanted if n not in by_name]
+    if missing:
+        raise RuntimeError(f"Unknown ADOM(s): {', '.join(missing)}")
+    return [by_name[n] for n in wanted]
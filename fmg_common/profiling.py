@@ -0,0 +1,277 @@
+"""
+Whole-run profiling for the scripts (`--profile`).
+
+    python adom_extractor.py --profile                    # profile_adom_extractor_<ts>.*
+    fmg export --adoms all --profile-prefix /tmp/export   # /tmp/export.*
+
+One run produces:
+
+  <prefix>.pstats     cProfile statistics of every thread, merged
+                      (python -m pstats <prefix>.pstats, snakeviz, ...)
+  <prefix>.collapsed  sampled wall-clock stacks of EVERY thread in collapsed
+                      format ("thread;file:func;file:func count"), ready for
+                      flamegraph.pl or speedscope
+
+and a console summary that splits the main thread's wall time into CPU
+time, time spent waiting on the network and the rest, plus the network wait
+of every other thread. Network wait is measured at the http.client layer
+(connect, waiting for the response, reading the body), which both requests
+and urllib go through, so every script is covered without touching its
+RPC helpers.
+
+cProfile only sees the thread that enabled it (before Python 3.12), so each
+thread started during the run gets its own profile through
+threading.setprofile and the results are merged into one .pstats file.
+
+Scripts opt in by adding the option to their parser and starting main()
+through run_main():
+
+    profiling.add_arguments(parser)
+    ...
+    if __name__ == "__main__":
+        profiling.run_main(main)
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+
+def add_arguments(parser) -> None:
+    # --profile takes no value, so it can never swallow the tool's next argument
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the run: write PREFIX.pstats and PREFIX.collapsed "
+                             "(default prefix: profile_<tool>_<timestamp>)")
+    parser.add_argument("--profile-prefix", metavar="PREFIX",
+                        help="Output prefix for --profile (implies --profile)")
+
+
+# ── network wait accounting ───────────────────────────────────────────────────
+
+class NetworkWait:
+    """Time spent inside http.client I/O, kept per thread."""
+
+    def __init__(self):
+        self.seconds = Counter()            # thread name -> seconds
+        self.calls = Counter()              # thread name -> HTTP requests
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._originals = []
+
+    def _timed(self, func, counts_call=False):
+        wait = self
+
+        def wrapper(*args, **kwargs):
+            depth = getattr(wait._local, "depth", 0)
+            if depth:                       # nested (read -> readinto): outer call times it
+                return func(*args, **kwargs)
+            wait._local.depth = 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                wait._local.depth = 0
+                name = threading.current_thread().name
+                with wait._lock:
+                    wait.seconds[name] += elapsed
+                    if counts_call:
+                        wait.calls[name] += 1
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def install(self) -> None:
+        import http.client
+        targets = [
+            (http.client.HTTPConnection, "connect", False),
+            (http.client.HTTPConnection, "getresponse", True),
+            (http.client.HTTPResponse, "read", False),
+            (http.client.HTTPResponse, "readinto", False),
+            (http.client.HTTPResponse, "read1", False),
+            (http.client.HTTPResponse, "readline", False),
+        ]
+        for cls, name, counts_call in targets:
+            original = cls.__dict__.get(name)
+            if original is None:
+                continue
+            self._originals.append((cls, name, original))
+            setattr(cls, name, self._timed(original, counts_call))
+
+    def uninstall(self) -> None:
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+        self._originals.clear()
+
+
+# ── wall-clock stack sampler ──────────────────────────────────────────────────
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of all threads every `interval` seconds."""
+
+    def __init__(self, interval: float = 0.005):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(self._frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# ── runner ─────────────────────────────────────────────────────────────────────
+
+class Profiler:
+    def __init__(self, prefix: str, top: int = 15):
+        self.prefix = prefix
+        self.top = top
+        import cProfile   # profiling modules load only when --profile is used
+        self._new_profile = cProfile.Profile
+        self.cprofile = cProfile.Profile()
+        self.thread_profiles = []
+        self._lock = threading.Lock()
+        self.sampler = StackSampler()
+        self.network = NetworkWait()
+
+    def _profile_thread(self, *_):
+        """threading.setprofile hook: first event in a new thread starts its own profile."""
+        profile = self._new_profile()
+        with self._lock:
+            self.thread_profiles.append(profile)
+        profile.enable()                    # replaces this hook for the thread
+
+    def __enter__(self):
+        self.network.install()
+        self.sampler.start()
+        self._main = threading.current_thread().name
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._main_cpu = time.thread_time()
+        if sys.version_info < (3, 12):      # 3.12+ profiles every thread from one Profile
+            threading.setprofile(self._profile_thread)
+        self.cprofile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.cprofile.disable()
+        threading.setprofile(None)
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        main_cpu = time.thread_time() - self._main_cpu
+        self.sampler.stop()
+        self.network.uninstall()
+
+        directory = os.path.dirname(self.prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stats = self._merged_stats()
+        stats.dump_stats(f"{self.prefix}.pstats")
+        self.sampler.write_collapsed(f"{self.prefix}.collapsed")
+        self.report(stats, wall, cpu, main_cpu)
+        return False
+
+    def _merged_stats(self):
+        import io
+        import pstats
+        stats = pstats.Stats(self.cprofile, stream=io.StringIO())
+        for profile in self.thread_profiles:
+            try:
+                stats.add(profile)
+            except TypeError:               # thread made no Python calls
+                pass
+        return stats
+
+    def report(self, stats, wall: float, cpu: float, main_cpu: float) -> None:
+        import io
+        net = self.network
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(self.top)
+        listing = out.getvalue()
+        listing = listing[listing.find("   ncalls"):] if "   ncalls" in listing else listing
+
+        print("\n" + "=" * 78, file=sys.stderr)
+        print("  PROFILE", file=sys.stderr)
+        print("=" * 78, file=sys.stderr)
+        print(f"  Wall time      : {wall:8.2f}s", file=sys.stderr)
+        print(f"  CPU time       : {cpu:8.2f}s  (all threads, user + system)", file=sys.stderr)
+        main_net = net.seconds[self._main]
+        print(f"  Main thread    : {main_cpu:8.2f}s CPU, {main_net:.2f}s network wait "
+              f"in {net.calls[self._main]} HTTP request(s)", file=sys.stderr)
+        print(f"  Other / idle   : {max(wall - main_cpu - main_net, 0.0):8.2f}s  "
+              f"(main thread: sleeps, prompts, waiting on workers)", file=sys.stderr)
+        workers = [name for name in net.seconds if name != self._main]
+        if workers:
+            print(f"  Worker threads : {sum(net.seconds[n] for n in workers):8.2f}s network wait "
+                  f"summed over {len(workers)} thread(s), "
+                  f"{sum(net.calls[n] for n in workers)} HTTP request(s)", file=sys.stderr)
+            for name in sorted(workers, key=lambda n: -net.seconds[n])[:self.top]:
+                print(f"    {name:<28} {net.seconds[name]:8.2f}s in {net.calls[name]} request(s)",
+                      file=sys.stderr)
+        print(f"  Stack samples  : {self.sampler.samples} every {self.sampler.interval * 1000:.0f} ms",
+              file=sys.stderr)
+        print(f"  Written        : {self.prefix}.pstats, {self.prefix}.collapsed", file=sys.stderr)
+        print("-" * 78, file=sys.stderr)
+        print(f"  Top {self.top} by cumulative time (all threads):", file=sys.stderr)
+        print(listing.rstrip(), file=sys.stderr)
+        print("=" * 78, file=sys.stderr)
+
+
+def _pop_profile_arg(argv: list) -> tuple[str | None, list]:
+    """
+    Take --profile / --profile-prefix out of argv so the tool's own parser
+    never sees them. Returns (prefix, rest): prefix is None when profiling
+    is off and "" when no prefix was given.
+    """
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    add_arguments(parser)
+    known, rest = parser.parse_known_args(argv)
+    if known.profile_prefix:
+        return known.profile_prefix, rest
+    return ("" if known.profile else None), rest
+
+
+def run_main(main, argv: list | None = None):
+    """Run main() — under the profiler when --profile was given."""
+    args = sys.argv[1:] if argv is None else argv
+    if "-h" in args or "--help" in args:
+        return main()
+    prefix, rest = _pop_profile_arg(args)
+    if prefix is None:
+        return main()
+    sys.argv = [sys.argv[0], *rest]
+    if not prefix:
+        tool = os.path.splitext(os.path.basename(sys.modules[main.__module__].__file__ or "run"))[0]
+        prefix = f"profile_{tool}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    with Profiler(prefix):
+        return main()
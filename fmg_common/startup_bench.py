@@ -0,0 +1,95 @@
+"""
+Start-up benchmark for the `fmg` entry point.
+
+For every subcommand, runs `python -m fmg_common.cli <cmd> --help` in a fresh
+interpreter several times and reports the median wall time next to a bare
+`python -c pass` baseline. One extra run per command with `-X importtime`
+gives the cumulative import time of the tool module and its heaviest
+imports, so a slow start can be traced to the module responsible.
+
+    fmg bench
+    fmg bench --runs 10 extract export
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from fmg_common.cli import COMMANDS, REPO_ROOT
+
+
+def _run(args: list) -> tuple[float, str]:
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, *args], cwd=REPO_ROOT, stdin=subprocess.DEVNULL,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return time.perf_counter() - start, proc.stderr
+
+
+def median_wall(args: list, runs: int) -> float:
+    return statistics.median(_run(args)[0] for _ in range(runs))
+
+
+def import_profile(command: str, top: int = 3) -> tuple[float, list]:
+    """(cumulative ms of the tool module, [(ms, module), ...] its heaviest direct imports)."""
+    _, stderr = _run(["-X", "importtime", "-m", "fmg_common.cli", command, "--help"])
+    _, module, _ = COMMANDS[command]
+    total, children, direct = 0.0, [], []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, raw_name = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(cumulative) / 1000
+        except ValueError:          # header line
+            continue
+        depth = (len(raw_name) - len(raw_name.lstrip(" ")) - 1) // 2
+        name = raw_name.strip()
+        # -X importtime prints children before their parent
+        if depth == 1:
+            children.append((cumulative, name))
+        elif depth == 0:
+            if name in (module, f"fmg_common.{module}"):
+                total, direct = cumulative, children
+            children = []
+    return total, sorted(direct, reverse=True)[:top]
+
+
+def parse_args():
+    p = argparse.ArgumentParser(prog="fmg bench",
+                                description="Measure start-up and import time of fmg subcommands.")
+    p.add_argument("commands", nargs="*", help="Subcommands to measure (default: all)")
+    p.add_argument("--runs", type=int, default=5, help="Runs per measurement (default: 5)")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    commands = args.commands or [c for c in COMMANDS if c != "bench"]
+    unknown = [c for c in commands if c not in COMMANDS]
+    if unknown:
+        print(f"Unknown command(s): {', '.join(unknown)}")
+        return 2
+
+    env_note = f"Python {sys.version.split()[0]}, {args.runs} run(s) each, median"
+    baseline = median_wall(["-c", "pass"], args.runs)
+    dispatcher = median_wall(["-m", "fmg_common.cli", "--help"], args.runs)
+
+    print(f"\n  fmg start-up benchmark ({env_note})\n")
+    print(f"  {'Command':<22} {'Wall ms':>9} {'Over base':>10} {'Module ms':>10}  Heaviest imports")
+    print("  " + "─" * 100)
+    print(f"  {'python -c pass':<22} {baseline * 1000:>9.1f} {'':>10} {'':>10}")
+    print(f"  {'fmg --help':<22} {dispatcher * 1000:>9.1f} {(dispatcher - baseline) * 1000:>10.1f} {'':>10}")
+    for command in commands:
+        wall = median_wall(["-m", "fmg_common.cli", command, "--help"], args.runs)
+        module_ms, heavy = import_profile(command)
+        heavy_str = ", ".join(f"{name} {ms:.0f}" for ms, name in heavy)
+        print(f"  {'fmg ' + command + ' --help':<22} {wall * 1000:>9.1f} "
+              f"{(wall - baseline) * 1000:>10.1f} {module_ms:>10.1f}  {heavy_str}")
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Multiplexed FortiManager task watcher.
+
+Every script that starts an FMG task used to run its own `wait_for_task`
+loop, polling a single /task/task/{id} URL every 1-3 seconds. TaskWatcher
+tracks any number of task IDs and fetches all of them in ONE request per
+tick (a multi-params "get"), so ten running tasks cost the same as one.
+
+The poll interval adapts to task progress: it shortens while tasks are
+moving or close to 100%, and backs off while nothing changes.
+
+The watcher is transport-agnostic. The caller passes a `fetch` function that
+takes a list of params dicts ([{"url": "/task/task/12"}, ...]) and returns
+the matching list of result dicts ([{"status": {...}, "data": {...}}, ...])
+in the same order — i.e. the "result" list of a JSON-RPC response.
+
+Example:
+    def fetch(params):
+        return fmg_rpc_multi("get", params)["result"]
+
+    watcher = TaskWatcher(fetch)
+    fut_a = watcher.watch(task_a)
+    fut_b = watcher.watch(task_b, callback=lambda tid, task: print(tid, "done"))
+    watcher.wait_all()
+    print(fut_a.result()["state"])
+"""
+
+import time
+from concurrent.futures import Future
+
+# FMG task states that mean the task will not move any further:
+# 3 cancelled · 4 done · 5 error · 7 aborted · 8 warning
+TERMINAL_STATES = {3, 4, 5, 7, 8, "cancelled", "done", "error", "aborted", "warning"}
+
+
+def _as_int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def task_finished(task: dict) -> bool:
+    """Default completion test used by the watcher."""
+    state = task.get("state")
+    if isinstance(state, str) and state.isdigit():
+        state = int(state)
+    if state in TERMINAL_STATES:
+        return True
+    if _as_int(task.get("percent")) >= 100:
+        return True
+    num_lines = _as_int(task.get("num_lines"), -1)
+    return num_lines > 0 and _as_int(task.get("num_done")) >= num_lines
+
+
+class _Tracked:
+    """Per-task bookkeeping used for the adaptive interval."""
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+        self.percent = 0
+        self.rate = 0.0            # percent per second, smoothed
+        self.last_change = None    # time.monotonic() of the last percent change
+        self.task = {}
+
+
+class TaskWatcher:
+    """Polls many FMG tasks together and resolves a Future per task."""
+
+    def __init__(self, fetch, min_interval: float = 0.5, max_interval: float = 10.0,
+                 initial_interval: float = 1.0, is_done=task_finished, on_update=None):
+        self._fetch = fetch
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = initial_interval
+        self._is_done = is_done
+        self._on_update = on_update
+        self._pending: dict = {}
+        self._finished: dict = {}
+        self.polls = 0
+
+    # ── registration ───────────────────────────────────────────────────────────
+
+    def watch(self, task_id, callback=None) -> Future:
+        """
+        Start tracking a task. Returns a Future that resolves to the final task
+        dict. If callback is given it is called as callback(task_id, task) once
+        the task finishes (it is not called if the task lookup fails).
+        """
+        tracked = self._pending.get(task_id) or self._finished.get(task_id)
+        if tracked is None:
+            tracked = _Tracked(task_id)
+            self._pending[task_id] = tracked
+        if callback is not None:
+            def _done(fut, _cb=callback, _tid=task_id):
+                if fut.exception() is None:
+                    _cb(_tid, fut.result())
+            tracked.future.add_done_callback(_done)
+        return tracked.future
+
+    @property
+    def pending(self) -> list:
+        return list(self._pending)
+
+    # ── polling ────────────────────────────────────────────────────────────────
+
+    def poll_once(self) -> dict:
+        """
+        Fetch every pending task in a single request and resolve the finished
+        ones. Returns {task_id: task_dict} for this tick.
+        """
+        if not self._pending:
+            return {}
+        batch = list(self._pending.values())
+        results = self._fetch([{"url": f"/task/task/{t.task_id}"} for t in batch]) or []
+        self.polls += 1
+        now = time.monotonic()
+        seen = {}
+
+        if len(results) != len(batch):
+            # a short (or empty) result list cannot be matched to the tasks it
+            # belongs to — fail them all rather than leave them pending forever
+            for tracked in batch:
+                self._retire(tracked)
+                tracked.future.set_exception(RuntimeError(
+                    f"Task {tracked.task_id} lookup failed: asked for {len(batch)} task(s), "
+                    f"got {len(results)} result(s)"))
+            return seen
+
+        for tracked, res in zip(batch, results):
+            status = (res or {}).get("status", {}) or {}
+            if status.get("code", 0) != 0:
+                self._retire(tracked)
+                tracked.future.set_exception(RuntimeError(
+                    f"Task {tracked.task_id} lookup failed: {status.get('message', status)}"))
+                continue
+
+            task = (res or {}).get("data") or {}
+            if isinstance(task, list):
+                task = task[0] if task else {}
+            tracked.task = task
+            seen[tracked.task_id] = task
+            self._update_rate(tracked, _as_int(task.get("percent")), now)
+
+            if self._on_update:
+                self._on_update(tracked.task_id, task)
+
+            if self._is_done(task):
+                self._retire(tracked)
+                tracked.future.set_result(task)
+
+        self._adapt_interval()
+        return seen
+
+    def _retire(self, tracked: _Tracked) -> None:
+        del self._pending[tracked.task_id]
+        self._finished[tracked.task_id] = tracked
+
+    def _update_rate(self, tracked: _Tracked, percent: int, now: float) -> None:
+        if tracked.last_change is None:
+            tracked.last_change = now
+        elif percent != tracked.percent:
+            elapsed = max(now - tracked.last_change, 1e-3)
+            sample = (percent - tracked.percent) / elapsed
+            tracked.rate = sample if tracked.rate == 0 else 0.5 * tracked.rate + 0.5 * sample
+            tracked.last_change = now
+        else:
+            # no movement this tick — let the estimate decay so stalled
+            # tasks stop pinning the interval at its minimum
+            tracked.rate *= 0.7
+        tracked.percent = percent
+
+    def _adapt_interval(self) -> None:
+        """
+        Pick the next sleep from the task closest to finishing:
+        half of its estimated time-to-completion, clamped to the configured
+        bounds. Tasks with no visible progress back the interval off by 1.5x.
+        """
+        if not self._pending:
+            return
+        etas = []
+        for tracked in self._pending.values():
+            if tracked.percent >= 90:
+                etas.append(0.0)
+            elif tracked.rate > 0:
+                etas.append((100 - tracked.percent) / tracked.rate)
+        if etas:
+            proposed = min(etas) / 2
+        else:
+            proposed = self.interval * 1.5
+        self.interval = min(self.max_interval, max(self.min_interval, proposed))
+
+    # ── blocking helpers ───────────────────────────────────────────────────────
+
+    def run(self, timeout: float | None = None, until=None) -> None:
+        """
+        Poll until nothing is pending (or until() returns True).
+        Raises TimeoutError when timeout seconds pass first.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        while self._pending and not (until and until()):
+            self.poll_once()
+            if not self._pending or (until and until()):
+                break
+            if deadline and time.monotonic() + self.interval > deadline:
+                raise TimeoutError(
+                    f"Tasks {', '.join(map(str, self._pending))} did not complete within {timeout}s.")
+            time.sleep(self.interval)
+
+    def wait(self, task_id, timeout: float | None = None) -> dict:
+        """Block until one task finishes (other tasks keep being polled)."""
+        fut = self.watch(task_id)
+        self.run(timeout=timeout, until=fut.done)
+        return fut.result()
+
+    def wait_all(self, timeout: float | None = None) -> dict:
+        """Block until every watched task finishes. Returns {task_id: task}."""
+        futures = {tid: t.future for tid, t in self._pending.items()}
+        self.run(timeout=timeout)
+        return {tid: fut.result() for tid, fut in futures.items() if fut.exception() is None}
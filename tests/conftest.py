@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The tools import their sibling modules by bare name, exactly as when they
+# are run from their own folder.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("", "ADOM_Extractor", "ADOM_Upgrade", "Configuration_Retrieve_Automation",
+               "Export_Import_Provisioning_Templates"):
+    path = os.path.join(ROOT, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,61 @@
+import pytest
+
+from adom_inventory import ADOM_FIELDS, AdomInventory
+
+
+class FakeDvmdb:
+    """fetch(params_extra) stand-in for a JSON-RPC get on /dvmdb/adom."""
+
+    def __init__(self, adoms):
+        self.adoms = adoms
+        self.calls = []
+
+    def __call__(self, extra):
+        self.calls.append(extra)
+        data = self.adoms
+        if "filter" in extra:
+            names = extra["filter"][2:]
+            data = [a for a in data if a["name"] in names]
+        return {"result": [{"status": {"code": 0}, "data": data}]}
+
+
+ADOMS = [
+    {"name": "root", "oid": 3, "os_ver": "7.0", "mr": 2, "restricted_prds": 1},
+    {"name": "rootp", "oid": 10, "os_ver": 7, "mr": 4, "restricted_prds": 1},
+    {"name": "branch", "oid": "120", "os_ver": "6.0", "mr": "4", "restricted_prds": 1},
+]
+
+
+def test_load_indexes_by_name_and_oid_in_fmg_order():
+    fetch = FakeDvmdb(ADOMS)
+    inventory = AdomInventory(fetch).load()
+    assert fetch.calls == [{"fields": ADOM_FIELDS}]
+    assert [rec.name for rec in inventory] == ["root", "rootp", "branch"]
+    assert len(inventory) == 3
+    assert inventory.get("branch").version == (6, 4)
+    assert inventory.get("branch").version_str == "6.4"
+    assert inventory.by_oid["3"].name == "root"
+    assert inventory.global_adom.name == "rootp"
+    assert inventory.global_adom.is_global and not inventory.get("root").is_global
+    assert inventory.get("missing") is None
+
+
+def test_refresh_rereads_only_the_named_adoms_in_one_request():
+    fetch = FakeDvmdb([dict(a) for a in ADOMS])
+    inventory = AdomInventory(fetch).load()
+    fetch.adoms[0]["mr"] = 4
+    records = inventory.refresh(["root", "root", "", None])
+    assert fetch.calls[-1] == {"fields": ADOM_FIELDS, "filter": ["name", "in", "root"]}
+    assert [r.name for r in records] == ["root"]
+    assert inventory.get("root").version == (7, 4)
+    assert [rec.name for rec in inventory] == ["root", "rootp", "branch"]     # order kept
+    assert inventory.refresh([]) == [] and len(fetch.calls) == 2
+
+
+def test_single_record_and_error_responses():
+    inventory = AdomInventory(lambda extra: {"result": [{"status": {"code": 0}, "data": ADOMS[0]}]})
+    assert [rec.name for rec in inventory.load()] == ["root"]
+
+    failing = AdomInventory(lambda extra: {"result": [{"status": {"code": -11, "message": "No permission"}}]})
+    with pytest.raises(RuntimeError, match="No permission"):
+        failing.load()
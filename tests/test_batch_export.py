@@ -0,0 +1,92 @@
+import json
+import threading
+
+import pytest
+
+import fmg_export_templates as export
+
+ADOMS = [{"name": "root", "oid": 3}, {"name": "rootp", "oid": 10},
+         {"name": "branch", "oid": 120}, {"name": "lab", "oid": 130}]
+
+
+@pytest.fixture
+def fmg(tmp_path, monkeypatch):
+    """Replaces the GUI calls with an in-memory FMG; records logins, logouts and exports."""
+    state = {"tokens": [], "logouts": [], "exports": []}
+    lock = threading.Lock()
+
+    def login(session):
+        with lock:
+            token = f"tok{len(state['tokens'])}"
+            state["tokens"].append(token)
+        return token
+
+    def export_one_adom(session, csrf_token, adom, incremental=False):
+        with lock:
+            state["exports"].append((csrf_token, adom["name"]))
+        if adom["name"] == "lab":
+            return {"adom": "lab", "oid": 130, "status": "failed", "error": "boom", "duration_sec": 0.1}
+        return {"adom": adom["name"], "oid": adom["oid"], "status": "ok",
+                "path": f"/x/{adom['name']}.dat", "duration_sec": 0.1}
+
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(export, "login", login)
+    monkeypatch.setattr(export, "logout", lambda session, token: state["logouts"].append(token))
+    monkeypatch.setattr(export, "list_adoms", lambda session, token: ADOMS)
+    monkeypatch.setattr(export, "export_one_adom", export_one_adom)
+    return state
+
+
+def test_batch_all_skips_global_and_writes_manifest(fmg, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    results = export.run_batch_export("all", 2, manifest_path)
+
+    assert [r["adom"] for r in results] == ["root", "branch", "lab"]
+    assert sorted(adom for _, adom in fmg["exports"]) == ["branch", "lab", "root"]
+    assert {token for token, _ in fmg["exports"]} <= {"tok0", "tok1"}
+    assert sorted(fmg["logouts"]) == ["tok0", "tok1"]
+
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert manifest["fmg_host"] == export.HOST
+    assert [(e["adom"], e["status"]) for e in manifest["exports"]] == [
+        ("root", "ok"), ("branch", "ok"), ("lab", "failed")]
+
+
+def test_batch_named_adoms_keep_the_given_order(fmg, tmp_path):
+    results = export.run_batch_export(" lab, root ", 1)
+    assert [r["adom"] for r in results] == ["lab", "root"]
+    assert fmg["tokens"] == ["tok0"]
+    assert len(list(tmp_path.glob("export_manifest_*.json"))) == 1
+
+
+def test_batch_unknown_adom_is_rejected_and_sessions_are_closed(fmg):
+    with pytest.raises(RuntimeError, match="Unknown ADOM"):
+        export.run_batch_export("root,nope", 3)
+    assert fmg["exports"] == []
+    assert sorted(fmg["logouts"]) == ["tok0", "tok1", "tok2"]
+
+
+def test_export_one_adom_switches_exports_and_downloads(tmp_path, monkeypatch):
+    calls = []
+
+    def download(session, token, task_id, file_name):
+        path = tmp_path / f"{task_id}_{file_name}"
+        path.write_bytes(b"bundle")
+        (tmp_path / f"{task_id}_{file_name}.sha256").write_text(f"{'ab' * 32}  {path.name}\n")
+        return str(path), path.name
+
+    monkeypatch.setattr(export, "switch_adom", lambda session, token, oid: calls.append(("switch", oid)))
+    monkeypatch.setattr(export, "initiate_export", lambda session, token, oid, categories=None: (7, "bundle.dat"))
+    monkeypatch.setattr(export, "wait_for_task",
+                        lambda session, token, task_id, watcher=None: calls.append(("wait", task_id)))
+    monkeypatch.setattr(export, "download_export", download)
+
+    entry = export.export_one_adom(None, "tok", {"name": "branch", "oid": 120})
+    assert calls == [("switch", 120), ("wait", 7)]
+    assert entry["status"] == "ok"
+    assert (entry["task_id"], entry["file"], entry["size"], entry["sha256"]) == (7, "bundle.dat", 6, "ab" * 32)
+
+    monkeypatch.setattr(export, "initiate_export", lambda session, token, oid, categories=None: 1 / 0)
+    failed = export.export_one_adom(None, "tok", {"name": "branch", "oid": 120})
+    assert failed["status"] == "failed" and "division by zero" in failed["error"]
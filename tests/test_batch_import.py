@@ -0,0 +1,134 @@
+import pytest
+
+import fmg_import_templates as imp
+from fmg_common import flatui, task_watcher
+
+ADOMS = [{"name": f"adom{i}", "oid": 100 + i} for i in range(5)]
+
+
+class FakeFMG:
+    """Stands in for upload, import exec and the task forwarder of one FortiManager."""
+
+    def __init__(self):
+        self.uploads = 0
+        self.imports = []          # (oid, task_id)
+        self.polls = []            # task ids per forward_get call
+        self.lose_staged = set()   # oids whose first import finds the staged file gone
+        self.bad = set()           # oids whose import finishes with an error line
+        self.refuse = set()        # oids whose import task is never created
+        self.stuck = set()         # oids whose import task never finishes
+        self.tasks = {}
+        self.logins = 0
+        self.logouts = 0
+        self.lane_of = {}          # oid -> session its import was started on
+        self.current = {}          # session -> ADOM oid it is switched to
+
+    def login(self, session):
+        self.logins += 1
+        return f"tok{self.logins}"
+
+    def logout(self, session, csrf_token):
+        self.logouts += 1
+
+    def switch_adom(self, session, csrf_token, oid):
+        self.current[id(session)] = oid
+
+    def upload(self, session, csrf_token, file_path):
+        self.uploads += 1
+        return {}
+
+    def execute(self, session, csrf_token, oid):
+        if oid in self.refuse:
+            raise RuntimeError("Import execution failed. Response: {'code': -6}")
+        assert self.current[id(session)] == oid
+        self.lane_of[oid] = id(session)
+        task_id = 500 + len(self.imports)
+        self.imports.append((oid, task_id))
+        if oid in self.lose_staged and sum(1 for o, _ in self.imports if o == oid) == 1:
+            task = {"state": 5, "line": [{"err": 1, "detail": "open /var/tmp/deploy_import: no such file"}]}
+        elif oid in self.stuck:
+            task = {"state": 1, "percent": 40, "line": []}
+        elif oid in self.bad:
+            task = {"state": 5, "line": [{"err": 1, "detail": "template mismatch"}]}
+        else:
+            task = {"state": 4, "percent": 100, "line": [{"err": 0, "detail": "imported"}]}
+        self.tasks[task_id] = task
+        return task_id, "deploy_import"
+
+    def forward_get(self, base_url, session, csrf_token, params):
+        ids = [int(p["url"].rsplit("/", 1)[1]) for p in params]
+        self.polls.append(ids)
+        return [{"status": {"code": 0}, "data": self.tasks[tid]} for tid in ids]
+
+
+@pytest.fixture
+def fmg(monkeypatch):
+    fake = FakeFMG()
+    clock = [0.0]
+    monkeypatch.setattr(imp, "login", fake.login)
+    monkeypatch.setattr(imp, "logout", fake.logout)
+    monkeypatch.setattr(imp, "switch_adom", fake.switch_adom)
+    monkeypatch.setattr(imp, "upload_template_file", fake.upload)
+    monkeypatch.setattr(imp, "execute_import", fake.execute)
+    monkeypatch.setattr(flatui, "forward_get", fake.forward_get)
+    monkeypatch.setattr(task_watcher.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(task_watcher.time, "sleep", lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+    return fake
+
+
+def test_one_upload_fans_out_with_bounded_concurrency(fmg):
+    results = imp.run_batch_import(object(), "tok", "bundle.dat", ADOMS, concurrency=2)
+    assert fmg.uploads == 1
+    assert (fmg.logins, fmg.logouts) == (1, 1)                      # one extra session, closed again
+    assert len(set(fmg.lane_of.values())) == 2
+    assert [oid for oid, _ in fmg.imports] == [a["oid"] for a in ADOMS]
+    assert max(len(ids) for ids in fmg.polls) <= 2
+    assert [(r["adom"], r["status"], r["attempt"]) for r in results] == [
+        (a["name"], "ok", 1) for a in ADOMS]
+
+
+def test_failed_imports_report_their_task_errors(fmg):
+    fmg.bad, fmg.refuse = {101}, {103}
+    results = imp.run_batch_import(object(), "tok", "bundle.dat", ADOMS)
+    by_oid = {r["oid"]: r for r in results}
+    assert by_oid[101]["status"] == "failed" and by_oid[101]["errors"] == ["template mismatch"]
+    assert by_oid[103]["status"] == "failed" and by_oid[103]["task_id"] is None
+    assert "Import execution failed" in by_oid[103]["errors"][0]
+    assert sum(r["status"] == "ok" for r in results) == 3
+    assert fmg.uploads == 1
+
+
+def test_lost_staged_file_is_uploaded_again_and_retried_once(fmg):
+    fmg.lose_staged = {102}
+    results = imp.run_batch_import(object(), "tok", "bundle.dat", ADOMS, concurrency=1)
+    assert fmg.uploads == 2
+    retried = [r for r in results if r["oid"] == 102][0]
+    assert (retried["status"], retried["attempt"]) == ("ok", 2)
+    assert [r["oid"] for r in results] == [a["oid"] for a in ADOMS]
+
+
+def test_lost_staged_file_waits_for_running_imports_before_uploading(fmg, monkeypatch):
+    fmg.lose_staged = {100}
+    uploads_seen = []
+    monkeypatch.setattr(imp, "upload_template_file",
+                        lambda *args: uploads_seen.append(len(fmg.imports)) or fmg.upload(*args))
+    results = imp.run_batch_import(object(), "tok", "bundle.dat", ADOMS[:3], concurrency=2)
+    # first upload before any import; the re-upload only after adom0 and adom1 finished
+    assert uploads_seen == [0, 2]
+    assert [(r["oid"], r["attempt"], r["status"]) for r in results] == [(100, 2, "ok"), (101, 1, "ok"),
+                                                                       (102, 1, "ok")]
+
+
+def test_timeout_reports_pending_and_skipped_adoms(fmg):
+    fmg.stuck = {100}
+    results = imp.run_batch_import(object(), "tok", "bundle.dat", ADOMS[:3], concurrency=1, timeout=60)
+    assert [(r["adom"], r["status"]) for r in results] == [("adom0", "pending"), ("adom1", "skipped"),
+                                                           ("adom2", "skipped")]
+    assert results[0]["task_id"] == 500 and "still running" in results[0]["errors"][0]
+
+
+def test_staged_file_markers():
+    assert imp._staged_file_missing("open /var/tmp/deploy_import: No such file or directory")
+    assert not imp._staged_file_missing("template mismatch")
+    assert not imp._staged_file_missing("deploy_import: object 'addr1' not found in ADOM")
+
@@ -0,0 +1,83 @@
+import gzip
+import json
+
+import pytest
+
+from fmg_common import cassette
+
+
+def login(user="admin", password="s3cret"):
+    return {"method": "exec", "id": 1,
+            "params": [{"url": "/sys/login/user", "data": {"user": user, "passwd": password}}]}
+
+
+def get(url, session="abcdef", req_id=2):
+    return {"method": "get", "id": req_id, "session": session, "params": [{"url": url}]}
+
+
+def test_scrub_replaces_secrets_at_any_depth():
+    payload = {"session": "tok", "params": [{"data": {
+        "passwd": "pw", "Password": "pw2", "psksecret": "x", "comment": "ENC abc",
+        "nested": [{"private-key": "k", "name": "keep"}], "secret": "", "token": None}}]}
+    clean = cassette.scrub(payload)
+    data = clean["params"][0]["data"]
+    assert clean["session"] == cassette.SESSION_PLACEHOLDER
+    assert data["passwd"] == data["Password"] == data["psksecret"] == cassette.REDACTED
+    assert data["comment"] == cassette.REDACTED
+    assert data["nested"] == [{"private-key": cassette.REDACTED, "name": "keep"}]
+    assert data["secret"] == "" and data["token"] is None          # empty values left as they are
+    assert payload["params"][0]["data"]["passwd"] == "pw"          # the input is not modified
+
+
+def test_request_key_ignores_id_session_and_secrets():
+    assert cassette.request_key(get("/dvmdb/adom", "a", 1)) == cassette.request_key(get("/dvmdb/adom", "b", 9))
+    assert cassette.request_key(login(password="x")) == cassette.request_key(login(password="y"))
+    assert cassette.request_key(get("/dvmdb/adom")) != cassette.request_key(get("/dvmdb/device"))
+
+
+def test_recording_writes_only_scrubbed_lines(tmp_path):
+    path = str(tmp_path / "run.cassette.gz")
+    responses = {"exec": {"session": "live-token", "result": [{"status": {"code": 0}}]},
+                 "get": {"result": [{"data": [{"name": "root", "psksecret": "ENC zzz"}]}]}}
+    send = cassette.wrap(lambda payload: responses[payload["method"]], record=path)
+    assert send(login())["session"] == "live-token"            # caller still sees the real response
+    send(get("/dvmdb/adom"))
+    send.recorder.close()
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        text = f.read()
+    assert "s3cret" not in text and "live-token" not in text and "ENC zzz" not in text
+    lines = [json.loads(line) for line in text.splitlines()]
+    assert len(lines) == send.recorder.count == 2
+    assert all(set(line) == {"request", "response", "elapsed"} for line in lines)
+
+
+def test_replay_serves_recorded_responses_in_order(tmp_path):
+    path = str(tmp_path / "run.cassette.gz")
+    states = iter([{"percent": 10}, {"percent": 60}, {"percent": 100}])
+    send = cassette.wrap(lambda payload: {"result": [{"data": next(states)}]}, record=path)
+    for _ in range(3):
+        send(get("/task/task/7"))
+    send.recorder.close()
+
+    replay = cassette.wrap(None, replay=path, latency="zero")
+    seen = [replay(get("/task/task/7", session="new", req_id=i))["result"][0]["data"]["percent"]
+            for i in range(5)]
+    assert seen == [10, 60, 100, 100, 100]                      # the last answer repeats
+    assert replay.served == 5
+
+    with pytest.raises(LookupError, match="/task/task/8"):
+        replay(get("/task/task/8"))
+
+
+def test_wrap_without_paths_returns_post_unchanged():
+    post = object()
+    assert cassette.wrap(post) is post
+
+
+def test_replayer_rejects_unknown_latency(tmp_path):
+    path = tmp_path / "empty.cassette.gz"
+    with gzip.open(path, "wt", encoding="utf-8"):
+        pass
+    with pytest.raises(ValueError, match="latency"):
+        cassette.Replayer(str(path), latency="fast")
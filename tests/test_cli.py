@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+from fmg_common import cli, startup_bench
+
+
+def test_every_command_points_at_a_module_file():
+    for folder, module, help_text in cli.COMMANDS.values():
+        assert os.path.isfile(os.path.join(cli.REPO_ROOT, folder, module + ".py"))
+        assert help_text
+    usage = cli.usage()
+    assert all(f"  {name} " in usage for name in cli.COMMANDS)
+
+
+def test_help_imports_no_tool_module():
+    code = ("import sys; from fmg_common import cli; cli.main(['--help']); "
+            "print(sorted(m for _, m, _ in cli.COMMANDS.values() "
+            "if m in sys.modules or 'fmg_common.' + m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=cli.REPO_ROOT, capture_output=True,
+                         text=True, check=True).stdout
+    assert out.strip().splitlines()[-1] == "[]"
+
+
+def test_unknown_command_prints_usage(capsys):
+    assert cli.main(["nope"]) == 2
+    assert "unknown command 'nope'" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("returned, code", [(None, 0), (3, 3)])
+def test_dispatch_hands_the_remaining_arguments_to_the_tool(monkeypatch, returned, code):
+    seen = {}
+
+    def main():
+        seen["argv"] = list(sys.argv)
+        return returned
+
+    loaded = []
+    monkeypatch.setattr(cli, "load", lambda command: loaded.append(command) or types.SimpleNamespace(main=main))
+    monkeypatch.setattr(sys, "argv", ["fmg"])
+    assert cli.main(["export", "--adoms", "all"]) == code
+    assert loaded == ["export"]
+    assert seen["argv"] == ["fmg export", "--adoms", "all"]
+
+
+def test_load_puts_the_tool_folder_on_sys_path(monkeypatch):
+    monkeypatch.setattr(sys, "path", [p for p in sys.path
+                                      if not p.endswith("Export_Import_Provisioning_Templates")])
+    module = cli.load("catalog")
+    assert module.__name__ == "template_catalog"
+    assert os.path.join(cli.REPO_ROOT, "Export_Import_Provisioning_Templates") in sys.path
+    assert cli.load("bench") is startup_bench
+
+
+def test_import_profile_reads_the_tool_module_and_its_direct_imports(monkeypatch):
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       200 |        300 |     _ssl",
+        "import time:       900 |       1200 |   ssl",
+        "import time:       500 |        500 |   gzip",
+        "import time:        50 |         50 |   json",
+        "import time:       100 |       2000 | template_catalog",
+        "import time:        10 |         10 | unrelated",
+    ])
+    monkeypatch.setattr(startup_bench, "_run", lambda args: (0.1, stderr))
+    total, heavy = startup_bench.import_profile("catalog", top=2)
+    assert total == 2.0
+    assert heavy == [(1.2, "ssl"), (0.5, "gzip")]
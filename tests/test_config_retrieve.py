@@ -0,0 +1,320 @@
+import json
+import os
+import sys
+
+import pytest
+
+import config_retrieve_automation as cra
+from fmg_common import task_watcher
+
+
+class Response:
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class FakeFMG:
+    """requests.post stand-in answering the JSON-RPC calls the retrieve script makes."""
+
+    def __init__(self, adoms, devices, failing=()):
+        self.adoms = adoms            # [{"name": ..., "restricted_prds": ...}]
+        self.devices = devices        # adom -> [device name]
+        self.failing = set(failing)   # devices that fail every retrieve
+        self.flaky = set()            # devices that fail only their first retrieve
+        self.no_task = set()          # ADOMs whose reload task is never created
+        self.seen = set()
+        self.calls = []
+        self.tasks = {}
+
+    def __call__(self, url, json=None, verify=None):
+        self.calls.append(json)
+        body = {"id": json["id"], "result": [self._one(p) for p in json["params"]]}
+        if json["params"][0].get("url") == "/sys/login/user":
+            body["session"] = "sid"
+        return Response(body)
+
+    def _one(self, p):
+        url = p.get("url", "")
+        if url == "/sys/status":
+            return {"data": {"Admin Domain Configuration": "Enabled"}}
+        if url == "/dvmdb/adom":
+            return {"data": self.adoms}
+        if url.endswith("/device"):
+            adom = url.split("/")[3]
+            return {"data": [{"name": n, "sn": f"FGT{n}"} for n in self.devices.get(adom, [])]}
+        if url == "dvm/cmd/reload/dev-list":
+            if p["data"]["adom"] in self.no_task:
+                return {"data": {}}
+            task_id = 100 + len(self.tasks)
+            names = [d["name"] for d in p["data"]["reload-dev-member-list"]]
+            self.tasks[task_id] = {"adom": p["data"]["adom"], "devices": names}
+            return {"data": {"taskid": task_id}}
+        if url.startswith("/task/task/"):
+            names = self.tasks[int(url.rsplit("/", 1)[1])]["devices"]
+            failed = {n for n in names if n in self.failing or (n in self.flaky and n not in self.seen)}
+            self.seen.update(names)
+            lines = [{"name": n, "ip": "192.0.2.1", "state": 4, "err": int(n in failed),
+                      "detail": "failed" if n in failed else "finished"} for n in names]
+            return {"data": {"state": 4, "percent": 100, "num_lines": len(lines), "line": lines}}
+        return {"status": {"code": 0}}
+
+    def urls(self):
+        return [[p.get("url") for p in call["params"]] for call in self.calls]
+
+
+ADOMS = [{"name": "root", "restricted_prds": "fos"}, {"name": "rootp", "restricted_prds": "fos"},
+         {"name": "branch-1", "restricted_prds": "fos"}, {"name": "branch-2", "restricted_prds": "foc"},
+         {"name": "logs", "restricted_prds": "faz"}]
+DEVICES = {"root": ["hq-1", "hq-2"], "branch-1": ["b1-a", "b1-b"], "branch-2": ["b2-a"]}
+
+
+@pytest.fixture
+def fmg(monkeypatch):
+    fake = FakeFMG(ADOMS, DEVICES)
+    monkeypatch.setattr(cra.requests, "post", fake)
+    for var in ("FMG_HOST", "FMG_USER", "FMG_PASS"):
+        monkeypatch.delenv(var, raising=False)
+    return fake
+
+
+def parse(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["config_retrieve_automation.py", *argv])
+    return cra.parse_args()
+
+
+def test_read_device_file_skips_comments_and_blank_lines(tmp_path):
+    path = tmp_path / "devices.txt"
+    path.write_text("# branch firewalls\nb1-a\n\n  b2-a  # moved last week\n#b1-b\n", encoding="utf-8")
+    assert cra.read_device_file(str(path)) == {"b1-a", "b2-a"}
+
+
+def test_retrieve_adoms_keeps_fortios_family_without_global(fmg):
+    assert cra.retrieve_adoms("https://fmg/jsonrpc", "sid") == ["root", "branch-1", "branch-2"]
+
+
+def test_headless_all_adoms_writes_summary(fmg, monkeypatch, tmp_path):
+    fmg.failing = {"b1-b"}
+    out = tmp_path / "summary.json"
+    args = parse(monkeypatch, "--host", "fmg", "--user", "admin", "--password", "pw",
+                 "--all-adoms", "--summary", str(out))
+    assert cra.run_headless(args) == 1
+
+    urls = fmg.urls()
+    assert ["/dvmdb/adom/root/device", "/dvmdb/adom/branch-1/device",
+            "/dvmdb/adom/branch-2/device"] in urls                         # one multi-params request
+    assert urls[-1] == ["/sys/logout"]
+
+    summary = json.loads(out.read_text(encoding="utf-8"))
+    assert summary["host"] == "fmg"
+    assert [e["adom"] for e in summary["adoms"]] == ["root", "branch-1", "branch-2"]
+    assert summary["totals"] == {"adoms": 3, "tasks": 3, "devices": 5, "passed": 4, "failed": 1}
+    branch = summary["adoms"][1]
+    assert branch["requested"] == ["b1-a", "b1-b"]
+    assert [t["devices"] for t in branch["tasks"]] == [["b1-a", "b1-b"]]
+    assert [(d["name"], d["passed"]) for d in branch["devices"]] == [("b1-a", True), ("b1-b", False)]
+
+
+def test_headless_adom_regex_and_device_file(fmg, monkeypatch, tmp_path, capsys):
+    devices = tmp_path / "devices.txt"
+    devices.write_text("b1-a\nb2-a\nhq-1\nghost\n", encoding="utf-8")
+    out = tmp_path / "summary.json"
+    args = parse(monkeypatch, "--host", "fmg", "--user", "admin", "--password", "pw",
+                 "--adom-regex", "^branch-", "--device-file", str(devices), "--summary", str(out))
+    assert cra.run_headless(args) == 0
+
+    assert [t["devices"] for t in fmg.tasks.values()] == [["b1-a"], ["b2-a"]]
+    assert "Device not found in any selected ADOM: ghost" in capsys.readouterr().out
+    summary = json.loads(out.read_text(encoding="utf-8"))
+    assert summary["totals"]["passed"] == 2 and summary["totals"]["failed"] == 0
+
+
+def test_headless_needs_host_and_user(fmg, monkeypatch):
+    assert cra.run_headless(parse(monkeypatch, "--all-adoms")) == 2
+    assert fmg.calls == []
+
+
+class Stream:
+    def __init__(self, tty):
+        self.tty = tty
+        self.writes = []
+
+    def isatty(self):
+        return self.tty
+
+    def write(self, text):
+        self.writes.append(text)
+
+    def flush(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cra.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_tty_frames_rewrite_only_changed_lines(clock):
+    stream = Stream(tty=True)
+    renderer = cra.LiveRenderer(stream, min_interval=0)
+    renderer.render(["title", "a: 10%", "b: 10%"])
+    assert stream.writes[-1] == "\033[2Ktitle\n\033[2Ka: 10%\n\033[2Kb: 10%\n"
+
+    renderer.render(["title", "a: 10%", "b: 50%"])
+    assert stream.writes[-1] == "\033[3F\033[1E\033[1E\033[2Kb: 50%\n"
+
+    renderer.render(["title"])
+    assert stream.writes[-1] == "\033[3F\033[1E\033[2K\n\033[2K\n\033[2F"
+
+
+def test_tty_frames_taller_than_the_terminal_keep_head_and_progress_tail(clock, monkeypatch):
+    monkeypatch.setattr(cra.shutil, "get_terminal_size", lambda: os.terminal_size((80, 7)))
+    stream = Stream(tty=True)
+    renderer = cra.LiveRenderer(stream, min_interval=0)
+    renderer.render(["title"] + [f"dev{i}: 10%" for i in range(10)] + ["", "[####    ] 40%"])
+    assert renderer._frame == ["title", "dev0: 10%", "dev1: 10%", "  … +8 more line(s)", "", "[####    ] 40%"]
+    assert renderer._fit(["a", "b"]) == ["a", "b"]
+
+
+def test_plain_output_logs_each_changed_line_once_without_escapes(clock):
+    stream = Stream(tty=False)
+    renderer = cra.LiveRenderer(stream, min_interval=0)
+    renderer.render([f"{cra.Colors.BOLD}title{cra.Colors.END}", "", "a: running"])
+    renderer.render([f"{cra.Colors.BOLD}title{cra.Colors.END}", "", "a: running"])
+    renderer.render([f"{cra.Colors.BOLD}title{cra.Colors.END}", "", "a: finished"])
+    assert "".join(stream.writes) == "title\na: running\na: finished\n"
+
+
+def test_frames_are_rate_limited_and_finish_flushes_the_last_one(clock):
+    stream = Stream(tty=False)
+    renderer = cra.LiveRenderer(stream, min_interval=1.0)
+    renderer.render(["step 1"])
+    clock[0] += 0.2
+    renderer.render(["step 2"])
+    renderer.render(["step 3"])
+    assert stream.writes == ["step 1\n"]
+    clock[0] += 1.0
+    renderer.render(["step 4"])
+    renderer.render(["step 5"])
+    renderer.finish()
+    assert stream.writes == ["step 1\n", "step 4\n", "step 5\n"]
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(task_watcher.time, "sleep", lambda seconds: None)
+
+
+def test_batch_chunks_respect_max_in_flight(fmg, no_sleep):
+    names = ["d1", "d2", "d3", "d4", "d5"]
+    batch = cra.RetrieveBatch("https://fmg/jsonrpc", "sid", chunk_size=2, max_in_flight=2)
+    batch.add("root", names)
+    results = batch.run()
+
+    assert [t["devices"] for t in fmg.tasks.values()] == [["d1", "d2"], ["d3", "d4"], ["d5"]]
+    polls = [urls for urls in fmg.urls() if urls[0].startswith("/task/task/")]
+    assert all(len(urls) == 1 for urls in polls)                     # one chunk at a time
+    assert sorted(name for _, name in results) == names
+    assert batch.final_task_data()["num_err"] == 0 and batch.in_flight == 0
+
+
+def test_batch_without_cap_runs_every_chunk_together(fmg, no_sleep):
+    batch = cra.RetrieveBatch("https://fmg/jsonrpc", "sid", chunk_size=2)
+    batch.add("root", ["d1", "d2", "d3"])
+    batch.add("branch-1", ["b1"])
+    batch.run()
+    polls = [urls for urls in fmg.urls() if urls[0].startswith("/task/task/")]
+    assert polls == [["/task/task/100", "/task/task/101", "/task/task/102"]]
+
+
+def test_batch_retries_only_failed_devices(fmg, no_sleep):
+    fmg.flaky, fmg.failing = {"d2"}, {"d3"}
+    done = []
+    batch = cra.RetrieveBatch("https://fmg/jsonrpc", "sid", retries=1,
+                              on_chunk_done=lambda chunk, failed: done.append((chunk["attempt"], failed)))
+    batch.add("root", ["d1", "d2", "d3"])
+    results = batch.run()
+
+    assert [t["devices"] for t in fmg.tasks.values()] == [["d1", "d2", "d3"], ["d2", "d3"]]
+    assert done == [(1, ["d2", "d3"]), (2, ["d3"])]
+    assert {name: (r["attempt"], cra.line_passed(r)) for (_, name), r in results.items()} == {
+        "d1": (1, True), "d2": (2, True), "d3": (2, False)}
+    final = batch.final_task_data()
+    assert (final["num_lines"], final["num_err"]) == (3, 1)
+
+
+def test_batch_records_chunks_whose_task_was_not_created(fmg, no_sleep):
+    fmg.no_task = {"branch-1"}
+    batch = cra.RetrieveBatch("https://fmg/jsonrpc", "sid")
+    batch.add("branch-1", ["b1"])
+    batch.add("root", ["d1"])
+    results = batch.run()
+    assert results[("branch-1", "b1")]["detail"] == "task was not created"
+    assert cra.line_passed(results[("root", "d1")])
+
+
+def test_batch_retries_chunks_whose_task_was_not_created(fmg, no_sleep, monkeypatch):
+    real_trigger, calls = cra.trigger_retrieve, []
+
+    def trigger(*args):
+        calls.append(args[2])
+        return None if len(calls) == 1 else real_trigger(*args)
+
+    monkeypatch.setattr(cra, "trigger_retrieve", trigger)
+    batch = cra.RetrieveBatch("https://fmg/jsonrpc", "sid", chunk_size=1, max_in_flight=1, retries=1)
+    batch.add("root", ["d1", "d2"])
+    assert batch.pending_devices == 2
+    results = batch.run()
+
+    assert calls == ["root", "root", "root"]
+    assert batch.pending_devices == 0
+    assert {name: (r["attempt"], cra.line_passed(r)) for (_, name), r in results.items()} == {
+        "d1": (2, True), "d2": (1, True)}
+
+
+def test_headless_chunk_size_and_retries(fmg, no_sleep, monkeypatch, tmp_path):
+    fmg.flaky = {"hq-2"}
+    out = tmp_path / "summary.json"
+    args = parse(monkeypatch, "--host", "fmg", "--user", "admin", "--password", "pw", "--adom-regex", "^root$",
+                 "--chunk-size", "1", "--retries", "1", "--summary", str(out))
+    assert cra.run_headless(args) == 0
+
+    root = json.loads(out.read_text(encoding="utf-8"))["adoms"][0]
+    assert [(t["devices"], t["attempt"]) for t in root["tasks"]] == [(["hq-1"], 1), (["hq-2"], 1), (["hq-2"], 2)]
+    assert [(d["name"], d["attempt"], d["passed"]) for d in root["devices"]] == [("hq-1", 1, True),
+                                                                                  ("hq-2", 2, True)]
+
+
+def test_device_cache_projects_fields_and_reuses_fresh_lists(fmg, clock):
+    cache = cra.DeviceCache("https://fmg/jsonrpc", "sid", ttl=60)
+    lists = cache.get_many(["root", "branch-1"])
+    assert [d["name"] for d in lists["root"]] == ["hq-1", "hq-2"]
+    assert fmg.calls[-1]["params"] == [{"url": "/dvmdb/adom/root/device", "fields": ["name", "sn"]},
+                                       {"url": "/dvmdb/adom/branch-1/device", "fields": ["name", "sn"]}]
+
+    clock[0] += 30
+    assert [d["name"] for d in cache.get("root")] == ["hq-1", "hq-2"]
+    cache.get_many(["root", "branch-2"])                                 # only the unseen ADOM is fetched
+    assert len(fmg.calls) == 2
+    assert fmg.urls()[-1] == ["/dvmdb/adom/branch-2/device"]
+
+
+def test_device_cache_expiry_force_and_invalidate(fmg, clock):
+    cache = cra.DeviceCache("https://fmg/jsonrpc", "sid", ttl=60)
+    cache.get("root")
+    clock[0] += 61
+    cache.get("root")
+    cache.get("root", force=True)
+    assert len(fmg.calls) == 3
+
+    cache.get_many(["root", "branch-1"])
+    cache.invalidate("root")
+    cache.get_many(["root", "branch-1"])
+    assert fmg.urls()[-1] == ["/dvmdb/adom/root/device"]
+    cache.invalidate()
+    cache.get_many(["root", "branch-1"])
+    assert fmg.urls()[-1] == ["/dvmdb/adom/root/device", "/dvmdb/adom/branch-1/device"]
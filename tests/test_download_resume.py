@@ -0,0 +1,185 @@
+import base64
+import gzip
+import hashlib
+import os
+
+import pytest
+import requests
+
+import fmg_export_templates as export
+
+BODY = bytes(range(256)) * 40          # 10 KiB
+
+
+class Response:
+    def __init__(self, status, body, headers, drop_after=None):
+        self.status_code = status
+        self.body = body
+        self.headers = headers
+        self.drop_after = drop_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code)
+
+    def iter_content(self, chunk_size):
+        sent = 0
+        while sent < len(self.body):
+            if self.drop_after is not None and sent >= self.drop_after:
+                raise requests.exceptions.ChunkedEncodingError("connection dropped")
+            yield self.body[sent:sent + chunk_size]
+            sent += chunk_size
+
+
+class Server:
+    """session.get() stand-in serving BODY, honouring Range and dropping scripted requests."""
+
+    def __init__(self, drops=(), digest=False, honour_range=True, truncate=0, short_range=0,
+                 gzipped=False, total=None):
+        self.drops = list(drops)          # per request: byte offset to drop at, or None
+        self.digest = digest
+        self.honour_range = honour_range
+        self.truncate = truncate          # bytes missing from a full (200) body
+        self.short_range = short_range    # bytes missing from a partial (206) body
+        self.gzipped = gzipped            # Content-Encoding: gzip (iter_content decodes)
+        self.total = total                # Content-Range total to announce instead of the real one
+        self.ranges = []
+
+    def get(self, url, headers, params, verify, stream):
+        rng = headers.get("Range")
+        self.ranges.append(rng)
+        drop = self.drops.pop(0) if self.drops else None
+        if rng and self.honour_range:
+            start = int(rng[len("bytes="):-1])
+            body = BODY[start:len(BODY) - self.short_range]
+            hdrs = {"Content-Length": str(len(body)),
+                    "Content-Range": f"bytes {start}-{len(BODY) - 1}/{self.total or len(BODY)}"}
+            return Response(206, body, hdrs, drop)
+        hdrs = {"Content-Length": str(len(BODY))}
+        if self.gzipped:
+            hdrs = {"Content-Length": str(len(gzip.compress(BODY))), "Content-Encoding": "gzip",
+                    "Content-MD5": base64.b64encode(hashlib.md5(gzip.compress(BODY)).digest()).decode()}
+        if self.digest:
+            hdrs["Digest"] = "sha-256=" + base64.b64encode(hashlib.sha256(BODY).digest()).decode()
+        return Response(200, BODY[:len(BODY) - self.truncate], hdrs, drop)
+
+
+@pytest.fixture(autouse=True)
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(export.time, "sleep", lambda seconds: None)
+    return tmp_path
+
+
+def download(server, **kwargs):
+    return export.download_export(server, "csrf", 42, "bundle.dat", chunk_size=1024, **kwargs)
+
+
+def saved(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_plain_download_writes_file_and_sidecar(export_dir):
+    server = Server()
+    path, name = download(server)
+    assert name == "42_bundle.dat"
+    assert saved(path) == BODY
+    assert server.ranges == [None]
+    with open(path + ".sha256", encoding="utf-8") as f:
+        assert f.read() == f"{hashlib.sha256(BODY).hexdigest()}  42_bundle.dat\n"
+    assert not os.path.exists(path + ".part")
+
+
+def test_interrupted_download_resumes_with_range_and_keeps_digest():
+    server = Server(drops=[3072], digest=True)
+    path, _ = download(server)
+    assert saved(path) == BODY
+    assert server.ranges == [None, "bytes=3072-"]
+
+
+def test_resume_without_digest_keeps_the_received_bytes_when_the_size_matches():
+    server = Server(drops=[3072])
+    path, _ = download(server)
+    assert saved(path) == BODY
+    assert server.ranges == [None, "bytes=3072-"]
+    with open(path + ".sha256", encoding="utf-8") as f:
+        assert f.read().startswith(hashlib.sha256(BODY).hexdigest())
+
+
+def test_resume_failing_the_size_check_is_downloaded_again_in_full():
+    server = Server(drops=[3072], short_range=100)
+    path, _ = download(server)
+    assert saved(path) == BODY
+    assert server.ranges == [None, "bytes=3072-", None]
+
+
+def test_resume_announcing_a_different_total_restarts_from_zero():
+    server = Server(drops=[3072], total=len(BODY) + 1)
+    path, _ = download(server)
+    assert saved(path) == BODY
+    assert server.ranges == [None, "bytes=3072-", None]
+
+
+def test_leftover_part_file_is_resumed_and_checked_against_the_range_total(export_dir):
+    with open(export_dir / "42_bundle.dat.part", "wb") as f:
+        f.write(BODY[:8])
+    server = Server()
+    path, _ = download(server)
+    assert saved(path) == BODY
+    assert server.ranges == ["bytes=8-"]
+
+    with open(export_dir / "42_bundle.dat.part", "wb") as f:
+        f.write(BODY[:8])
+    with pytest.raises(RuntimeError, match="incomplete"):
+        download(Server(short_range=100, truncate=100))
+
+
+def test_encoded_response_is_saved_decoded_without_the_encoded_size_check():
+    server = Server(gzipped=True)
+    path, _ = download(server)
+    assert saved(path) == BODY                                  # not the gzip Content-Length or MD5
+    assert server.ranges == [None]
+
+
+def test_interrupted_encoded_response_restarts_from_zero():
+    server = Server(drops=[3072], gzipped=True)
+    path, _ = download(server)
+    assert saved(path) == BODY
+    assert server.ranges == [None, None]
+
+
+@pytest.mark.parametrize("headers", [{"Digest": "sha-256=abc"}, {"Content-MD5": "abcde"}])
+def test_malformed_checksum_header_counts_as_missing(headers):
+    assert export._expected_digest(Response(200, b"", headers)) is None
+
+
+def test_server_ignoring_range_restarts_from_zero():
+    server = Server(drops=[2048], digest=True, honour_range=False)
+    path, _ = download(server)
+    assert saved(path) == BODY
+    assert server.ranges == [None, "bytes=2048-"]
+
+
+def test_short_body_fails_the_size_check():
+    with pytest.raises(RuntimeError, match="incomplete"):
+        download(Server(truncate=100))
+
+
+def test_digest_mismatch_is_reported(monkeypatch):
+    server = Server(digest=True)
+    monkeypatch.setattr(export, "_expected_digest", lambda resp: ("sha256", "0" * 64))
+    with pytest.raises(RuntimeError, match="checksum mismatch"):
+        download(server)
+
+
+def test_gives_up_after_max_retries():
+    server = Server(drops=[0, 0, 0])
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        download(server, max_retries=2)
@@ -0,0 +1,65 @@
+import json
+
+from duplicates import canonical, canonical_hash, find_duplicates
+
+
+def test_canonical_drops_identity_fields_only_at_the_top():
+    entry = {"name": "a", "uuid": "u1", "comment": "c", "color": 3, "subnet": "10.0.0.0/24",
+             "dynamic_mapping": [{"_scope": [{"name": "FGT"}], "uuid": "u2", "comment": "kept"}]}
+    assert canonical(entry) == {
+        "subnet": "10.0.0.0/24",
+        "dynamic_mapping": [{"_scope": [{"name": "FGT"}], "comment": "kept"}],
+    }
+
+
+def test_canonical_sorts_set_like_lists_only():
+    assert canonical({"member": ["b", "a", "c"]}) == {"member": ["a", "b", "c"]}
+    assert canonical({"srcaddr": [443, "80", 22]}) == {"srcaddr": [22, 443, "80"]}
+    rules = [{"seq": 2}, {"seq": 1}]
+    assert canonical({"rules": rules}) == {"rules": rules}
+    # positional lists keep their order
+    assert canonical({"subnet": ["255.255.255.0", "10.0.0.0"]}) == {"subnet": ["255.255.255.0", "10.0.0.0"]}
+    assert canonical({"dynamic_mapping": [{"member": ["z", "y"], "extip": ["b", "a"]}]}) == {
+        "dynamic_mapping": [{"member": ["y", "z"], "extip": ["b", "a"]}]}
+
+
+def test_swapped_positional_values_are_not_duplicates():
+    a = {"name": "a", "subnet": ["10.0.0.0", "255.255.255.0"]}
+    b = {"name": "b", "subnet": ["255.255.255.0", "10.0.0.0"]}
+    assert canonical_hash(a) != canonical_hash(b)
+
+
+def test_canonical_hash_ignores_cosmetics_and_order():
+    a = {"name": "web1", "uuid": "1", "member": ["x", "y"], "type": "ipmask", "comments": "old"}
+    b = {"type": "ipmask", "member": ["y", "x"], "name": "web2", "uuid": "2", "color": 7}
+    assert canonical_hash(a) == canonical_hash(b)
+    assert canonical_hash(a) != canonical_hash({**a, "type": "iprange"})
+    assert canonical_hash({"ports": [1, 2]}) != canonical_hash({"ports": ["1", "2"]})
+    assert len(canonical_hash(a)) == 32
+
+
+def write_snapshot(tmp_path, data):
+    path = tmp_path / "snap_root.json"
+    path.write_text(json.dumps({"data": data}), encoding="utf-8")
+    return [str(path)]
+
+
+def test_find_duplicates_across_and_within_adoms(tmp_path):
+    files = write_snapshot(tmp_path, {
+        "root": {"firewall/address": [
+            {"name": "a1", "subnet": "10.0.0.0/24", "uuid": "1"},
+            {"name": "a2", "subnet": "10.0.0.0/24", "uuid": "2"},
+            {"name": "lonely", "subnet": "10.9.0.0/24"},
+        ], "firewall/service/custom": [{"name": "s1", "tcp-portrange": "443"}]},
+        "branch": {"firewall/address": [{"name": "b1", "subnet": "10.0.0.0/24", "color": 4}],
+                   "firewall/service/custom": [{"name": "s2", "tcp-portrange": "443"}]},
+    })
+    sets, scanned = find_duplicates(files)
+    assert scanned == 6
+    assert [(s["table"], sorted(s["objects"])) for s in sets] == [
+        ("firewall/address", [("branch", "b1"), ("root", "a1"), ("root", "a2")]),
+        ("firewall/service/custom", [("branch", "s2"), ("root", "s1")]),
+    ]
+
+    sets, _ = find_duplicates(files, tables={"firewall/address"}, within_adom=True)
+    assert [sorted(s["objects"]) for s in sets] == [[("root", "a1"), ("root", "a2")]]
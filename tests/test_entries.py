@@ -0,0 +1,15 @@
+import pytest
+
+from entries import entry_key
+
+
+@pytest.mark.parametrize("entry, key", [
+    ({"name": "web1", "policyid": 4}, "web1"),
+    ({"name": "", "policyid": 4}, "4"),
+    ({"policyid": 0}, "0"),
+    ({"seq-num": 12}, "12"),
+    ({"q_origin_key": "port1"}, "port1"),
+    ({"comment": "no key"}, ""),
+])
+def test_entry_key_takes_the_first_non_empty_key_field(entry, key):
+    assert entry_key(entry) == key
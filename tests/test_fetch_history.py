@@ -0,0 +1,69 @@
+import json
+
+from fetch_history import EMA_WEIGHT, FetchHistory
+
+
+def test_order_is_longest_first_with_unknown_work_last_in_original_order(tmp_path):
+    history = FetchHistory(str(tmp_path / "h.json"))
+    history.record("rootp", "firewall/address", 40.0, 90000)
+    history.record("root", "firewall/address", 5.0, 1000)
+    history.record("root", "firewall/policy", 12.0, 300)
+
+    work = [("root", "firewall/address"), ("root", "new/table"), ("root", "firewall/policy"),
+            ("rootp", "firewall/address"), ("root", "other/table")]
+    ordered, known = history.order(work)
+    assert ordered == [("rootp", "firewall/address"), ("root", "firewall/policy"),
+                       ("root", "firewall/address"), ("root", "new/table"), ("root", "other/table")]
+    assert known == 3
+
+
+def test_unseen_adom_falls_back_to_the_table_mean(tmp_path):
+    history = FetchHistory(str(tmp_path / "h.json"))
+    history.record("a", "firewall/address", 10.0, 1)
+    history.record("b", "firewall/address", 30.0, 1)
+    history.record("a", "firewall/service/custom", 15.0, 1)
+
+    assert history.estimate("c", "firewall/address") is None
+    ordered, known = history.order([{"adom": "c", "table": "firewall/service/custom"},
+                                    {"adom": "c", "table": "firewall/address"}],
+                                   key=lambda item: (item["adom"], item["table"]))
+    assert [item["table"] for item in ordered] == ["firewall/address", "firewall/service/custom"]
+    assert known == 2
+
+
+def test_ties_keep_the_original_order(tmp_path):
+    history = FetchHistory(str(tmp_path / "h.json"))
+    for table in ("t1", "t2", "t3"):
+        history.record("root", table, 2.0, 1)
+    work = [("root", "t3"), ("root", "t1"), ("root", "t2")]
+    assert history.order(work)[0] == work
+
+
+def test_durations_are_smoothed_and_runs_counted(tmp_path):
+    history = FetchHistory(str(tmp_path / "h.json"))
+    history.record("root", "firewall/address", 10.0, 100)
+    history.record("root", "firewall/address", 20.0, 120)
+    entry = history.entries["root\tfirewall/address"]
+    assert entry["seconds"] == EMA_WEIGHT * 20.0 + (1 - EMA_WEIGHT) * 10.0
+    assert entry["count"] == 120 and entry["runs"] == 2
+
+
+def test_save_and_reload_per_host(tmp_path):
+    history = FetchHistory.for_host("fmg.example.com", 443, str(tmp_path / "hist"))
+    assert history.path == str(tmp_path / "hist" / "fmg.example.com_443.json")
+    history.record("root", "firewall/address", 3.5, 10)
+    history.save()
+
+    again = FetchHistory.for_host("fmg.example.com", 443, str(tmp_path / "hist"))
+    assert again.estimate("root", "firewall/address") == 3.5
+    assert FetchHistory.for_host("fmg.example.com", 8443, str(tmp_path / "hist")).entries == {}
+
+
+def test_unreadable_history_starts_over(tmp_path):
+    path = tmp_path / "h.json"
+    path.write_text("{not json", encoding="utf-8")
+    history = FetchHistory(str(path))
+    assert history.entries == {}
+    history.record("root", "t", 1.0, 1)
+    history.save()
+    assert json.loads(path.read_text(encoding="utf-8"))["entries"]["root\tt"]["runs"] == 1
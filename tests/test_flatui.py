@@ -0,0 +1,62 @@
+import pytest
+
+from fmg_common import flatui, task_watcher
+
+ADOMS = [{"name": "root", "oid": 3}, {"name": "rootp", "oid": 10}, {"name": "branch", "oid": 120}]
+
+
+class Session:
+    def __init__(self, body):
+        self.body = body
+        self.posts = []
+
+    def post(self, url, headers, json, verify):
+        self.posts.append((url, headers, json))
+        return self
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+@pytest.mark.parametrize("body", [{"result": ["a", "b"]}, {"data": {"result": ["a", "b"]}}])
+def test_forward_get_accepts_both_result_shapes(body):
+    session = Session(body)
+    assert flatui.forward_get("https://fmg", session, "tok", [{"url": "/x"}, {"url": "/y"}]) == ["a", "b"]
+    url, headers, payload = session.posts[0]
+    assert url == "https://fmg/cgi-bin/module/flatui/forward"
+    assert headers == {"XSRF-TOKEN": "tok"} and payload["params"] == [{"url": "/x"}, {"url": "/y"}]
+    assert flatui.forward_get("https://fmg", Session({"oops": 1}), "tok", []) == []
+
+
+@pytest.mark.parametrize("task, done", [
+    ({"state": 4}, True), ({"state": "5"}, True), ({"state": 2}, True), ({"state": 1, "percent": 100}, True),
+    ({"state": 1, "num_lines": 3, "num_done": 3}, True), ({"state": 1, "percent": 40}, False),
+])
+def test_task_done(task, done):
+    assert flatui.task_done(task) is done
+
+
+def test_make_task_watcher_polls_through_the_forwarder(monkeypatch):
+    calls = []
+
+    def forward_get(base_url, session, csrf_token, params):
+        calls.append((base_url, csrf_token, [p["url"] for p in params]))
+        return [{"status": {"code": 0}, "data": {"state": 4, "percent": 100}} for _ in params]
+
+    monkeypatch.setattr(flatui, "forward_get", forward_get)
+    monkeypatch.setattr(task_watcher.time, "sleep", lambda seconds: None)
+    watcher = flatui.make_task_watcher("https://fmg", None, "tok", show_progress=False)
+    a, b = watcher.watch(7), watcher.watch(8)
+    watcher.wait_all(timeout=5)
+    assert a.result()["state"] == 4 and b.done()
+    assert calls == [("https://fmg", "tok", ["/task/task/7", "/task/task/8"])]
+
+
+def test_select_batch_adoms():
+    assert [a["name"] for a in flatui.select_batch_adoms(ADOMS, "ALL")] == ["root", "branch"]
+    assert [a["name"] for a in flatui.select_batch_adoms(ADOMS, "branch, root")] == ["branch", "root"]
+    with pytest.raises(RuntimeError, match="Unknown ADOM"):
+        flatui.select_batch_adoms(ADOMS, "root,nope")
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import fleet_extract as fleet
+
+
+def inventory(tmp_path, fortimanagers, defaults=None):
+    path = tmp_path / "fleet.json"
+    doc = {"fortimanagers": fortimanagers}
+    if defaults is not None:
+        doc["defaults"] = defaults
+    path.write_text(json.dumps(doc), encoding="utf-8")
+    return str(path)
+
+
+def test_load_inventory_applies_defaults_and_parses_values(tmp_path):
+    fmgs = fleet.load_inventory(inventory(tmp_path, [
+        {"name": "fmg-dc1", "host": "10.0.0.1", "password": "env:DC1"},
+        {"name": "lab/fmg 2", "host": "lab", "port": 8443, "password": "file:/run/secrets/lab",
+         "adoms": ["root", "Global"], "format": ["json", "sqlite"], "max_memory": "1G", "workers": 8},
+    ], defaults={"user": "api_ro", "workers": 2, "shard_size": "512M"}))
+
+    dc1, lab = fmgs
+    assert (dc1["port"], dc1["user"], dc1["workers"], dc1["adoms"]) == (443, "api_ro", 2, "all")
+    assert dc1["format"] == ["json"] and dc1["max_memory"] is None
+    assert dc1["shard_size"] == 512 * 1024 ** 2
+    assert lab["name"] == "lab_fmg_2"
+    assert (lab["port"], lab["workers"], lab["adoms"]) == (8443, 8, ["root", "Global"])
+    assert lab["format"] == ["json", "sqlite"] and lab["max_memory"] == 1024 ** 3
+
+
+@pytest.mark.parametrize("entries, message", [
+    ([{"name": "a", "password": "env:X"}], "has no host"),
+    ([{"name": "a", "host": "h", "password": "env:X"}, {"name": "a", "host": "h2", "password": "env:Y"}],
+     "Duplicate inventory name 'a'"),
+    ([{"name": "a", "host": "h", "password": "hunter2"}], "password must be a reference"),
+    ([{"name": "a", "host": "h"}], "password must be a reference"),
+    ([{"name": "a", "host": "h", "password": "env:X", "category": "nope"}], "unknown category 'nope'"),
+    ([{"name": "dc 1", "host": "h", "password": "env:X"}, {"name": "dc/1", "host": "h2", "password": "env:Y"}],
+     r"Duplicate inventory name 'dc/1' \(as 'dc_1'\)"),
+    ([{"name": "a", "host": "h", "password": "env:X", "adoms": "root"}], 'adoms must be "all" or a list'),
+    ([{"name": "a", "host": "h", "password": "env:X", "adoms": []}], 'adoms must be "all" or a list'),
+    ([{"name": "a", "host": "h", "password": "env:X", "adoms": ["root", 3]}], 'adoms must be "all" or a list'),
+    ([{"name": "a", "host": "h", "password": "env:X", "workers": "4"}], "workers must be a whole number"),
+    ([{"name": "a", "host": "h", "password": "env:X", "workers": 0}], "workers must be a whole number"),
+    ([{"name": "a", "host": "h", "password": "env:X", "workers": True}], "workers must be a whole number"),
+    ([{"name": "a", "host": "h", "password": "env:X", "format": "xml"}], "a: unknown format 'xml'"),
+    ([{"name": "a", "host": "h", "password": "env:X", "format": {"json": 1}}], "format must be a name or a list"),
+    ([{"name": "a", "host": "h", "password": "env:X", "format": ["json", 2]}], "format must be a name or a list"),
+    ([], "No fortimanagers listed"),
+])
+def test_load_inventory_rejects_bad_entries(tmp_path, entries, message):
+    with pytest.raises(ValueError, match=message):
+        fleet.load_inventory(inventory(tmp_path, entries))
+
+
+def test_env_and_file_secrets(tmp_path, monkeypatch):
+    monkeypatch.setenv("FMG_DC1_PASSWORD", "s3cret")
+    assert fleet.resolve_secret("env:FMG_DC1_PASSWORD", "fmg-dc1") == "s3cret"
+    monkeypatch.delenv("FMG_DC1_PASSWORD")
+    with pytest.raises(ValueError, match="FMG_DC1_PASSWORD is not set"):
+        fleet.resolve_secret("env:FMG_DC1_PASSWORD", "fmg-dc1")
+
+    secret = tmp_path / "dc2"
+    secret.write_text("from-file\r\nsecond line\n", encoding="utf-8")
+    assert fleet.resolve_secret(f"file:{secret}", "fmg-dc2") == "from-file"
+    with pytest.raises(ValueError, match="cannot read"):
+        fleet.resolve_secret(f"file:{tmp_path / 'missing'}", "fmg-dc2")
+
+
+def test_prompt_and_literal_secrets(monkeypatch):
+    asked = []
+    monkeypatch.setattr(fleet.ax, "prompt_password", lambda label: asked.append(label) or "typed")
+    assert fleet.resolve_secret("prompt", "fmg-lab") == "typed"
+    assert asked == ["Password for fmg-lab"]
+    with pytest.raises(ValueError, match="not a literal"):
+        fleet.resolve_secret("hunter2", "fmg-lab")
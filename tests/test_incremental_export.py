@@ -0,0 +1,137 @@
+import gzip
+import io
+import json
+import os
+import tarfile
+
+import pytest
+
+import fmg_export_templates as export
+from fmg_common import flatui
+from template_catalog import load_json_bundle
+
+TRACKED = export.INCREMENTAL_CATEGORIES
+
+
+class FakeFMG:
+    """Objects per fingerprint URL plus an export/download pipeline writing JSON bundles."""
+
+    def __init__(self, export_dir):
+        self.export_dir = export_dir
+        self.objects = {url.format(adom="branch"): [{"name": url.rsplit("/", 1)[1]}]
+                        for urls in export.CATEGORY_URLS.values() for url in urls}
+        self.failing = set()
+        self.exports = []
+
+    def content(self, category):
+        urls = [u.format(adom="branch") for u in export.CATEGORY_URLS.get(category, [])]
+        return {"templates": [self.objects[u] for u in urls] or [category]}
+
+    def forward_get(self, base_url, session, csrf_token, params):
+        return [{"status": {"code": -3, "message": "no permission"}} if p["url"] in self.failing
+                else {"status": {"code": 0}, "data": self.objects[p["url"]]} for p in params]
+
+    def initiate_export(self, session, csrf_token, adom_oid, categories=None):
+        self.exports.append(list(categories))
+        return 40 + len(self.exports), "bundle.json"
+
+    def download_export(self, session, csrf_token, task_id, file_name):
+        path = os.path.join(self.export_dir, f"{task_id}_{file_name}")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({c: self.content(c) for c in self.exports[-1]}, f)
+        return path, os.path.basename(path)
+
+
+@pytest.fixture
+def fmg(tmp_path, monkeypatch):
+    fake = FakeFMG(str(tmp_path))
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(export, "INCREMENTAL_STATE", str(tmp_path / "incremental_state.json"))
+    monkeypatch.setattr(export, "PARTIAL_DIR", str(tmp_path / "partial"))
+    monkeypatch.setattr(flatui, "forward_get", fake.forward_get)
+    monkeypatch.setattr(export, "initiate_export", fake.initiate_export)
+    monkeypatch.setattr(export, "download_export", fake.download_export)
+    monkeypatch.setattr(export, "wait_for_task", lambda *args, **kwargs: {})
+    return fake
+
+
+def run(**kwargs):
+    return export.export_adom(None, "tok", 120, "branch", incremental=True, **kwargs)
+
+
+def test_fingerprints_come_from_one_request_and_failures_are_unknown(fmg):
+    first = export.category_fingerprints(None, "tok", "branch")
+    assert list(first) == TRACKED and all(first.values())
+
+    fmg.failing = {"/pm/config/adom/branch/obj/cli/template-group"}
+    second = export.category_fingerprints(None, "tok", "branch")
+    assert second["cli-prof"] is None
+    assert second["sys-prof"] == first["sys-prof"]
+
+
+def test_first_run_is_a_full_export_and_records_state(fmg):
+    result = run()
+    assert fmg.exports == [TRACKED]
+    assert "bgp-prof" in export.TEMPLATE_CATEGORIES and "bgp-prof" not in TRACKED    # no fingerprint URL
+    with open(export.INCREMENTAL_STATE, encoding="utf-8") as f:
+        state = json.load(f)["branch"]
+    assert state["path"] == result["path"]
+    assert state["categories"]["sys-prof"] is not None
+
+
+def test_changed_category_is_exported_and_merged_into_a_full_snapshot(fmg):
+    first = run()
+    fmg.objects["/pm/devprof/adom/branch"] = [{"name": "devprof", "hostname": "changed"}]
+    second = run()
+
+    assert fmg.exports[-1] == ["sys-prof"]
+    merged, gzipped = load_json_bundle(second["path"])
+    assert not gzipped
+    assert set(merged) == set(TRACKED)
+    assert merged["sys-prof"] == fmg.content("sys-prof")
+    assert merged["cli-prof"] == load_json_bundle(first["path"])[0]["cli-prof"]
+    assert os.listdir(export.PARTIAL_DIR) == [os.path.basename(second["path"])]
+    with open(second["path"] + ".sha256", encoding="utf-8") as f:
+        assert f.read().endswith(f"  {os.path.basename(second['path'])}\n")
+
+
+def test_nothing_changed_reuses_the_previous_snapshot(fmg):
+    first = run()
+    second = run()
+    assert len(fmg.exports) == 1
+    assert second["unchanged"] and second["path"] == first["path"]
+
+
+def test_failed_lookup_is_re_exported_but_keeps_its_last_hash(fmg):
+    run()
+    with open(export.INCREMENTAL_STATE, encoding="utf-8") as f:
+        known = json.load(f)["branch"]["categories"]["cli-prof"]
+    fmg.failing = {"/pm/config/adom/branch/obj/cli/template"}
+    run()
+    assert fmg.exports[-1] == ["cli-prof"]
+    with open(export.INCREMENTAL_STATE, encoding="utf-8") as f:
+        assert json.load(f)["branch"]["categories"]["cli-prof"] == known
+
+
+def test_merge_bundles_drops_replaced_categories_and_keeps_gzip(tmp_path):
+    previous = tmp_path / "old.json"
+    previous.write_text(json.dumps({"a": [1], "b": [2], "c": [3]}), encoding="utf-8")
+    delta = tmp_path / "delta.json.gz"
+    delta.write_bytes(gzip.compress(json.dumps({"a": [10]}).encode()))
+    out = str(tmp_path / "merged.json")
+
+    assert export.merge_bundles(str(previous), str(delta), out, {"a", "b"})
+    merged, gzipped = load_json_bundle(out)
+    assert gzipped and merged == {"a": [10], "c": [3]}
+    # a delta not laid out per re-exported category cannot be overlaid
+    delta.write_bytes(gzip.compress(json.dumps({"a": [10], "c": [30]}).encode()))
+    assert not export.merge_bundles(str(previous), str(delta), out, {"a"})
+
+    bio = io.BytesIO()
+    with tarfile.open(fileobj=bio, mode="w") as tar:
+        info = tarfile.TarInfo("t.json")
+        info.size = 2
+        tar.addfile(info, io.BytesIO(b"{}"))
+    archive = tmp_path / "delta.tar"
+    archive.write_bytes(bio.getvalue())
+    assert not export.merge_bundles(str(previous), str(archive), str(tmp_path / "x.json"), {"a"})
@@ -0,0 +1,163 @@
+import ipaddress
+import json
+import random
+
+import pytest
+
+import ip_index
+from ip_index import IntervalTree, IpIndex, derive_adom
+
+
+def ip(text):
+    return int(ipaddress.ip_address(text))
+
+
+def test_interval_tree_matches_brute_force():
+    rng = random.Random(7)
+    intervals = []
+    for i in range(400):
+        start = rng.randrange(0, 10_000)
+        intervals.append((start, start + rng.randrange(0, 500), i))
+    tree = IntervalTree(intervals)
+    assert len(tree) == 400
+    for _ in range(200):
+        qs = rng.randrange(0, 10_500)
+        qe = qs + rng.randrange(0, 300)
+        expected = sorted(iv for iv in intervals if iv[0] <= qe and iv[1] >= qs)
+        assert sorted(tree.overlap(qs, qe)) == expected
+
+
+def test_interval_tree_edges():
+    assert IntervalTree([]).overlap(0, 10) == []
+    tree = IntervalTree([(5, 10, "a"), (10, 10, "b"), (11, 20, "c")])
+    assert sorted(p for _, _, p in tree.overlap(10, 10)) == ["a", "b"]
+    assert sorted(p for _, _, p in tree.overlap(0, 4)) == []
+    assert sorted(p for _, _, p in tree.overlap(0, 100)) == ["a", "b", "c"]
+
+
+def test_derive_adom_ranges():
+    tables = {
+        "firewall/address": [
+            {"name": "net", "subnet": ["10.1.0.0", "255.255.0.0"]},
+            {"name": "range", "type": "iprange", "start-ip": "10.2.0.1", "end-ip": "10.2.0.9"},
+            {"name": "none", "subnet": ["0.0.0.0", "255.255.255.255"], "dynamic_mapping": [
+                {"_scope": [{"name": "FGT"}], "subnet": ["10.3.0.0", "255.255.255.0"]}]},
+        ],
+        "firewall/vip": [{"name": "web", "extip": "203.0.113.10", "mappedip": [{"range": "10.1.0.5"}]}],
+        "firewall/addrgrp": [
+            {"name": "inner", "member": ["range", "gnet"]},
+            {"name": "outer", "member": ["inner", "net", "outer"]},      # self-reference is ignored
+        ],
+    }
+    derived = derive_adom("root", tables, {"gnet": [("subnet", 4, ip("172.16.0.0"), ip("172.16.0.255"))]})
+
+    assert derived[("firewall/address", "net")][1] == [("subnet", 4, ip("10.1.0.0"), ip("10.1.255.255"))]
+    assert derived[("firewall/address", "range")][1] == [("subnet", 4, ip("10.2.0.1"), ip("10.2.0.9"))]
+    assert derived[("firewall/address", "none")][1] == [
+        ("subnet (dynamic_mapping)", 4, ip("10.3.0.0"), ip("10.3.0.255"))]
+    assert derived[("firewall/vip", "web")][1] == [
+        ("vip external", 4, ip("203.0.113.10"), ip("203.0.113.10")),
+        ("vip mapped", 4, ip("10.1.0.5"), ip("10.1.0.5"))]
+    outer = {(s, e) for _, _, s, e in derived[("firewall/addrgrp", "outer")][1]}
+    assert outer == {(ip("10.2.0.1"), ip("10.2.0.9")), (ip("172.16.0.0"), ip("172.16.0.255")),
+                     (ip("10.1.0.0"), ip("10.1.255.255"))}
+
+
+def test_two_addresses_are_not_mistaken_for_an_ip_and_mask():
+    tables = {"firewall/vip": [
+        {"name": "pool", "extip": "203.0.113.10", "mappedip": ["10.0.0.1", "10.0.0.2"]},
+        {"name": "masked", "extip": ["203.0.113.0", "255.255.255.0"], "mappedip": "10.0.1.0/24"},
+    ]}
+    derived = derive_adom("root", tables)
+    assert derived[("firewall/vip", "pool")][1] == [
+        ("vip external", 4, ip("203.0.113.10"), ip("203.0.113.10")),
+        ("vip mapped", 4, ip("10.0.0.1"), ip("10.0.0.1")),
+        ("vip mapped", 4, ip("10.0.0.2"), ip("10.0.0.2"))]
+    assert derived[("firewall/vip", "masked")][1][0] == ("vip external", 4, ip("203.0.113.0"), ip("203.0.113.255"))
+    assert ip_index._is_netmask("255.255.254.0") and ip_index._is_netmask("0.0.0.0")
+    assert not ip_index._is_netmask("255.0.255.0") and not ip_index._is_netmask("fe80::")
+
+
+def snapshot(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_text(json.dumps({"data": data}), encoding="utf-8")
+    return [str(path)]
+
+
+@pytest.fixture
+def index(tmp_path):
+    ix = IpIndex(str(tmp_path / "ip.sqlite"))
+    yield ix
+    ix.close()
+
+
+def names(rows):
+    return sorted((adom, name) for adom, _, name, _, _ in rows)
+
+
+def test_lookup_modes(tmp_path, index):
+    index.update(snapshot(tmp_path, "s.json", {"root": {"firewall/address": [
+        {"name": "wide", "subnet": "10.0.0.0/8"},
+        {"name": "lan", "subnet": "10.20.0.0/16"},
+        {"name": "host", "subnet": "10.20.30.40/32"},
+        {"name": "all", "subnet": "0.0.0.0/0"},
+        {"name": "v6", "type": "ipprefix", "ip6": "2001:db8::/32"},
+    ]}}))
+    assert names(index.lookup("10.20.30.40")) == [("root", n) for n in ("all", "host", "lan", "wide")]
+    assert names(index.lookup("10.20.30.40", exclude_any=True)) == [("root", n) for n in ("host", "lan", "wide")]
+    assert names(index.lookup("10.20.0.0/16", mode="within")) == [("root", "host"), ("root", "lan")]
+    assert names(index.lookup("10.20.30.0/24", mode="overlap", exclude_any=True)) == [
+        ("root", "host"), ("root", "lan"), ("root", "wide")]
+    assert names(index.lookup("2001:db8::1")) == [("root", "v6")]
+    assert index.lookup("10.20.30.40", adom="other") == []
+
+
+def test_update_replaces_only_the_snapshot_adoms(tmp_path, index):
+    index.update(snapshot(tmp_path, "a.json", {
+        "root": {"firewall/address": [{"name": "a", "subnet": "10.1.0.0/24"},
+                                      {"name": "b", "subnet": "10.2.0.0/24"}]},
+        "branch": {"firewall/address": [{"name": "c", "subnet": "10.1.0.0/24"}]},
+    }))
+    stats = index.update(snapshot(tmp_path, "b.json", {
+        "root": {"firewall/address": [{"name": "a", "subnet": "10.1.0.0/24"},
+                                      {"name": "d", "subnet": "10.4.0.0/24"}]},
+    }))
+    assert (stats["added"], stats["removed"], stats["unchanged"], stats["changed"]) == (1, 1, 1, 0)
+    assert names(index.lookup("10.1.0.1")) == [("branch", "c"), ("root", "a")]
+    assert index.lookup("10.2.0.1") == []
+
+
+def test_global_members_come_from_the_index_and_follow_global_updates(tmp_path, index):
+    index.update(snapshot(tmp_path, "g1.json", {
+        "rootp": {"firewall/address": [{"name": "g_net", "subnet": "10.9.0.0/16"}]}}))
+    index.update(snapshot(tmp_path, "l.json", {"root": {
+        "firewall/address": [{"name": "a", "subnet": "192.168.1.0/24"}],
+        "firewall/addrgrp": [{"name": "grp", "member": ["a", "g_net"]}]}}))
+    assert ("root", "grp") in names(index.lookup("10.9.1.1"))        # resolved from the stored Global
+
+    stats = index.update(snapshot(tmp_path, "g2.json", {
+        "rootp": {"firewall/address": [{"name": "g_net", "subnet": "172.16.0.0/16"}]}}))
+    assert stats["rederived"] == 1
+    assert ("root", "grp") not in names(index.lookup("10.9.1.1"))
+    assert ("root", "grp") in names(index.lookup("172.16.1.1"))
+    assert ("root", "grp") in names(index.lookup("192.168.1.1"))
+
+
+def test_trees_are_built_once_per_generation(tmp_path, index, monkeypatch):
+    index.update(snapshot(tmp_path, "a.json", {"root": {"firewall/address": [
+        {"name": "a", "subnet": "10.1.0.0/24"}]}}))
+    built = []
+    real_tree = ip_index.IntervalTree
+    monkeypatch.setattr(ip_index, "IntervalTree", lambda items: built.append(len(items)) or real_tree(items))
+
+    index.lookup("10.1.0.1")
+    other = IpIndex(index.db_path)                                    # e.g. a second lookup in the process
+    try:
+        assert names(other.lookup("10.1.0.1")) == [("root", "a")]
+        assert built == [1, 0]                                        # one IPv4 and one IPv6 tree
+        index.update(snapshot(tmp_path, "b.json", {"root": {"firewall/address": [
+            {"name": "b", "subnet": "10.1.0.0/16"}]}}))
+        assert names(other.lookup("10.1.0.1")) == [("root", "b")]     # new generation, rebuilt
+        assert built == [1, 0, 1, 0]
+    finally:
+        other.close()
@@ -0,0 +1,63 @@
+import urllib3
+
+import fmg_import_templates as imp
+
+BUNDLE = b'{"template": "branch"}\n' * 5000
+
+
+def bundle(tmp_path):
+    path = tmp_path / "bundle.json"
+    path.write_bytes(BUNDLE)
+    return str(path)
+
+
+def test_body_matches_a_regular_multipart_encoding(tmp_path):
+    path = bundle(tmp_path)
+    fields = {"csrfmiddlewaretoken": "tok", "csrf_token": "tok"}
+    with imp.StreamingMultipartUpload(fields, "filepath", path, "application/json", chunk_size=4096) as body:
+        data = b"".join(body)
+        expected, content_type = urllib3.encode_multipart_formdata(
+            list(fields.items()) + [("filepath", ("bundle.json", BUNDLE, "application/json"))],
+            boundary=body.boundary)
+        assert data == expected
+        assert body.content_type == content_type
+        assert len(body) == len(data) == body.sent
+
+
+def test_reads_are_bounded_and_progress_reaches_the_total(tmp_path):
+    progress = []
+    with imp.StreamingMultipartUpload({"a": "b"}, "filepath", bundle(tmp_path), chunk_size=1000,
+                                      progress=lambda sent, total: progress.append((sent, total))) as body:
+        sizes = []
+        while True:
+            block = body.read()                 # read-everything requests are capped too
+            if not block:
+                break
+            sizes.append(len(block))
+        assert max(sizes) == 1000
+        assert sum(sizes) == len(body)
+    assert progress[-1] == (len(body), len(body))
+    assert [sent for sent, _ in progress] == sorted(sent for sent, _ in progress)
+
+
+def test_upload_posts_the_stream_with_its_length(tmp_path):
+    sent = {}
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"status": "ok"}
+
+    class Session:
+        def post(self, url, headers, data, verify):
+            sent.update(url=url, headers=headers, body=b"".join(iter(lambda: data.read(8192), b"")))
+            return Response()
+
+    assert imp.upload_template_file(Session(), "tok", bundle(tmp_path), chunk_size=8192) == {"status": "ok"}
+    assert sent["url"].endswith("/flatui/api/gui/deploy/import")
+    assert sent["headers"]["XSRF-TOKEN"] == "tok"
+    assert sent["headers"]["Content-Type"].startswith("multipart/form-data; boundary=")
+    assert int(sent["headers"]["Content-Length"]) == len(sent["body"])
+    assert BUNDLE in sent["body"]
@@ -0,0 +1,84 @@
+import gzip
+import hashlib
+import json
+import os
+
+import pytest
+
+from ndjson_sink import ShardWriter, write_ndjson
+from table_store import TableStore
+
+
+def make_store():
+    store = TableStore()
+    store.append("root", "firewall/address", [{"name": f"addr{i}", "subnet": f"10.0.{i}.0/24"}
+                                              for i in range(50)])
+    store.append("root", "firewall/policy", [{"policyid": 1, "action": "accept"}])
+    store.append("branch", "firewall/address", [{"name": "naïve", "subnet": "10.9.0.0/24"}])
+    store.ensure("empty", ["firewall/address"])
+    return {"metadata": {"host": "fmg"}, "data": store}
+
+
+def read_lines(path, compression):
+    opener = gzip.open if compression == "gzip" else open
+    with opener(path, "rb") as f:
+        return [json.loads(line) for line in f.read().decode("utf-8").splitlines()]
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_single_file_with_manifest(tmp_path, compression):
+    stem = str(tmp_path / "run")
+    manifest = write_ndjson(make_store(), stem, compression)
+    suffix = ".gz" if compression == "gzip" else ""
+    assert [s["file"] for s in manifest["shards"]] == [f"run.ndjson{suffix}"]
+
+    records = read_lines(f"{stem}.ndjson{suffix}", compression)
+    assert len(records) == manifest["records"] == 52
+    assert records[0] == {"adom": "root", "table": "firewall/address", "name": "addr0",
+                          "data": {"name": "addr0", "subnet": "10.0.0.0/24"}}
+    assert records[50]["name"] == "1"                                  # policyid as the key
+    assert records[51]["name"] == "naïve"                              # written as UTF-8, not escaped
+
+    shard = manifest["shards"][0]
+    with open(f"{stem}.ndjson{suffix}", "rb") as f:
+        assert shard["sha256"] == hashlib.sha256(f.read()).hexdigest()
+    assert shard["bytes"] == os.path.getsize(f"{stem}.ndjson{suffix}")
+    assert shard["adoms"] == {"root": 51, "branch": 1}
+    assert shard["tables"] == ["firewall/address", "firewall/policy"]
+    with open(f"{stem}.manifest.json", encoding="utf-8") as f:
+        assert json.load(f)["metadata"] == {"host": "fmg"}
+
+
+def test_shards_split_on_line_boundaries(tmp_path):
+    stem = str(tmp_path / "run")
+    manifest = write_ndjson(make_store(), stem, shard_bytes=1000)
+    files = [s["file"] for s in manifest["shards"]]
+    assert len(files) > 1
+    assert files[:2] == ["run.0000.ndjson", "run.0001.ndjson"]
+
+    records = []
+    for shard in manifest["shards"]:
+        with open(tmp_path / shard["file"], "rb") as f:
+            text = f.read()
+        assert text.endswith(b"\n")
+        lines = [json.loads(line) for line in text.decode("utf-8").splitlines()]
+        assert len(lines) == shard["records"]
+        # a shard is closed at the first line that reaches the threshold
+        assert shard["uncompressed_bytes"] - len(text.splitlines(True)[-1]) < 1000
+        records.extend(lines)
+    store = make_store()["data"]
+    assert [r["data"] for r in records] == [e for adom in store.adoms() for table in store.tables(adom)
+                                             for e in store.iter_entries(adom, table)]
+    assert manifest["records"] == sum(s["records"] for s in manifest["shards"]) == 52
+
+
+def test_empty_run_still_writes_one_file(tmp_path):
+    writer = ShardWriter(str(tmp_path / "run"))
+    shards = writer.close()
+    assert len(shards) == 1 and shards[0]["records"] == 0
+    assert (tmp_path / "run.ndjson").read_bytes() == b""
+
+
+def test_unknown_compression_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="brotli"):
+        ShardWriter(str(tmp_path / "run"), "brotli")
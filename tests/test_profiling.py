@@ -0,0 +1,107 @@
+import http.client
+import http.server
+import os
+import sys
+import threading
+
+import pytest
+
+from fmg_common import profiling
+
+
+@pytest.mark.parametrize("argv, prefix, rest", [
+    (["--adoms", "all"], None, ["--adoms", "all"]),
+    (["--adoms", "all", "--profile"], "", ["--adoms", "all"]),
+    (["--profile", "adom.json"], "", ["adom.json"]),                   # never takes a positional
+    (["--profile-prefix=/tmp/run", "--adoms", "all"], "/tmp/run", ["--adoms", "all"]),
+    (["--profile", "--profile-prefix", "/tmp/run", "x"], "/tmp/run", ["x"]),
+])
+def test_pop_profile_arg(argv, prefix, rest):
+    assert profiling._pop_profile_arg(argv) == (prefix, rest)
+
+
+def test_run_main_without_profile_leaves_argv_alone(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["tool.py", "--adoms", "all"])
+    assert profiling.run_main(lambda: list(sys.argv)) == ["tool.py", "--adoms", "all"]
+
+
+def test_run_main_profiles_and_strips_the_option(monkeypatch, tmp_path, capsys):
+    prefix = str(tmp_path / "out" / "run")
+    monkeypatch.setattr(sys, "argv", ["tool.py", "--adoms", "all", "--profile-prefix", prefix])
+
+    def main():
+        sum(i * i for i in range(20000))
+        return list(sys.argv)
+
+    assert profiling.run_main(main) == ["tool.py", "--adoms", "all"]
+    assert os.path.getsize(prefix + ".pstats") > 0
+    assert os.path.exists(prefix + ".collapsed")
+    report = capsys.readouterr().err
+    assert "Wall time" in report and "Main thread" in report and "(all threads)" in report
+
+
+def busy_worker():
+    return sum(i * i for i in range(20000))
+
+
+def test_pstats_include_worker_threads(monkeypatch, tmp_path, capsys):
+    import pstats
+    prefix = str(tmp_path / "run")
+    monkeypatch.setattr(sys, "argv", ["tool.py", f"--profile-prefix={prefix}"])
+
+    def main():
+        worker = threading.Thread(target=busy_worker)
+        worker.start()
+        worker.join()
+
+    profiling.run_main(main)
+    functions = {func for _, _, func in pstats.Stats(prefix + ".pstats").stats}
+    assert "busy_worker" in functions
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"x" * 1000
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def fetch(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/")
+    data = conn.getresponse().read()
+    conn.close()
+    return data
+
+
+def test_network_wait_times_http_client_calls_and_uninstalls(server):
+    original = http.client.HTTPConnection.getresponse
+    wait = profiling.NetworkWait()
+    wait.install()
+    try:
+        assert len(fetch(server)) == 1000
+        assert len(fetch(server)) == 1000
+        worker = threading.Thread(target=fetch, args=(server,), name="worker-1")
+        worker.start()
+        worker.join()
+    finally:
+        wait.uninstall()
+    main = threading.current_thread().name
+    assert wait.calls == {main: 2, "worker-1": 1}
+    assert wait.seconds[main] > 0 and wait.seconds["worker-1"] > 0
+    assert http.client.HTTPConnection.getresponse is original
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from reference_graph import ReferenceIndex, build, default_db, iter_refs, snapshot_files
+
+SNAPSHOT = {
+    "root": {
+        "firewall/address": [{"name": "web1", "subnet": "10.0.0.1/32"},
+                             {"name": "web2", "subnet": "10.0.0.2/32"},
+                             {"name": "spare", "subnet": "10.0.0.3/32"}],
+        "firewall/addrgrp": [{"name": "grp1", "member": ["web1"]},
+                             {"name": "grp2", "member": ["grp1"], "comment": "spare"}],
+        "firewall/service/custom": [{"name": "web1", "tcp-portrange": "8080"},
+                                    {"name": "HTTPS", "tcp-portrange": "443"}],
+        "firewall/policy": [{"policyid": 1, "srcaddr": ["grp2"], "dstaddr": ["g-dns"],
+                             "service": ["web1"], "comments": "web2"}],
+    },
+    "rootp": {"firewall/address": [{"name": "g-dns", "subnet": "10.9.9.9/32"}]},
+    "branch": {
+        "firewall/address": [{"name": "web2", "subnet": "10.1.0.2/32"}],
+        "firewall/addrgrp": [{"name": "bgrp", "member": ["web2", "g-dns"]}],
+    },
+}
+
+
+def build_index(tmp_path, snapshot):
+    files = []
+    for adom, tables in snapshot.items():
+        path = tmp_path / f"snap_{adom}.json"
+        path.write_text(json.dumps({"data": {adom: tables}}), encoding="utf-8")
+        files.append(str(path))
+    return build(files, str(tmp_path / "refs.sqlite")), ReferenceIndex(str(tmp_path / "refs.sqlite"))
+
+
+@pytest.fixture
+def index(tmp_path):
+    stats, idx = build_index(tmp_path, SNAPSHOT)
+    assert stats["nodes"] == 11
+    yield idx
+    idx.close()
+
+
+def test_iter_refs_walks_nested_values_and_skips_non_reference_fields():
+    entry = {"name": "p", "comment": "x", "srcaddr": ["a", "b"],
+             "dynamic_mapping": [{"_scope": [{"name": "FGT"}], "interface": "port1"}]}
+    assert list(iter_refs(entry)) == [("srcaddr", "a"), ("srcaddr", "b"), ("interface", "port1")]
+
+
+def test_field_families_keep_services_and_addresses_apart(index):
+    assert index.where_used("web1", adom="root", table="firewall/address") == [
+        (1, "root", "firewall/addrgrp", "grp1", "member")]
+    # 'member' has no family, so it may point at either object of that name
+    assert index.where_used("web1", adom="root", table="firewall/service/custom") == [
+        (1, "root", "firewall/addrgrp", "grp1", "member"), (1, "root", "firewall/policy", "1", "service")]
+
+
+def test_references_stay_in_their_adom_or_global(index):
+    assert index.where_used("web2", adom="root") == []                     # 'comments' is not a reference
+    assert index.where_used("web2", adom="branch") == [(1, "branch", "firewall/addrgrp", "bgrp", "member")]
+    assert index.where_used("g-dns") == [(1, "branch", "firewall/addrgrp", "bgrp", "member"),
+                                         (1, "root", "firewall/policy", "1", "dstaddr")]
+
+
+def test_same_adom_object_shadows_the_global_one(tmp_path):
+    snapshot = {
+        "rootp": {"firewall/address": [{"name": "dns", "subnet": "10.9.9.9/32"}],
+                  "firewall/service/custom": [{"name": "web", "tcp-portrange": "80"}]},
+        "branch": {"firewall/address": [{"name": "dns", "subnet": "10.1.1.1/32"}],
+                   "firewall/policy": [{"policyid": 1, "dstaddr": ["dns"], "service": ["web"]}]},
+        "root": {"firewall/policy": [{"policyid": 2, "dstaddr": ["dns"]}]},
+    }
+    _, idx = build_index(tmp_path, snapshot)
+    try:
+        assert idx.where_used("dns", adom="branch") == [(1, "branch", "firewall/policy", "1", "dstaddr")]
+        assert idx.where_used("dns", adom="rootp") == [(1, "root", "firewall/policy", "2", "dstaddr")]
+        # no local service named 'web', so the Global one is still used
+        assert idx.where_used("web") == [(1, "branch", "firewall/policy", "1", "service")]
+    finally:
+        idx.close()
+
+
+def test_where_used_recursive_follows_the_chain(index):
+    assert index.where_used("web1", table="firewall/address", recursive=True) == [
+        (1, "root", "firewall/addrgrp", "grp1", "member"),
+        (2, "root", "firewall/addrgrp", "grp2", "member"),
+        (3, "root", "firewall/policy", "1", "srcaddr"),
+    ]
+    assert index.where_used("missing") == []
+
+
+def test_unused_lists_unreferenced_objects(index):
+    assert index.unused(adom="root", table="firewall/address") == [
+        ("root", "firewall/address", "spare"), ("root", "firewall/address", "web2")]
+    assert ("root", "firewall/service/custom", "HTTPS") in index.unused()
+    assert ("rootp", "firewall/address", "g-dns") not in index.unused()
+
+
+def test_snapshot_files_and_default_db(tmp_path):
+    for adom in ("root", "branch"):
+        (tmp_path / f"fmg_adom_objects_1_{adom}.json").write_text("{}", encoding="utf-8")
+    stem = str(tmp_path / "fmg_adom_objects_1")
+    assert [p.rsplit("_", 1)[1] for p in snapshot_files([stem])] == ["branch.json", "root.json"]
+    assert default_db([stem]) == stem + "_refs.sqlite"
+    assert default_db([stem + "_root.json"]) == stem + "_refs.sqlite"
+    with pytest.raises(FileNotFoundError, match="run 'build' first"):
+        ReferenceIndex(str(tmp_path / "nope.sqlite"))
@@ -0,0 +1,73 @@
+import json
+
+from snapshot_diff import MISSING, diff_snapshots, field_changes, keyed, snapshot_map
+
+
+def write(path, data):
+    path.write_text(json.dumps({"data": data}), encoding="utf-8")
+    return str(path)
+
+
+def test_keyed_uses_entry_keys_and_numbers_repeats():
+    entries = [{"name": "a"}, {"policyid": 7}, {"name": "a", "x": 1}, {"other": 1}, {"other": 2}]
+    assert list(keyed(entries)) == ["a", "7", "a#2", "#1", "#2"]
+
+
+def test_field_changes_nested_and_named_list_items():
+    old = {"subnet": "10.0.0.0/24", "opts": {"a": 1, "b": 2}, "dynamic_mapping": [
+        {"_scope": [{"name": "FGT-01", "vdom": "root"}], "subnet": "10.1.0.0/24"},
+        {"_scope": [{"name": "FGT-02", "vdom": "root"}], "subnet": "10.2.0.0/24"}]}
+    new = {"subnet": "10.0.0.0/24", "opts": {"a": 1, "c": 3}, "dynamic_mapping": [
+        {"_scope": [{"name": "FGT-02", "vdom": "root"}], "subnet": "10.2.0.0/24"},
+        {"_scope": [{"name": "FGT-01", "vdom": "root"}], "subnet": "10.1.9.0/24"}]}
+    assert field_changes(old, new) == [
+        ("dynamic_mapping[FGT-01/root].subnet", "10.1.0.0/24", "10.1.9.0/24"),
+        ("opts.b", 2, MISSING),
+        ("opts.c", MISSING, 3),
+    ]
+
+
+def test_field_changes_plain_lists_are_compared_whole():
+    assert field_changes({"member": ["a", "b"]}, {"member": ["a", "c"]}) == [
+        ("member", ["a", "b"], ["a", "c"])]
+    assert field_changes({"member": ["a"]}, {"member": ["a"]}) == []
+
+
+def test_diff_snapshots_by_stem(tmp_path):
+    write(tmp_path / "old_root.json", {"root": {"firewall/address": [
+        {"name": "keep", "subnet": "10.0.0.0/24"},
+        {"name": "edit", "subnet": "10.1.0.0/24"},
+        {"name": "gone", "subnet": "10.2.0.0/24"}]}})
+    write(tmp_path / "old_branch.json", {"branch": {"firewall/address": [{"name": "x", "subnet": "1.1.1.1/32"}]}})
+    write(tmp_path / "new_root.json", {"root": {"firewall/address": [
+        {"name": "new", "subnet": "10.3.0.0/24"},
+        {"name": "edit", "subnet": "10.1.1.0/24"},
+        {"name": "keep", "subnet": "10.0.0.0/24"}]}})          # reordered: not a change
+
+    assert set(snapshot_map(str(tmp_path / "old"))) == {"root", "branch"}
+    changes = sorted(diff_snapshots(str(tmp_path / "old"), str(tmp_path / "new")))
+    assert changes == [
+        ("added", "root", "firewall/address", "new", []),
+        ("modified", "root", "firewall/address", "edit", [("subnet", "10.1.0.0/24", "10.1.1.0/24")]),
+        ("removed", "branch", "firewall/address", "x", []),
+        ("removed", "root", "firewall/address", "gone", []),
+    ]
+
+
+def test_diff_explicit_files_and_table_filter(tmp_path):
+    old = write(tmp_path / "a.json", {"root": {"firewall/address": [{"name": "a"}],
+                                               "firewall/service/custom": [{"name": "s"}]}})
+    new = write(tmp_path / "b.json", {"root": {"firewall/address": [{"name": "a"}]}})
+    assert snapshot_map(old) == {"": old}
+    assert list(diff_snapshots(old, new)) == [("removed", "root", "firewall/service/custom", "s", [])]
+    assert list(diff_snapshots(old, new, tables={"firewall/address"})) == []
+
+
+def test_reordered_named_items_and_equal_numbers_are_not_modifications(tmp_path):
+    mappings = [{"_scope": [{"name": "FGT-01", "vdom": "root"}], "subnet": "10.1.0.0/24"},
+                {"_scope": [{"name": "FGT-02", "vdom": "root"}], "subnet": "10.2.0.0/24"}]
+    old = write(tmp_path / "a.json", {"root": {"firewall/address": [
+        {"name": "a", "dynamic_mapping": mappings}, {"name": "b", "ttl": 1}]}})
+    new = write(tmp_path / "b.json", {"root": {"firewall/address": [
+        {"name": "a", "dynamic_mapping": mappings[::-1]}, {"name": "b", "ttl": 1.0}]}})
+    assert list(diff_snapshots(old, new)) == []
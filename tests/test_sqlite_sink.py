@@ -0,0 +1,94 @@
+import json
+import sqlite3
+
+import pytest
+
+import sqlite_sink
+from table_store import TableStore
+
+
+def make_run():
+    store = TableStore()
+    store.append("root", "firewall/address", [
+        {"name": f"addr{i}", "subnet": f"10.0.{i}.0/24", "comment": "decommissioned" if i == 3 else ""}
+        for i in range(7)])
+    store.append("root", "firewall/policy", [{"policyid": 9, "comments": "temp rule for migration"}])
+    store.append("branch", "firewall/address", [{"name": "it's", "subnet": "10.9.0.0/24",
+                                                 "description": "Decommission after cutover"}])
+    return {"metadata": {"host": "fmg", "adoms": ["root", "branch"]}, "data": store}
+
+
+class RecordingConnection:
+    """sqlite3 connection proxy that logs statements and can pretend FTS5 is missing."""
+
+    def __init__(self, db, log, fts5):
+        self._db, self._log, self._fts5 = db, log, fts5
+
+    def execute(self, sql, *args):
+        self._log.append(sql)
+        if not self._fts5 and "fts5" in sql:
+            raise sqlite3.OperationalError("no such module: fts5")
+        return self._db.execute(sql, *args)
+
+    def executemany(self, sql, rows):
+        self._log.append(sql)
+        return self._db.executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    log, real_connect = [], sqlite3.connect
+    options = {"fts5": True}
+    monkeypatch.setattr(sqlite_sink.sqlite3, "connect",
+                        lambda *a, **kw: RecordingConnection(real_connect(*a, **kw), log, options["fts5"]))
+    monkeypatch.setattr(sqlite_sink, "BATCH_ROWS", 3)
+    return log, options
+
+
+def test_round_trip_views_and_full_text(tmp_path, recorded):
+    log, _ = recorded
+    path = str(tmp_path / "run.sqlite")
+    stats = sqlite_sink.write_sqlite(make_run(), path)
+    assert stats == {"rows": 9, "tables": 2, "fts": True}
+
+    inserts = [i for i, sql in enumerate(log) if sql.startswith("INSERT INTO entries ")]
+    assert len(inserts) == 5                                     # 3 + 3 + 1 rows, then 1 + 1
+    first_index = min(i for i, sql in enumerate(log) if sql.startswith("CREATE INDEX"))
+    assert first_index > max(inserts)                            # indexes built after the load
+
+    db = sqlite3.connect(path)
+    try:
+        meta = dict(db.execute("SELECT key, value FROM meta"))
+        assert meta["host"] == "fmg" and json.loads(meta["adoms"]) == ["root", "branch"]
+        assert db.execute('SELECT COUNT(*) FROM "firewall/address"').fetchone()[0] == 8
+        assert db.execute("""SELECT json_extract(data, '$.subnet') FROM "firewall/address"
+                             WHERE adom = 'branch' AND name = 'it''s'""").fetchone() == ("10.9.0.0/24",)
+        assert db.execute('SELECT name FROM "firewall/policy"').fetchall() == [("9",)]
+        indexes = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_entries_adom_tbl_name", "idx_entries_tbl_name", "idx_entries_name"} <= indexes
+        hits = db.execute("""SELECT adom, name FROM entries_fts JOIN entries ON entries.id = entries_fts.rowid
+                             WHERE entries_fts MATCH 'decommission*' ORDER BY adom""").fetchall()
+        assert hits == [("branch", "it's"), ("root", "addr3")]
+    finally:
+        db.close()
+
+
+def test_without_fts5_the_rest_of_the_file_is_still_written(tmp_path, recorded):
+    _, options = recorded
+    options["fts5"] = False
+    path = str(tmp_path / "run.sqlite")
+    (tmp_path / "run.sqlite").write_bytes(b"stale")
+    stats = sqlite_sink.write_sqlite(make_run(), path)
+    assert stats["fts"] is False and stats["rows"] == 9
+
+    db = sqlite3.connect(path)
+    try:
+        tables = {row[0] for row in db.execute("SELECT name FROM sqlite_master")}
+        assert "entries_fts" not in tables
+        assert db.execute("SELECT name FROM entries WHERE comment LIKE '%ecommission%' ORDER BY name").fetchall() == [
+            ("addr3",), ("it's",)]
+    finally:
+        db.close()
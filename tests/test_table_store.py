@@ -0,0 +1,114 @@
+import os
+import threading
+
+import pytest
+
+from table_store import TableStore, fmt_size, parse_size
+
+
+def entries(prefix, count, pad=50):
+    return [{"name": f"{prefix}{i}", "comment": "x" * pad, "nested": {"n": i, "tags": ["a", "b"]}}
+            for i in range(count)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1048576", 1048576), ("512M", 512 * 1024 ** 2), ("2G", 2 * 1024 ** 3),
+    ("1.5g", int(1.5 * 1024 ** 3)), ("64KiB", 64 * 1024), (" 10 MB ", 10 * 1024 ** 2),
+])
+def test_parse_size(text, expected):
+    assert parse_size(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "lots", "5X", "-1G"])
+def test_parse_size_rejects_garbage(text):
+    with pytest.raises(ValueError):
+        parse_size(text)
+
+
+def test_fmt_size():
+    assert fmt_size(512) == "512 B"
+    assert fmt_size(1536) == "1.5 KB"
+    assert fmt_size(3 * 1024 ** 3) == "3.0 GB"
+
+
+def test_without_budget_nothing_spills(tmp_path):
+    with TableStore(spill_dir=str(tmp_path)) as store:
+        store.append("root", "firewall/address", entries("a", 500))
+        assert store.spilled_tables() == 0
+        assert store.mem_bytes == 0
+        assert list(store.iter_entries("root", "firewall/address")) == entries("a", 500)
+    assert os.listdir(tmp_path) == []
+
+
+def test_spill_round_trip_keeps_order_and_content(tmp_path):
+    addresses = entries("a", 300)
+    services = entries("s", 40, pad=5)
+    with TableStore(max_bytes=20_000, spill_dir=str(tmp_path)) as store:
+        for start in range(0, 300, 30):                    # page by page, as the fetcher does
+            store.append("root", "firewall/address", addresses[start:start + 30])
+        store.append("root", "firewall/service/custom", services)
+        store.append("branch", "firewall/address", entries("b", 3))
+
+        assert store.spill_events > 0
+        assert store.spilled_tables() >= 1
+        assert store.spilled_bytes > 0
+        assert store.mem_bytes <= store.max_bytes
+        assert store.peak_bytes > store.max_bytes
+        assert os.listdir(tmp_path)                        # spill directory in use
+
+        assert store.count("root", "firewall/address") == 300
+        assert list(store.iter_entries("root", "firewall/address")) == addresses
+        assert list(store.iter_entries("root", "firewall/service/custom")) == services
+        assert list(store.iter_entries("branch", "firewall/address")) == entries("b", 3)
+        assert store.adoms() == ["root", "branch"]
+    assert os.listdir(tmp_path) == []                      # close() removes the segments
+
+
+def test_largest_buffer_spills_first(tmp_path):
+    with TableStore(max_bytes=30_000, spill_dir=str(tmp_path)) as store:
+        store.append("root", "small", entries("s", 5))
+        store.append("root", "big", entries("b", 200))
+        assert store._tables["root"]["big"].segment is not None
+        assert store._tables["root"]["small"].segment is None
+
+
+def test_discard_forgets_memory_and_segment(tmp_path):
+    with TableStore(max_bytes=10_000, spill_dir=str(tmp_path)) as store:
+        store.append("root", "firewall/address", entries("a", 200))
+        store.append("root", "firewall/service", entries("s", 200))
+        segment = store._tables["root"]["firewall/address"].segment
+        assert segment and os.path.exists(segment)
+        kept = store._tables["root"]["firewall/service"].spilled_bytes
+        assert 0 < kept < store.spilled_bytes
+        store.append("root", "firewall/address", entries("z", 2))
+        store.discard("root", "firewall/address")
+        assert not os.path.exists(segment)
+        assert store.tables("root") == ["firewall/service"]
+        assert store.spilled_bytes == kept
+        assert store.mem_bytes == store._tables["root"]["firewall/service"].est_bytes
+
+
+def test_ensure_registers_empty_tables_in_output_order():
+    store = TableStore()
+    store.append("root", "b", [{"name": "x"}])
+    store.ensure("root", ["a", "b", "c"])
+    store.ensure("empty")
+    assert store.tables("root") == ["b", "a", "c"]
+    assert store.count("root", "a") == 0
+    assert store.adoms() == ["root", "empty"]
+
+
+def test_concurrent_appends_lose_nothing(tmp_path):
+    with TableStore(max_bytes=50_000, spill_dir=str(tmp_path)) as store:
+        def worker(table):
+            for page in range(20):
+                store.append("root", table, entries(f"{table}-{page}-", 10))
+
+        threads = [threading.Thread(target=worker, args=(f"t{i}",)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for i in range(4):
+            got = list(store.iter_entries("root", f"t{i}"))
+            assert got == [e for page in range(20) for e in entries(f"t{i}-{page}-", 10)]
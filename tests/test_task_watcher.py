@@ -0,0 +1,133 @@
+import pytest
+
+from fmg_common.task_watcher import TaskWatcher, task_finished
+
+
+class FakeTasks:
+    """fetch() stand-in: each task walks through a scripted list of task dicts."""
+
+    def __init__(self, scripts):
+        self.scripts = {tid: list(states) for tid, states in scripts.items()}
+        self.requests = []
+
+    def __call__(self, params):
+        self.requests.append([p["url"] for p in params])
+        results = []
+        for p in params:
+            tid = int(p["url"].rsplit("/", 1)[1])
+            states = self.scripts[tid]
+            task = states.pop(0) if len(states) > 1 else states[0]
+            results.append({"status": {"code": 0}, "data": task})
+        return results
+
+
+def test_task_finished_states():
+    assert task_finished({"state": 4})
+    assert task_finished({"state": "5"})
+    assert task_finished({"state": "done"})
+    assert task_finished({"percent": 100})
+    assert task_finished({"num_lines": 3, "num_done": 3})
+    assert not task_finished({"state": 1, "percent": 40})
+    assert not task_finished({"num_lines": 0, "num_done": 0})
+
+
+def test_all_pending_tasks_share_one_request():
+    fetch = FakeTasks({1: [{"percent": 50}, {"state": 4}], 2: [{"state": 4}]})
+    watcher = TaskWatcher(fetch)
+    fut1, fut2 = watcher.watch(1), watcher.watch(2)
+
+    seen = watcher.poll_once()
+    assert fetch.requests == [["/task/task/1", "/task/task/2"]]
+    assert set(seen) == {1, 2}
+    assert fut2.done() and not fut1.done()
+    assert watcher.pending == [1]
+
+    watcher.poll_once()
+    assert fetch.requests[-1] == ["/task/task/1"]
+    assert fut1.result() == {"state": 4}
+    assert watcher.pending == []
+    assert watcher.polls == 2
+
+
+def test_callback_and_on_update():
+    updates, done = [], []
+    fetch = FakeTasks({7: [{"percent": 10}, {"percent": 100}]})
+    watcher = TaskWatcher(fetch, on_update=lambda tid, task: updates.append((tid, task["percent"])))
+    watcher.watch(7, callback=lambda tid, task: done.append(tid))
+    watcher.poll_once()
+    watcher.poll_once()
+    assert updates == [(7, 10), (7, 100)]
+    assert done == [7]
+
+
+def test_watching_a_finished_task_returns_the_same_future():
+    watcher = TaskWatcher(FakeTasks({3: [{"state": 4}]}))
+    fut = watcher.watch(3)
+    watcher.poll_once()
+    assert watcher.watch(3) is fut
+    assert watcher.pending == []
+
+
+def test_failed_lookup_fails_only_that_task():
+    def fetch(params):
+        return [{"status": {"code": -3, "message": "Object does not exist"}},
+                {"status": {"code": 0}, "data": {"state": 4}}]
+
+    watcher = TaskWatcher(fetch)
+    bad, good = watcher.watch(1), watcher.watch(2)
+    watcher.poll_once()
+    with pytest.raises(RuntimeError, match="Object does not exist"):
+        bad.result()
+    assert good.result() == {"state": 4}
+
+
+@pytest.mark.parametrize("results", [[], None, [{"status": {"code": 0}, "data": {"state": 4}}]])
+def test_short_result_list_fails_every_task(results):
+    watcher = TaskWatcher(lambda params: results)
+    futures = [watcher.watch(1), watcher.watch(2)]
+    watcher.poll_once()
+    assert watcher.pending == []
+    for fut in futures:
+        with pytest.raises(RuntimeError, match="asked for 2 task"):
+            fut.result()
+
+
+def test_list_shaped_data_is_unwrapped():
+    watcher = TaskWatcher(lambda params: [{"status": {"code": 0}, "data": [{"state": 4, "id": 9}]}])
+    fut = watcher.watch(9)
+    watcher.poll_once()
+    assert fut.result() == {"state": 4, "id": 9}
+
+
+def test_interval_backs_off_without_progress_and_is_clamped():
+    watcher = TaskWatcher(FakeTasks({1: [{"percent": 5}]}), min_interval=0.5, max_interval=4.0,
+                          initial_interval=1.0)
+    watcher.watch(1)
+    intervals = []
+    for _ in range(6):
+        watcher.poll_once()
+        intervals.append(watcher.interval)
+    assert intervals[:3] == [1.5, 2.25, 3.375]
+    assert intervals[-1] == 4.0
+
+
+def test_interval_shortens_near_completion():
+    watcher = TaskWatcher(FakeTasks({1: [{"percent": 95}]}), min_interval=0.5, initial_interval=3.0)
+    watcher.watch(1)
+    watcher.poll_once()
+    assert watcher.interval == 0.5
+
+
+def test_wait_all_and_timeout():
+    fetch = FakeTasks({1: [{"percent": 50}, {"state": 4}], 2: [{"state": 4}]})
+    watcher = TaskWatcher(fetch, min_interval=0.01, initial_interval=0.01)
+    watcher.watch(1)
+    watcher.watch(2)
+    assert watcher.wait_all(timeout=5) == {1: {"state": 4}, 2: {"state": 4}}
+
+    stuck = TaskWatcher(FakeTasks({5: [{"percent": 1}]}), min_interval=0.01,
+                        max_interval=0.02, initial_interval=0.01)
+    stuck.watch(5)
+    with pytest.raises(TimeoutError, match="Tasks 5 did not complete"):
+        stuck.run(timeout=0.1)
+    assert stuck.pending == [5]
@@ -0,0 +1,107 @@
+import gzip
+import io
+import json
+import os
+import tarfile
+
+import pytest
+
+from template_catalog import TemplateCatalog, content_hash, parse_bundle
+
+BUNDLE = {
+    "cli_template": [{"name": "Branch_SDWAN", "oid": 101, "script": "config system sdwan"},
+                     {"name": "Banner", "oid": 102, "script": "config system global"}],
+    "template_group": {"groups": [{"name": "Branch", "member": ["Branch_SDWAN", "Banner"]}]},
+    "version": 7,
+}
+
+
+def dump(doc):
+    return json.dumps(doc).encode()
+
+
+def make_tar(members, compress=False):
+    bio = io.BytesIO()
+    with tarfile.open(fileobj=bio, mode="w:gz" if compress else "w") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return bio.getvalue()
+
+
+def test_content_hash_ignores_key_order_and_volatile_fields():
+    a = {"name": "t", "oid": 1, "uuid": "x", "script": "a", "opts": {"b": 1, "a": 2}}
+    b = {"opts": {"a": 2, "b": 1}, "script": "a", "name": "t", "oid": 99, "_last-modified": 5}
+    assert content_hash(a) == content_hash(b)
+    assert content_hash(a) != content_hash({**a, "script": "b"})
+    assert len(content_hash(a)) == 64
+
+
+@pytest.mark.parametrize("encode", [
+    dump,
+    lambda doc: gzip.compress(dump(doc)),
+    lambda doc: make_tar({"templates.json": dump(doc), "README": b"not json"}),
+    lambda doc: make_tar({"templates.json": dump(doc)}, compress=True),
+], ids=["json", "gzip", "tar", "tar.gz"])
+def test_parse_bundle_formats(tmp_path, encode):
+    path = tmp_path / "1_bundle.dat"
+    path.write_bytes(encode(BUNDLE))
+    rows = parse_bundle(str(path))
+    assert [(c, n) for c, n, _ in rows] == [("cli_template", "Branch_SDWAN"), ("cli_template", "Banner"),
+                                             ("template_group/groups", "Branch")]
+    assert rows[0][2] == content_hash(BUNDLE["cli_template"][0])
+
+
+def write(export_dir, name, doc):
+    path = os.path.join(export_dir, name)
+    with open(path, "wb") as f:
+        f.write(dump(doc))
+    return path
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    cat = TemplateCatalog(str(tmp_path))
+    yield cat
+    cat.close()
+
+
+def test_index_skips_unchanged_files_and_drops_deleted_ones(catalog, tmp_path):
+    write(tmp_path, "1_a.dat", BUNDLE)
+    write(tmp_path, "2_b.dat", {"cli_template": [{"name": "Other"}]})
+    (tmp_path / "3_c.dat").write_bytes(b"\x00not a bundle")
+    (tmp_path / "1_a.dat.sha256").write_text("x  1_a.dat\n")
+    with open(tmp_path / "export_manifest_1.json", "w", encoding="utf-8") as f:
+        json.dump({"exports": [{"adom": "branch", "path": str(tmp_path / "1_a.dat")}]}, f)
+
+    assert catalog.index(verbose=False) == {"indexed": 2, "unchanged": 0, "failed": 1, "removed": 0}
+    assert [(file, adom, count) for file, adom, _, count in catalog.exports()] == [
+        ("1_a.dat", "branch", 3), ("2_b.dat", None, 1)]
+
+    os.remove(tmp_path / "2_b.dat")
+    assert catalog.index(verbose=False) == {"indexed": 0, "unchanged": 1, "failed": 1, "removed": 1}
+    assert [row[0] for row in catalog.exports()] == ["1_a.dat"]
+
+
+def test_find_and_diff(catalog, tmp_path):
+    write(tmp_path, "1_old.dat", BUNDLE)
+    changed = json.loads(dump(BUNDLE))
+    changed["cli_template"][0]["script"] = "config system sdwan\n set status enable"
+    changed["cli_template"][1] = {"name": "NTP", "script": "config system ntp"}
+    changed["template_group"]["groups"][0]["oid"] = 555                # volatile only
+    write(tmp_path, "2_new.dat", changed)
+    catalog.index(verbose=False)
+
+    assert [row[0] for row in catalog.find("Branch_SDWAN")] == ["1_old.dat", "2_new.dat"]
+    assert sorted(row[3] for row in catalog.find("B%", like=True, category="cli_template")) == [
+        "Banner", "Branch_SDWAN", "Branch_SDWAN"]
+    assert catalog.find("Branch", category="cli_template") == []
+
+    assert catalog.diff("1_old.dat", str(tmp_path / "2_new.dat")) == {
+        "added": [("cli_template", "NTP")],
+        "removed": [("cli_template", "Banner")],
+        "changed": [("cli_template", "Branch_SDWAN")],
+    }
+    with pytest.raises(KeyError, match="not in the catalog"):
+        catalog.diff("1_old.dat", "9_missing.dat")
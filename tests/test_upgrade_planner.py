@@ -0,0 +1,79 @@
+from upgrade_planner import (DEFAULT_STEP_SECONDS, DurationModel, adom_version, best_schedule,
+                             build_plan, critical_path, hops)
+
+
+def keys(steps):
+    return [s.key for s in steps]
+
+
+def test_hops_walk_the_ladder():
+    assert hops((7, 0), (7, 4)) == [(7, 2), (7, 4)]
+    assert hops((6, 4), (7, 0)) == [(7, 0)]
+    assert hops((7, 4), (7, 4)) == []
+
+
+def test_adom_version_is_tolerant():
+    assert adom_version({"os_ver": "7.0", "mr": 4}) == (7, 4)
+    assert adom_version({"os_ver": 6, "mr": None}) == (6, 0)
+    assert adom_version({"os_ver": "unknown", "mr": 2}) is None
+    assert adom_version({}) is None
+
+
+def test_duration_model_prefers_the_most_specific_history():
+    model = DurationModel([
+        {"adom": "root", "product": "FOS", "from": "7.0", "to": "7.2", "seconds": 10},
+        {"adom": "other", "product": "FOS", "from": "7.0", "to": "7.2", "seconds": 30},
+        {"adom": "other", "product": "FOS", "from": "7.2", "to": "7.4", "seconds": 50},
+    ])
+    assert model.estimate("root", "FOS", (7, 0), (7, 2)) == 10        # same ADOM and hop
+    assert model.estimate("new", "FOS", (7, 0), (7, 2)) == 20         # same product and hop
+    assert model.estimate("new", "FOS", (6, 4), (7, 0)) == 30         # same product, any hop
+    assert model.estimate("new", "FAZ", (6, 4), (7, 0)) == 30         # everything
+    assert DurationModel([]).estimate("x", "FOS", (7, 0), (7, 2)) == DEFAULT_STEP_SECONDS
+
+
+def test_plan_dependencies_and_order():
+    steps = build_plan([("root", "FOS", (7, 0))], (7, 0), (7, 4), DurationModel([]))
+    by_key = {s.key: s for s in steps}
+    assert set(by_key) == {"root@7.2", "root@7.4", "Global@7.2", "Global@7.4"}
+
+    assert keys(by_key["root@7.2"].deps) == []
+    assert set(keys(by_key["root@7.4"].deps)) == {"root@7.2", "Global@7.2"}
+    assert set(keys(by_key["Global@7.2"].deps)) == {"root@7.2"}
+    assert set(keys(by_key["Global@7.4"].deps)) == {"Global@7.2", "root@7.4"}
+
+    position = {s.key: i for i, s in enumerate(steps)}
+    for s in steps:
+        assert all(position[d.key] < position[s.key] for d in s.deps)
+
+
+def test_unknown_and_up_to_date_adoms_get_no_steps():
+    steps = build_plan([("root", "FOS", (7, 4)), ("broken", "FOS", None)],
+                       (7, 2), (7, 4), DurationModel([]))
+    assert keys(steps) == ["Global@7.4"]
+
+
+def test_critical_path_follows_the_longest_chain():
+    steps = build_plan([("root", "FOS", (7, 0))], (7, 0), (7, 4), DurationModel([]))
+    path = critical_path(steps)
+    assert keys(path) == ["root@7.2", "Global@7.2", "root@7.4", "Global@7.4"]
+    assert path[0].rank == 4 * DEFAULT_STEP_SECONDS
+    assert critical_path([]) == []
+
+
+def test_critical_path_picks_the_slow_adom():
+    history = [{"adom": "slow", "product": "FOS", "from": "7.2", "to": "7.4", "seconds": 1000},
+               {"adom": "fast", "product": "FOS", "from": "7.2", "to": "7.4", "seconds": 10}]
+    steps = build_plan([("fast", "FOS", (7, 2)), ("slow", "FOS", (7, 2))],
+                       (7, 2), (7, 4), DurationModel(history))
+    assert keys(critical_path(steps)) == ["slow@7.4", "Global@7.4"]
+
+
+def test_best_schedule_runs_independent_adoms_in_parallel():
+    steps = build_plan([(f"adom{i}", "FOS", (7, 2)) for i in range(3)],
+                       (7, 2), (7, 4), DurationModel([]))
+    width, makespan, by_width = best_schedule(steps, 4)
+    assert by_width[1] == 4 * DEFAULT_STEP_SECONDS
+    assert width == 3 and makespan == 2 * DEFAULT_STEP_SECONDS
+    assert by_width[4] == makespan
+    assert [s for s in steps if s.critical]